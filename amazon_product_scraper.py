@@ -1,155 +1,267 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import csv
+import os
+import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-def scrape_amazon_products(search_query):
+from scraper_api import price_history
+from scraper_api.amazon import HEADERS, build_search_url, is_unrecognised_page
+from scraper_api.batch import read_queries
+from scraper_api.debug_pages import save_page
+from scraper_api.parse_pool import parse_page
+from scraper_api.sessions import fetch
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Prices are written in paise, as on Product.
+FIELDS = ['query', 'source', 'product_id', 'name', 'price', 'rating', 'reviews', 'image_url', 'url']
+DEFAULT_OUTPUT = "amazon_products_with_images.csv"
+# Rows buffered before a Parquet row group is written.
+PARQUET_BATCH = 5000
+
+#==============================================================================
+# PIPELINE
+#==============================================================================
+# Each result page goes through three stages: fetch (paced per host by the
+# rate limiter in scraper_api.sessions), parse (on the parse worker
+# processes) and write. Up to --concurrency pages are fetched and parsed at
+# once while the main thread writes the pages already done, so the export
+# runs as fast as the rate limit allows.
+
+class PageResult:
+    """ The outcome of fetching and parsing one result page, with its timings. """
+
+    def __init__(self, search_query, page, products=None, error=None, size=0, fetch_seconds=0.0,
+                 parse_seconds=0.0):
+        self.query = search_query
+        self.page = page
+        self.products = products or []
+        self.error = error
+        self.size = size
+        self.fetch_seconds = fetch_seconds
+        self.parse_seconds = parse_seconds
+
+
+def scrape_page(search_query, page=1):
     """
-    Scrapes Amazon for products based on a search query.
+    Fetches and parses one Amazon.in search result page.
 
     Args:
         search_query (str): The product to search for.
+        page (int): The result page, starting at 1.
 
     Returns:
-        list: A list of dictionaries, where each dictionary represents a product
-              with its name, price, rating, and number of reviews.
+        PageResult: The page's Products, or the reason there are none.
     """
-    # Format the search query for the URL
-    search_query = search_query.replace(' ', '+')
-    # Use the IN site for consistency, as page layouts can vary by region.
-    url = f"https://www.amazon.in/s?k={search_query}"
-    print(f"Attempting to fetch data from: {url}")
-
-    # Set headers to mimic a real browser request to avoid being blocked
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Connection": "keep-alive"
-    }
-
-    products = []
+    url = build_search_url(search_query, page)
+    start = time.perf_counter()
+    try:
+        response = fetch(url, headers=HEADERS, timeout=15, source='amazon')
+    except Exception as e:
+        return PageResult(search_query, page, error=f"request failed: {e}")
+    fetched = time.perf_counter()
+    if response.status_code != 200:
+        save_page('amazon', 'error_page', response.content)
+        return PageResult(search_query, page, error=f"status code {response.status_code}",
+                          fetch_seconds=fetched - start)
 
     try:
-        # Send a GET request to the Amazon search results page
-        response = requests.get(url, headers=headers, timeout=15)
-        print(f"Response Status Code: {response.status_code}")
-
-        if response.status_code != 200:
-            print("Failed to retrieve the webpage. Amazon might be blocking the request.")
-            with open("amazon_error_page.html", "w", encoding="utf-8") as f:
-                f.write(response.text)
-            print("Response saved to amazon_error_page.html for inspection.")
-            return []
-        
-        response.raise_for_status()
-
-        # Parse the HTML content of the page
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Find all product containers on the page using a more stable selector (data-asin)
-        results = soup.find_all('div', {'data-asin': True})
-        print(f"Found {len(results)} potential product items.")
-
-        if not results:
-            print("No products found. Amazon might have changed its layout or blocked the request.")
-            with open("amazon_no_results.html", "w", encoding="utf-8") as f:
-                f.write(response.text)
-            print("Page content saved to amazon_no_results.html for debugging.")
-            return []
-
-        # Loop through each product container
-        for item in results:
-            # A crucial filter: A real product listing must have a price.
-            # This skips video results, "related searches", etc.
-            if not item.select_one('span.a-price'):
-                continue
-
-            product_data = {}
-
-            # --- Extract Product Name ---
-            try:
-                # Corrected selector to find the name within the main H2 tag
-                name_element = item.select_one('h2.a-size-medium.a-color-base.a-text-normal')
-                product_data['name'] = name_element.get_text(strip=True) if name_element else 'N/A'
-            except AttributeError:
-                product_data['name'] = 'N/A'
-
-            # --- Extract Product Price ---
-            try:
-                # The price is reliably found in the 'a-offscreen' span within the price block
-                price_element = item.select_one('span.a-price span.a-offscreen')
-                product_data['price'] = price_element.get_text(strip=True) if price_element else 'N/A'
-            except AttributeError:
-                product_data['price'] = 'N/A'
-
-            # --- Extract Product Rating ---
-            try:
-                # The rating text is consistently in a span with the class 'a-icon-alt'
-                rating_element = item.select_one('span.a-icon-alt')
-                product_data['rating'] = rating_element.get_text(strip=True) if rating_element else 'N/A'
-            except (AttributeError, KeyError):
-                product_data['rating'] = 'N/A'
-
-            # --- Extract Number of Reviews ---
-            try:
-                # The number of reviews is in a span with these specific classes
-                reviews_element = item.select_one('span.a-size-base.s-underline-text')
-                product_data['reviews'] = reviews_element.get_text(strip=True).replace(',', '') if reviews_element else 'N/A'
-            except AttributeError:
-                product_data['reviews'] = 'N/A'
-            
-            # --- Extract Product Image URL ---
-            try:
-                image_element = item.select_one('img.s-image')
-                product_data['image_url'] = image_element['src'] if image_element else 'N/A'
-            except (AttributeError, KeyError):
-                product_data['image_url'] = 'N/A'
-
-
-            # Add the product data to our list only if it has a valid name and price.
-            if product_data.get('name') not in ['N/A', ''] and product_data.get('price') != 'N/A':
-                products.append(product_data)
-            
-            time.sleep(0.05)
-
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred during the request: {e}")
-        return []
+        products = parse_page('amazon', response.content) or []
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return []
+        return PageResult(search_query, page, error=f"parse failed: {e}", size=len(response.content),
+                          fetch_seconds=fetched - start)
+    if not products and is_unrecognised_page(response.content):
+        # Not the end of the results but a layout or block page the parser does not know.
+        save_page('amazon', 'unrecognised', response.content)
+    return PageResult(search_query, page, products, size=len(response.content), fetch_seconds=fetched - start,
+                      parse_seconds=time.perf_counter() - fetched)
 
-    print(f"Successfully parsed {len(products)} products.")
-    return products
 
-def save_to_csv(products, filename="amazon_products_with_images.csv"):
+def run_pipeline(queries, pages=1, concurrency=4):
     """
-    Saves the scraped product data to a CSV file.
+    Scrapes 'pages' result pages of every query, 'concurrency' pages at a
+    time, and yields each PageResult as soon as it is done. Pages are
+    submitted a window at a time, so the queries can come from a file of any
+    length. Once a page of a query comes back empty, its later pages that
+    have not started are skipped.
     """
-    if not products:
-        print("No valid product data was collected to save. The CSV file will not be created.")
-        return
+    exhausted = set()
+    jobs = ((search_query, page) for search_query in queries for page in range(1, pages + 1))
+    pending = set()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='export')
+    try:
+        while True:
+            for search_query, page in jobs:
+                if search_query in exhausted:
+                    continue
+                pending.add(executor.submit(scrape_page, search_query, page))
+                if len(pending) >= concurrency * 2:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result.error or not result.products:
+                    exhausted.add(result.query)
+                yield result
+    finally:
+        # Stopping early drops the pages that have not started yet.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+#==============================================================================
+# WRITERS
+#==============================================================================
+def _row(search_query, product):
+    return [search_query, product.source, product.product_id, product.name, product.price, product.rating,
+            product.reviews, product.image_url, product.url]
+
+
+class CsvWriter:
+    """ Appends each page's products to a CSV file as they arrive. """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(FIELDS)
+
+    def write(self, search_query, products):
+        self._writer.writerows(_row(search_query, product) for product in products)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """ Writes products to a Parquet file in row groups of PARQUET_BATCH rows. Needs pyarrow. """
+
+    SCHEMA = None if pyarrow is None else pyarrow.schema([
+        ('query', pyarrow.string()), ('source', pyarrow.string()), ('product_id', pyarrow.string()),
+        ('name', pyarrow.string()), ('price', pyarrow.int64()), ('rating', pyarrow.float64()),
+        ('reviews', pyarrow.int64()), ('image_url', pyarrow.string()), ('url', pyarrow.string()),
+    ])
 
-    headers = ['name', 'price', 'rating', 'reviews', 'image_url']
+    def __init__(self, filename):
+        if pyarrow is None:
+            raise RuntimeError("Writing Parquet needs pyarrow; install it or write a .csv file.")
+        self._writer = pyarrow.parquet.ParquetWriter(filename, self.SCHEMA)
+        self._rows = []
 
+    def write(self, search_query, products):
+        self._rows.extend(_row(search_query, product) for product in products)
+        if len(self._rows) >= PARQUET_BATCH:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            columns = list(zip(*self._rows))
+            self._writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(column, type=field.type) for column, field in zip(columns, self.SCHEMA)],
+                schema=self.SCHEMA))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+WRITERS = {'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+#==============================================================================
+# COMMAND LINE
+#==============================================================================
+class Throughput:
+    """ Running totals of an export, for the progress lines and the final report. """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.pages = self.products = self.failed = self.bytes = 0
+        self.fetch_seconds = self.parse_seconds = self.write_seconds = 0.0
+
+    def add(self, result, write_seconds):
+        self.pages += 1
+        self.failed += result.error is not None
+        self.products += len(result.products)
+        self.bytes += result.size
+        self.fetch_seconds += result.fetch_seconds
+        self.parse_seconds += result.parse_seconds
+        self.write_seconds += write_seconds
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"{self.pages} pages ({self.failed} failed), {self.products} products in {elapsed:.1f}s: "
+                f"{self.pages / elapsed:.2f} pages/s, {self.products / elapsed:.1f} products/s, "
+                f"{self.bytes / elapsed / 2 ** 20:.2f} MiB/s downloaded")
+
+    def stages(self):
+        pages = max(self.pages, 1)
+        return (f"Per page: fetch {self.fetch_seconds / pages * 1000:.0f} ms, "
+                f"parse {self.parse_seconds / pages * 1000:.0f} ms, write {self.write_seconds / pages * 1000:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export Amazon.in search results to a CSV or Parquet file.')
+    parser.add_argument('query', nargs='?', help='product to search for (asked for if neither this nor --queries)')
+    parser.add_argument('--queries', help='file with one search query per line')
+    parser.add_argument('--pages', type=int, default=1, help='result pages per query')
+    parser.add_argument('--concurrency', type=int, default=4, help='pages fetched and parsed at once')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--format', choices=WRITERS, help='output format (default: from the file extension)')
+    args = parser.parse_args(argv)
+    if args.pages < 1 or args.concurrency < 1:
+        parser.error("--pages and --concurrency must be at least 1")
+
+    if args.queries:
+        queries = read_queries(args.queries)
+    else:
+        search_query = args.query or input("Enter the product you want to search for on Amazon: ")
+        if not search_query.strip():
+            print("Please enter a valid search term.")
+            return 1
+        queries = [search_query.strip()]
+
+    output_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if output_format not in WRITERS:
+        output_format = 'csv'
     try:
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(products)
-        print(f"Successfully saved {len(products)} products to {filename}")
-    except IOError as e:
-        print(f"Error writing to file {filename}: {e}")
+        writer = WRITERS[output_format](args.output)
+    except (OSError, RuntimeError) as e:
+        print(f"Error opening {args.output}: {e}")
+        return 1
+
+    totals = Throughput()
+    changed = 0
+    try:
+        for result in run_pipeline(queries, args.pages, args.concurrency):
+            if result.error:
+                print(f"'{result.query}' page {result.page} failed: {result.error}")
+            write_start = time.perf_counter()
+            writer.write(result.query, result.products)
+            # With SCRAPER_HISTORY_DB set, also append the changed prices to the history store.
+            if price_history.store is not None and result.products:
+                changed += price_history.store.record('amazon', result.products)
+            totals.add(result, time.perf_counter() - write_start)
+            if totals.pages % 25 == 0:
+                print(totals.report())
+    except KeyboardInterrupt:
+        print("Stopped early; the file holds every page finished so far.")
+    finally:
+        writer.close()
+
+    print(f"Saved to {args.output}. {totals.report()}")
+    print(totals.stages())
+    if price_history.store is not None:
+        print(f"Recorded {changed} changed products in the price history.")
+    return 0 if totals.products else 1
+
 
 if __name__ == "__main__":
-    query = input("Enter the product you want to search for on Amazon: ")
-    
-    if query:
-        scraped_products = scrape_amazon_products(query)
-        
-        if scraped_products:
-            save_to_csv(scraped_products)
-    else:
-        print("Please enter a valid search term.")
+    sys.exit(main())
@@ -1,64 +1,335 @@
-from flask import Flask, request, jsonify
+import os
+import time
+
+from flask import Blueprint, Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-# Import the scraper functions from their respective modules
-from scraper_api.amazon import scrape_amazon_products
-# from scraper_api.flipkart import scrape_flipkart_products
-from scraper_api.myntra_scraper import scrape_myntra_products
+# The scrapers are imported on their first request (or by sources.warm_up),
+# so a server without Flipkart never loads Selenium.
+from scraper_api.sources import ENABLED_SOURCES, get_scraper
+from scraper_api.fanout import scrape_all, iter_all, parse_sources, failure_status
+from scraper_api.product import Product
+from scraper_api.filters import limit_stream, results_needed, select
+from scraper_api.matching import match_products, select_groups
+from scraper_api.params import (parse_bounds, parse_deadline, parse_filter_args, parse_group, parse_index,
+                                parse_paging_args, parse_search_args, parse_since, parse_stream_format)
+from scraper_api.streaming import STREAM_FORMATS, iter_source_products
+from scraper_api import batch, metrics, price_history, scheduler, search_index
+
+
+class ProductJSONProvider(DefaultJSONProvider):
+    """ Writes Products with Product.to_dict instead of the generic deep-copying dataclasses.asdict. """
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, Product):
+            return obj.to_dict()
+        return DefaultJSONProvider.default(obj)
+
+
+# --- Routes ---
+# Registered on the app by create_app(), along with the /scrape/<source>
+# route of each enabled source.
+api = Blueprint('api', __name__)
+
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@api.after_app_request
+def record_request_latency(response):
+    """ Records how long each /scrape request took, per source, for /metrics. """
+    rule = request.url_rule
+    if rule is not None and rule.rule.startswith('/scrape/') and 'request_started' in g:
+        source = rule.rule.rsplit('/', 1)[1]
+        metrics.REQUEST_SECONDS.observe(source, str(response.status_code),
+                                        value=time.perf_counter() - g.request_started)
+    return response
+
+
+def json_response(source, value):
+    """ jsonify() with the encoding timed as the source's 'serialize' stage. """
+    with metrics.span(source, 'serialize'):
+        return jsonify(value)
+
 
-# --- Flask App Initialization ---
-app = Flask(__name__)
-# Enable CORS for all routes
-CORS(app)
+def indexed_response(source, search_query, page, max_results, filters, sort, limit, max_age):
+    """ Answers an index-first /scrape request from the search index, or returns None to scrape upstream. """
+    products = search_index.lookup_scrape(source, search_query, page, max_results, filters, max_age)
+    if products is None:
+        return None
+    response = json_response(source, select(products, sort, limit))
+    response.headers['X-Served-From'] = 'index'
+    return response
+
+
+def stream_response(items, stream, limit=None):
+    """ Sends items to the client one at a time in the requested stream format, up to 'limit' products. """
+    encode, mimetype = STREAM_FORMATS[stream]
+    if limit is not None:
+        items = limit_stream(items, limit)
+    return Response(stream_with_context(encode(items)), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 #==============================================================================
 # API ENDPOINTS
 #==============================================================================
-@app.route('/scrape/amazon', methods=['GET'])
 def scrape_amazon_api():
-    """ API endpoint for Amazon. Ex: /scrape/amazon?q=laptop """
+    """
+    API endpoint for Amazon. Ex: /scrape/amazon?q=laptop&max_results=100&min_price=20000&sort=rating&limit=10
+    With index=1 (on any /scrape/<source>) the search index answers instead
+    when it holds enough matching products seen in the last max_age seconds.
+    """
     search_query = request.args.get('q')
     if not search_query:
         return jsonify({"error": "A search query 'q' is required."}), 400
+    try:
+        page, max_results = parse_paging_args(request.args)
+        stream = parse_stream_format(request.args)
+        filters, sort, limit = parse_filter_args(request.args)
+        max_age = parse_index(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     print(f"Received API request to scrape Amazon for: {search_query}")
-    scraped_data = scrape_amazon_products(search_query)
+    max_results = results_needed(max_results, sort, limit)
+    if max_age is not None:
+        response = indexed_response('amazon', search_query, page, max_results, filters, sort, limit, max_age)
+        if response is not None:
+            return response
+    if stream:
+        return stream_response(iter_source_products('amazon', search_query, page, max_results, filters), stream, limit)
+    scraped_data = get_scraper('amazon')(search_query, page=page, max_results=max_results, filters=filters)
     
     if isinstance(scraped_data, dict) and "error" in scraped_data:
         return jsonify(scraped_data), 500
-    return jsonify(scraped_data)
+    return json_response('amazon', select(scraped_data, sort, limit))
 
 
-@app.route('/scrape/myntra', methods=['GET'])
 def scrape_myntra_api():
-    """ API endpoint for Myntra. Ex: /scrape/myntra?q=shirts """
+    """ API endpoint for Myntra. Ex: /scrape/myntra?q=shirts&page=1&max_results=100 """
     search_query = request.args.get('q')
     if not search_query:
         return jsonify({"error": "A search query 'q' is required."}), 400
+    try:
+        page, max_results = parse_paging_args(request.args)
+        stream = parse_stream_format(request.args)
+        filters, sort, limit = parse_filter_args(request.args)
+        max_age = parse_index(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     print(f"Received API request to scrape Myntra for: {search_query}")
-    scraped_data = scrape_myntra_products(search_query)
+    max_results = results_needed(max_results, sort, limit)
+    if max_age is not None:
+        response = indexed_response('myntra', search_query, page, max_results, filters, sort, limit, max_age)
+        if response is not None:
+            return response
+    if stream:
+        return stream_response(iter_source_products('myntra', search_query, page, max_results, filters), stream, limit)
+    scraped_data = get_scraper('myntra')(search_query, page=page, max_results=max_results, filters=filters)
 
     if isinstance(scraped_data, dict) and "error" in scraped_data:
         return jsonify(scraped_data), 500
-    return jsonify(scraped_data)
-
-# @app.route('/scrape/flipkart', methods=['GET'])
-# def scrape_flipkart_api():
-#     """ API endpoint for Flipkart. Ex: /scrape/flipkart?q=mobile """
-#     search_query = request.args.get('q')
-#     if not search_query:
-#         return jsonify({"error": "A search query 'q' is required."}), 400
+    return json_response('myntra', select(scraped_data, sort, limit))
+
+@api.route('/scrape/all', methods=['GET'])
+def scrape_all_api():
+    """
+    API endpoint for every marketplace at once.
+    Ex: /scrape/all?q=shoes&sources=amazon,myntra&deadline=10&max_price=2000&sort=price&limit=20
+    With group=1 the response also has 'groups': the same item on different
+    sources grouped together with its cheapest offer, ordered and limited
+    like the products.
+    """
+    search_query = request.args.get('q')
+    if not search_query:
+        return jsonify({"error": "A search query 'q' is required."}), 400
+
+    try:
+        sources = parse_sources(request.args.get('sources'))
+        deadline = parse_deadline(request.args)
+        page, max_results = parse_paging_args(request.args)
+        stream = parse_stream_format(request.args)
+        filters, sort, limit = parse_filter_args(request.args)
+        group = parse_group(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"Received API request to scrape {', '.join(sources)} for: {search_query}")
+    if not group:
+        # Grouping looks at every product, so only trim the scrape without it.
+        max_results = results_needed(max_results, sort, limit)
+    if stream:
+        return stream_response(iter_all(search_query, sources, deadline, page=page, max_results=max_results,
+                                        filters=filters), stream, limit)
+    scraped_data = scrape_all(search_query, sources, deadline, page=page, max_results=max_results, filters=filters)
+
+    # Every source out of time is a gateway timeout; a failed scrape is ours.
+    failed = failure_status(scraped_data['sources'])
+    if failed is not None:
+        return jsonify(scraped_data), failed
+    if group:
+        with metrics.span('all', 'match'):
+            groups = match_products(scraped_data['products'])
+        scraped_data['groups'] = [entry.to_dict() for entry in select_groups(groups, sort, limit)]
+    scraped_data['products'] = select(scraped_data['products'], sort, limit)
+    return json_response('all', scraped_data)
+
+def scrape_flipkart_api():
+    """ API endpoint for Flipkart. Ex: /scrape/flipkart?q=mobile&page=1&max_results=100 """
+    search_query = request.args.get('q')
+    if not search_query:
+        return jsonify({"error": "A search query 'q' is required."}), 400
+    try:
+        page, max_results = parse_paging_args(request.args)
+        stream = parse_stream_format(request.args)
+        filters, sort, limit = parse_filter_args(request.args)
+        max_age = parse_index(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-#     print(f"Received API request to scrape Flipkart for: {search_query}")
-#     scraped_data = scrape_flipkart_products(search_query)
+    print(f"Received API request to scrape Flipkart for: {search_query}")
+    max_results = results_needed(max_results, sort, limit)
+    if max_age is not None:
+        response = indexed_response('flipkart', search_query, page, max_results, filters, sort, limit, max_age)
+        if response is not None:
+            return response
+    if stream:
+        return stream_response(iter_source_products('flipkart', search_query, page, max_results, filters), stream, limit)
+    scraped_data = get_scraper('flipkart')(search_query, page=page, max_results=max_results, filters=filters)
+
+    if isinstance(scraped_data, dict) and "error" in scraped_data:
+        return jsonify(scraped_data), 500
+    return json_response('flipkart', select(scraped_data, sort, limit))
+
+@api.route('/scrape/batch', methods=['POST'])
+def scrape_batch_api():
+    """
+    Scrapes many queries in one request and streams one result record per
+    query and source as each finishes, as NDJSON or CSV.
+    Ex body: {"queries": ["laptop", "shoes"], "sources": ["amazon", "myntra"], "max_results": 50}
+    """
+    try:
+        job = batch.parse_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"Received API request to batch scrape {len(job.queries)} queries on {', '.join(job.sources)}")
+    return Response(stream_with_context(batch.encode_stream(batch.run_batch(job), job.format)),
+                    mimetype=batch.BATCH_FORMATS[job.format],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api.route('/search', methods=['GET'])
+def search_api():
+    """
+    Searches everything already scraped, without going upstream.
+    Ex: /search?q=running shoes&sources=amazon,myntra&max_price=3000&min_rating=4&order=price&limit=20
+    'match=any' finds products with any of the words instead of all of them.
+    """
+    if search_index.store is None:
+        return jsonify({"error": "The search index is off; set SCRAPER_SEARCH_DB to enable it."}), 503
+    search_query = request.args.get('q')
+    if not search_query:
+        return jsonify({"error": "A search query 'q' is required."}), 400
+    try:
+        sources, order, limit, any_word = parse_search_args(request.args)
+        filters = parse_bounds(request.args)
+        since = parse_since(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    hits = search_index.store.search(search_query, sources, filters, since, order, limit, any_word)
+    return jsonify([{**product.to_dict(), 'indexed_at': indexed_at} for product, indexed_at in hits])
+
+@api.route('/watchlist', methods=['GET'])
+def watchlist_api():
+    """ Lists the queries the crawl scheduler keeps pre-scraped, with their last refresh. """
+    return jsonify([watch.status() for watch in scheduler.scheduler.watches()])
+
+
+@api.route('/watchlist', methods=['POST', 'DELETE'])
+def edit_watchlist_api():
+    """
+    Adds (POST) or removes (DELETE) a watched query.
+    Ex body: {"source": "amazon", "q": "laptop", "interval": 600, "priority": 5}
+    """
+    try:
+        entry = request.get_json(silent=True)
+        if request.method == 'DELETE':
+            if not scheduler.unwatch(entry):
+                return jsonify({"error": "That query is not being watched."}), 404
+            return jsonify({"removed": True})
+        return jsonify(scheduler.watch(entry).status()), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@api.route('/history/<source>/<product_id>', methods=['GET'])
+def product_history_api(source, product_id):
+    """ Price history of one product. Ex: /history/amazon/B0CX23V2ZK?since=2024-05-01 """
+    if price_history.store is None:
+        return jsonify({"error": "Price history is off; set SCRAPER_HISTORY_DB to enable it."}), 503
+    try:
+        since = parse_since(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(price_history.store.history(source, product_id, since))
+
+
+@api.route('/history/drops', methods=['GET'])
+def price_drops_api():
+    """ Price drops since a time, largest first. Ex: /history/drops?since=2024-05-01&source=myntra """
+    if price_history.store is None:
+        return jsonify({"error": "Price history is off; set SCRAPER_HISTORY_DB to enable it."}), 503
+    try:
+        since = parse_since(request.args, default=time.time() - 86400)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(price_history.store.drops_since(since, request.args.get('source')))
+
+@api.route('/metrics', methods=['GET'])
+def metrics_api():
+    """ Prometheus metrics: per-stage timings, request latency and upstream counters, per source. """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# /scrape/<source> endpoints, by source.
+SCRAPE_VIEWS = {
+    'amazon': scrape_amazon_api,
+    'myntra': scrape_myntra_api,
+    'flipkart': scrape_flipkart_api,
+}
+
+
+#==============================================================================
+# APP FACTORY
+#==============================================================================
+def create_app():
+    """
+    Builds the Flask app with the routes of the enabled sources
+    (SCRAPER_SOURCES). Creating it imports no scraper; see gunicorn.conf.py
+    for serving it with warmed-up workers.
+    """
+    app = Flask(__name__)
+    app.json = ProductJSONProvider(app)
+    # Enable CORS for all routes
+    CORS(app)
+    app.register_blueprint(api)
+    for source in ENABLED_SOURCES:
+        app.add_url_rule(f'/scrape/{source}', view_func=SCRAPE_VIEWS[source], methods=['GET'])
+    return app
+
 
-#     if isinstance(scraped_data, dict) and "error" in scraped_data:
-#         return jsonify(scraped_data), 500
-#     return jsonify(scraped_data)
+app = create_app()
 
 # --- Main execution block ---
 if __name__ == "__main__":
     # To run this app:
     # 1. Make sure you have the folder structure correct.
-    # 2. Run 'python app.py' in your terminal.
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # 2. Run 'python app.py' in your terminal (FLASK_DEBUG=1 for the debugger and reloader).
+    #    This is the single-process development server; in production run
+    #    'gunicorn -c gunicorn.conf.py' instead.
+    # 3. Optionally set SCRAPER_WATCHLIST to a JSON watchlist to keep those queries pre-scraped.
+    # The reloader's watcher process must not crawl, only the process serving requests.
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        scheduler.start()
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,268 @@
+import asyncio
+import time
+
+from quart import Quart, Response, g, request, jsonify
+from quart.json.provider import DefaultJSONProvider
+# Import the async scraper functions
+from scraper_api.async_scrapers import (ASYNC_SCRAPERS, close_client, iter_all_async,
+                                        iter_source_products_async, scrape_all_async)
+from scraper_api import batch, metrics, price_history, scheduler, search_index
+from scraper_api.fanout import failure_status, parse_sources
+from scraper_api.sources import is_enabled
+from scraper_api.product import Product
+from scraper_api.filters import limit_stream_async, results_needed, select
+from scraper_api.matching import match_products, select_groups
+from scraper_api.params import (parse_bounds, parse_deadline, parse_filter_args, parse_group, parse_index,
+                                parse_paging_args, parse_search_args, parse_since, parse_stream_format)
+from scraper_api.streaming import STREAM_FORMATS, encode_async
+
+class ProductJSONProvider(DefaultJSONProvider):
+    """ Writes Products with Product.to_dict instead of the generic deep-copying dataclasses.asdict. """
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, Product):
+            return obj.to_dict()
+        return DefaultJSONProvider.default(obj)
+
+
+# --- ASGI App Initialization ---
+# Serves the same routes as app.py, but every upstream fetch is a coroutine,
+# so one process keeps hundreds of scrapes in flight while parsing runs on a
+# worker pool.
+app = Quart(__name__)
+app.json = ProductJSONProvider(app)
+
+
+@app.after_request
+async def add_cors_headers(response):
+    # Same open CORS policy as flask_cors.CORS(app) in app.py
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    return response
+
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request_latency(response):
+    """ Records how long each /scrape request took, per source, for /metrics. """
+    rule = request.url_rule
+    if rule is not None and rule.rule.startswith('/scrape/') and 'request_started' in g:
+        source = rule.rule.rsplit('/', 1)[1]
+        metrics.REQUEST_SECONDS.observe(source, str(response.status_code),
+                                        value=time.perf_counter() - g.request_started)
+    return response
+
+
+@app.before_serving
+async def startup():
+    # Keep the watchlist pre-scraped; its results are served by the cached scrapers.
+    scheduler.start()
+
+
+@app.after_serving
+async def shutdown():
+    scheduler.scheduler.stop()
+    await close_client()
+
+
+def json_response(source, value):
+    """ jsonify() with the encoding timed as the source's 'serialize' stage. """
+    with metrics.span(source, 'serialize'):
+        return jsonify(value)
+
+
+def stream_response(items, stream, limit=None):
+    """ Sends items from an async iterator to the client as they arrive, up to 'limit' products. """
+    _, mimetype = STREAM_FORMATS[stream]
+    if limit is not None:
+        items = limit_stream_async(items, limit)
+    return Response(encode_async(items, stream), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+#==============================================================================
+# API ENDPOINTS
+#==============================================================================
+async def scrape_source(source):
+    # Like app.py, which has no route at all for a source left out of SCRAPER_SOURCES.
+    if not is_enabled(source):
+        return jsonify({"error": f"Source '{source}' is not enabled on this server."}), 404
+    search_query = request.args.get('q')
+    if not search_query:
+        return jsonify({"error": "A search query 'q' is required."}), 400
+    try:
+        page, max_results = parse_paging_args(request.args)
+        stream = parse_stream_format(request.args)
+        filters, sort, limit = parse_filter_args(request.args)
+        max_age = parse_index(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"Received API request to scrape {source} for: {search_query}")
+    max_results = results_needed(max_results, sort, limit)
+    if max_age is not None:
+        products = await asyncio.to_thread(search_index.lookup_scrape, source, search_query, page, max_results,
+                                           filters, max_age)
+        if products is not None:
+            response = json_response(source, select(products, sort, limit))
+            response.headers['X-Served-From'] = 'index'
+            return response
+    if stream:
+        return stream_response(iter_source_products_async(source, search_query, page, max_results, filters),
+                               stream, limit)
+    scraped_data = await ASYNC_SCRAPERS[source](search_query, page=page, max_results=max_results, filters=filters)
+
+    if isinstance(scraped_data, dict) and "error" in scraped_data:
+        return jsonify(scraped_data), 500
+    return json_response(source, select(scraped_data, sort, limit))
+
+
+@app.route('/scrape/amazon', methods=['GET'])
+async def scrape_amazon_api():
+    """ API endpoint for Amazon. Ex: /scrape/amazon?q=laptop """
+    return await scrape_source('amazon')
+
+
+@app.route('/scrape/myntra', methods=['GET'])
+async def scrape_myntra_api():
+    """ API endpoint for Myntra. Ex: /scrape/myntra?q=shirts """
+    return await scrape_source('myntra')
+
+
+@app.route('/scrape/flipkart', methods=['GET'])
+async def scrape_flipkart_api():
+    """ API endpoint for Flipkart. Ex: /scrape/flipkart?q=mobile """
+    return await scrape_source('flipkart')
+
+
+@app.route('/scrape/all', methods=['GET'])
+async def scrape_all_api():
+    """
+    API endpoint for every marketplace at once.
+    Ex: /scrape/all?q=shoes&sources=amazon,myntra&deadline=10&max_price=2000&sort=price&limit=20
+    With group=1 the response also has 'groups': the same item on different
+    sources grouped together with its cheapest offer, ordered and limited
+    like the products.
+    """
+    search_query = request.args.get('q')
+    if not search_query:
+        return jsonify({"error": "A search query 'q' is required."}), 400
+
+    try:
+        sources = parse_sources(request.args.get('sources'))
+        deadline = parse_deadline(request.args)
+        page, max_results = parse_paging_args(request.args)
+        stream = parse_stream_format(request.args)
+        filters, sort, limit = parse_filter_args(request.args)
+        group = parse_group(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"Received API request to scrape {', '.join(sources)} for: {search_query}")
+    if not group:
+        # Grouping looks at every product, so only trim the scrape without it.
+        max_results = results_needed(max_results, sort, limit)
+    if stream:
+        return stream_response(iter_all_async(search_query, sources, deadline, page=page, max_results=max_results,
+                                              filters=filters), stream, limit)
+    scraped_data = await scrape_all_async(search_query, sources, deadline, page=page, max_results=max_results,
+                                          filters=filters)
+
+    # Every source out of time is a gateway timeout; a failed scrape is ours.
+    failed = failure_status(scraped_data['sources'])
+    if failed is not None:
+        return jsonify(scraped_data), failed
+    if group:
+        with metrics.span('all', 'match'):
+            groups = await asyncio.to_thread(match_products, scraped_data['products'])
+        scraped_data['groups'] = [entry.to_dict() for entry in select_groups(groups, sort, limit)]
+    scraped_data['products'] = select(scraped_data['products'], sort, limit)
+    return json_response('all', scraped_data)
+
+@app.route('/scrape/batch', methods=['POST'])
+async def scrape_batch_api():
+    """ Scrapes many queries in one request, streaming NDJSON or CSV, as in app.py. """
+    try:
+        job = batch.parse_batch(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"Received API request to batch scrape {len(job.queries)} queries on {', '.join(job.sources)}")
+    return Response(batch.encode_stream_async(batch.run_batch_async(job), job.format),
+                    mimetype=batch.BATCH_FORMATS[job.format],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/search', methods=['GET'])
+async def search_api():
+    """ Searches everything already scraped, without going upstream, as in app.py. """
+    if search_index.store is None:
+        return jsonify({"error": "The search index is off; set SCRAPER_SEARCH_DB to enable it."}), 503
+    search_query = request.args.get('q')
+    if not search_query:
+        return jsonify({"error": "A search query 'q' is required."}), 400
+    try:
+        sources, order, limit, any_word = parse_search_args(request.args)
+        filters = parse_bounds(request.args)
+        since = parse_since(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    hits = await asyncio.to_thread(search_index.store.search, search_query, sources, filters, since, order, limit,
+                                   any_word)
+    return jsonify([{**product.to_dict(), 'indexed_at': indexed_at} for product, indexed_at in hits])
+
+@app.route('/watchlist', methods=['GET'])
+async def watchlist_api():
+    """ Lists the queries the crawl scheduler keeps pre-scraped, with their last refresh. """
+    return jsonify([watch.status() for watch in scheduler.scheduler.watches()])
+
+
+@app.route('/watchlist', methods=['POST', 'DELETE'])
+async def edit_watchlist_api():
+    """ Adds (POST) or removes (DELETE) a watched query, as in app.py. """
+    try:
+        entry = await request.get_json(silent=True)
+        if request.method == 'DELETE':
+            if not scheduler.unwatch(entry):
+                return jsonify({"error": "That query is not being watched."}), 404
+            return jsonify({"removed": True})
+        return jsonify(scheduler.watch(entry).status()), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/history/<source>/<product_id>', methods=['GET'])
+async def product_history_api(source, product_id):
+    """ Price history of one product. Ex: /history/amazon/B0CX23V2ZK?since=2024-05-01 """
+    if price_history.store is None:
+        return jsonify({"error": "Price history is off; set SCRAPER_HISTORY_DB to enable it."}), 503
+    try:
+        since = parse_since(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(await asyncio.to_thread(price_history.store.history, source, product_id, since))
+
+
+@app.route('/history/drops', methods=['GET'])
+async def price_drops_api():
+    """ Price drops since a time, largest first. Ex: /history/drops?since=2024-05-01&source=myntra """
+    if price_history.store is None:
+        return jsonify({"error": "Price history is off; set SCRAPER_HISTORY_DB to enable it."}), 503
+    try:
+        since = parse_since(request.args, default=time.time() - 86400)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(await asyncio.to_thread(price_history.store.drops_since, since, request.args.get('source')))
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_api():
+    """ Prometheus metrics: per-stage timings, request latency and upstream counters, per source. """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    # For production run it under an ASGI server instead, e.g.:
+    #   hypercorn asgi:app --bind 0.0.0.0:5000
+    #   uvicorn asgi:app --host 0.0.0.0 --port 5000
+    app.run(host='0.0.0.0', port=5000)
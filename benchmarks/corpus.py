@@ -0,0 +1,312 @@
+"""
+The page corpus the benchmarks run on.
+
+Recorded pages live in benchmarks/fixtures/<source>/*.html. Record them from
+the live sites, or add pages the scrapers saved to SCRAPER_DUMP_DIR:
+
+    python -m benchmarks.corpus record amazon "laptop" --pages 3
+    python -m benchmarks.corpus add flipkart debug_pages/flipkart-no_results-*.html
+    python -m benchmarks.corpus list
+
+A source with no recorded pages falls back to synthetic pages built from the
+markup the parsers look for. They are generated from a fixed seed, so they
+are identical on every run and every machine.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+
+# --- Corpus Settings (overridable through the environment) ---
+FIXTURES_DIR = os.environ.get('BENCH_FIXTURES_DIR', os.path.join(os.path.dirname(__file__), 'fixtures'))
+SOURCES = ('amazon', 'myntra', 'flipkart')
+# Synthetic pages generated per source when it has no recorded ones.
+SYNTHETIC_PAGES = 5
+SEED = 1
+
+
+def fixture_paths(source):
+    """ Returns the recorded pages of a source, in name order. """
+    return sorted(glob.glob(os.path.join(FIXTURES_DIR, source, '*.html')))
+
+
+def load(source):
+    """
+    Returns the corpus of one source.
+
+    Returns:
+        tuple: (kind, pages) where kind is 'recorded' or 'synthetic' and
+               pages is a list of (name, bytes).
+    """
+    paths = fixture_paths(source)
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                pages.append((os.path.basename(path), f.read()))
+        return 'recorded', pages
+    return 'synthetic', [(f"synthetic-{n}.html", synthesize(source, n)) for n in range(1, SYNTHETIC_PAGES + 1)]
+
+
+def digest(pages):
+    """ A short hash of a corpus, so results from different corpora are never compared. """
+    h = hashlib.sha256()
+    for name, content in pages:
+        h.update(name.encode())
+        h.update(content)
+    return h.hexdigest()[:12]
+
+
+#==============================================================================
+# SYNTHETIC PAGES
+#==============================================================================
+_WORDS = ('Wireless', 'Bluetooth', 'Cotton', 'Slim', 'Fit', 'Smart', 'Ultra', 'Pro', 'Max', 'Men',
+          'Women', 'Casual', 'Running', 'Shoes', 'Laptop', 'Backpack', 'Watch', 'Headphones', 'Noise',
+          'Cancelling', 'Stainless', 'Steel', 'Bottle', 'Printed', 'Round', 'Neck', 'T-Shirt', 'Kurta',
+          # Non-ASCII names catch a backend that decodes pages differently from the others.
+          'Café', 'Crème', '–')
+_BRANDS = ('Roadster', 'HRX', 'boAt', 'Noise', 'Puma', 'Levis', 'Lenovo', 'HP', 'Milton', 'Skybags')
+
+
+def _name(rng):
+    return f"{rng.choice(_BRANDS)} " + ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(4, 12)))
+
+
+def _rupees(value):
+    return f"₹{value:,}"
+
+
+def _noise(rng, kilobytes):
+    # Inline script and style of the kind that makes up most of a real result page.
+    chunk = ''.join(f"var s{i}={{id:{rng.randint(0, 10 ** 6)},k:'{rng.random():.8f}'}};" for i in range(40))
+    return chunk * max(1, kilobytes * 1024 // len(chunk))
+
+
+def _links(label, count):
+    return ''.join(f'<a href="/{label}/{i}">{label} {i}</a>' for i in range(count))
+
+
+def _amazon_page(rng, page):
+    items = []
+    for n in range(rng.randint(22, 26)):
+        asin = f"B0{rng.randrange(16 ** 8):08X}"
+        if n % 9 == 4:
+            # Sponsored carousels and "related searches" blocks carry a data-asin but no price.
+            items.append(f'<div data-asin="" data-component-type="s-impression-logger" class="s-result-item">'
+                         f'<div class="a-section"><span class="a-size-medium-plus">Related searches</span>'
+                         f'<a class="a-link-normal" href="/s?k=related+{n}">related {n}</a></div></div>')
+            continue
+        price = rng.randint(149, 149999)
+        name = _name(rng)
+        title = (f'<h2 class="a-size-medium a-spacing-none a-color-base a-text-normal">'
+                 f'<span>{name}</span></h2>')
+        if n % 4:
+            title = f'<a class="a-link-normal s-line-clamp-2 s-link-style" href="/{asin}/dp/{asin}?ref=sr_1_{n}">{title}</a>'
+        rating = ''
+        if n % 6:
+            stars = rng.randint(25, 50) / 10
+            rating = (f'<div class="a-row a-size-small"><span class="a-declarative">'
+                      f'<i class="a-icon a-icon-star-small"><span class="a-icon-alt">{stars} out of 5 stars</span></i>'
+                      f'</span><a class="a-link-normal s-underline-link-text" href="#customerReviews">'
+                      f'<span class="a-size-base s-underline-text">{rng.randint(1, 90000):,}</span></a></div>')
+        items.append(
+            f'<div data-asin="{asin}" data-index="{n}" data-component-type="s-search-result" '
+            f'class="sg-col-4-of-24 s-result-item s-asin sg-col-20-of-24 s-widget-spacing-small">'
+            f'<div class="sg-col-inner"><div class="s-widget-container s-spacing-small">'
+            f'<div class="puis-card-container"><span class="rush-component">'
+            f'<a class="a-link-normal s-no-outline" href="/{asin}/dp/{asin}?ref=sr_img_{n}">'
+            f'<div class="a-section aok-relative s-image-fixed-height">'
+            f'<img class="s-image" src="https://m.media-amazon.com/images/I/{asin}._AC_UY218_.jpg" '
+            f'alt="{name}" data-image-latency="s-product-image"></div></a></span>'
+            f'<div class="a-section a-spacing-small"><div class="a-section a-spacing-none puis-padding-right-small">'
+            f'{title}</div>{rating}'
+            f'<div class="a-row a-size-base a-color-base"><a class="a-link-normal s-no-hover" href="/{asin}/dp/{asin}">'
+            f'<span class="a-price" data-a-size="xl" data-a-color="base"><span class="a-offscreen">{_rupees(price)}</span>'
+            f'<span aria-hidden="true"><span class="a-price-symbol">₹</span><span class="a-price-whole">{price:,}</span>'
+            f'</span></span><span class="a-price a-text-price" data-a-strike="true"><span class="a-offscreen">'
+            f'{_rupees(price * 2)}</span></span></a></div>'
+            f'<div class="a-row"><span class="a-color-secondary">FREE delivery <b>Tomorrow</b></span></div>'
+            f'</div></div></div></div></div>')
+    return (f'<!doctype html><html lang="en-in"><head><title>Amazon.in : page {page}</title>'
+            f'<style>{_noise(rng, 40)}</style><script>{_noise(rng, 120)}</script></head><body>'
+            f'<div id="nav-main">{_links("nav", 200)}</div>'
+            f'<div class="s-main-slot s-result-list s-search-results sg-row">{"".join(items)}</div>'
+            f'<script>{_noise(rng, 80)}</script><div id="navFooter">{_links("footer", 150)}</div>'
+            f'</body></html>').encode('utf-8')
+
+
+def _myntra_page(rng, page):
+    products = []
+    for n in range(50):
+        product_id = rng.randint(10 ** 7, 4 * 10 ** 7)
+        price = rng.randint(299, 9999)
+        product = {
+            'landingPageUrl': f"tshirts/{rng.choice(_BRANDS).lower()}/{product_id}/buy",
+            'productId': product_id,
+            'productName': _name(rng),
+            'rating': rng.random() * 5 if n % 5 else 0,
+            'ratingCount': rng.randint(0, 40000),
+            'isFastFashion': True,
+            'discount': rng.randint(0, 70),
+            'brand': rng.choice(_BRANDS),
+            'searchImage': f"https://assets.myntassets.com/h_720,q_90,w_540/{product_id}/1.jpg",
+            'sizes': 'S,M,L,XL,XXL',
+            'images': [{'view': view, 'src': f"https://assets.myntassets.com/assets/images/{product_id}/{view}.jpg"}
+                       for view in ('default', 'front', 'back', 'left', 'right')],
+            'gender': rng.choice(('Men', 'Women')),
+            'primaryColour': rng.choice(('Black', 'White', 'Navy Blue')),
+            'discountLabel': 'Flat_Search_Percent',
+            'discountDisplayLabel': f"({rng.randint(10, 70)}% OFF)",
+            'additionalInfo': 'Pure Cotton T-shirt',
+            'category': 'Tshirts',
+            'mrp': price * 2,
+            'price': price * 2,
+            'inventoryInfo': [{'skuId': product_id * 10 + s, 'label': label, 'inventory': rng.randint(0, 50),
+                               'available': True} for s, label in enumerate(('S', 'M', 'L', 'XL'))],
+            'catalogDate': '1693526400000',
+            'season': 'Summer',
+            'year': '2023',
+            'articleType': 'Tshirts',
+        }
+        if n % 3:
+            product['discountedPrice'] = price
+        products.append(product)
+    state = {
+        'pageName': 'Search',
+        'searchData': {
+            'results': {'totalCount': 12000, 'products': products},
+            'filters': {'primaryFilters': [{'id': 'Brand', 'filterValues': [{'id': b, 'count': 100} for b in _BRANDS]}]},
+        },
+        'seo': {'metaData': {'title': f"Buy T-shirts online - page {page}"}},
+    }
+    return (f'<!DOCTYPE html><html><head><title>Myntra</title><script>{_noise(rng, 60)}</script></head>'
+            f'<body><div id="mountRoot"></div>'
+            f'<script>window.__myx = {json.dumps(state)};</script>'
+            f'<script>{_noise(rng, 40)}</script></body></html>').encode('utf-8')
+
+
+def _specs(rng):
+    return ''.join(f'<li class="J+igdf">{rng.choice(_WORDS)} {rng.randint(2, 512)} GB</li>' for _ in range(6))
+
+
+def _flipkart_page(rng, page):
+    rows = ['<div class="cPHDOP col-12-12"><div class="_5THWM1"><span>Showing results</span></div></div>']
+    for n in range(24):
+        data_id = f"MOB{rng.randrange(36 ** 12):012X}"
+        price = rng.randint(499, 149999)
+        name = _name(rng)
+        rating = ''
+        if n % 5:
+            rating = (f'<span class="Y1HWO0"><div class="_3LWZlK">{rng.randint(30, 50) / 10}'
+                      f'<img src="data:image/svg+xml;base64,PHN2Zz48L3N2Zz4=" class="Rza2QY"></div></span>'
+                      f'<span class="_2_R_DZ">({rng.randint(1, 90000):,})</span>')
+        rows.append(
+            f'<div class="cPHDOP col-12-12"><div class="_75nlfW"><div data-id="{data_id}" style="width:100%">'
+            f'<div class="tUxRFH"><a class="CGtC98" href="/product/p/itm{data_id.lower()}?pid={data_id}">'
+            f'<div class="Otbq5D"><div class="_4WELSP"><img loading="eager" class="_53J4C-" alt="{name}" '
+            f'src="https://rukminim2.flixcart.com/image/312/312/{data_id.lower()}.jpeg?q=70"></div></div>'
+            f'<div class="yKfJKb row"><div class="col col-7-12"><a class="WKTcLC" title="{name}" '
+            f'href="/product/p/itm{data_id.lower()}">{name}</a>'
+            f'<div class="_5OesEi">{rating}</div>'
+            f'<div class="_6NESgJ"><ul class="G4BRas">{_specs(rng)}'
+            f'</ul></div></div><div class="col col-5-12 BfVC2z"><div class="cN1yYO"><div class="hl05eU">'
+            f'<div class="Nx9bqj _4b5DiR">{_rupees(price)}</div><div class="yRaY8j ZYYwLA">{_rupees(price * 2)}</div>'
+            f'<div class="UkUFwK"><span>{rng.randint(5, 60)}% off</span></div></div></div></div></div>'
+            f'</a></div></div></div></div>')
+    return (f'<!DOCTYPE html><html lang="en"><head><title>Flipkart page {page}</title>'
+            f'<style>{_noise(rng, 30)}</style></head><body><div id="container">'
+            f'<div class="_1YokD2 _3Mn1Gg">{"".join(rows)}</div></div>'
+            f'<script>{_noise(rng, 60)}</script></body></html>').encode('utf-8')
+
+
+_GENERATORS = {'amazon': _amazon_page, 'myntra': _myntra_page, 'flipkart': _flipkart_page}
+
+
+def synthesize(source, page=1, seed=SEED):
+    """ Returns a deterministic synthetic result page for a source. """
+    return _GENERATORS[source](random.Random(f"{source}:{page}:{seed}"), page)
+
+
+#==============================================================================
+# RECORDING
+#==============================================================================
+def _save(source, name, content):
+    directory = os.path.join(FIXTURES_DIR, source)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(content.encode('utf-8') if isinstance(content, str) else content)
+    return path
+
+
+def _fetch_live(source, search_query, page):
+    from scraper_api.sources import get_module
+    module = get_module(source)
+    url = module.build_search_url(search_query, page)
+    if source == 'flipkart':
+        driver = module.driver_pool.acquire()
+        broken = True
+        try:
+            driver.get(url)
+            # The lean browser returns from get() before the listings render.
+            module.wait_for_listings(driver)
+            content = driver.page_source
+            broken = False
+        finally:
+            module.driver_pool.release(driver, broken=broken)
+        return content
+    from scraper_api.sessions import fetch
+    response = fetch(url, headers=module.HEADERS, timeout=15, source=source)
+    response.raise_for_status()
+    return response.content
+
+
+def record(source, search_query, pages=1):
+    """ Fetches result pages from the live site into the corpus. Returns the paths written. """
+    slug = '-'.join(search_query.lower().split())
+    written = []
+    for page in range(1, pages + 1):
+        written.append(_save(source, f"{slug}-p{page}.html", _fetch_live(source, search_query, page)))
+    return written
+
+
+def add(source, paths):
+    """ Copies saved pages (e.g. from SCRAPER_DUMP_DIR) into the corpus. Returns the paths written. """
+    directory = os.path.join(FIXTURES_DIR, source)
+    os.makedirs(directory, exist_ok=True)
+    return [shutil.copy(path, os.path.join(directory, os.path.basename(path))) for path in paths]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.corpus', description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_cmd = commands.add_parser('record', help='fetch live result pages into the corpus')
+    record_cmd.add_argument('source', choices=SOURCES)
+    record_cmd.add_argument('query')
+    record_cmd.add_argument('--pages', type=int, default=1)
+    add_cmd = commands.add_parser('add', help='copy saved pages into the corpus')
+    add_cmd.add_argument('source', choices=SOURCES)
+    add_cmd.add_argument('paths', nargs='+')
+    commands.add_parser('list', help='show what each source will be benchmarked on')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        for path in record(args.source, args.query, args.pages):
+            print(f"Recorded {path}")
+    elif args.command == 'add':
+        for path in add(args.source, args.paths):
+            print(f"Added {path}")
+    else:
+        for source in SOURCES:
+            kind, pages = load(source)
+            size = sum(len(content) for _, content in pages)
+            print(f"{source:<9} {kind:<10} {len(pages)} pages, {size / 1024:.0f} KiB, corpus {digest(pages)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
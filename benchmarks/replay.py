@@ -0,0 +1,143 @@
+"""
+A local HTTP server that replays the benchmark corpus in place of the live
+sites. It answers the search URLs the scrapers build:
+
+    /s?k=...&page=N       Amazon
+    /search?q=...&page=N  Flipkart
+    /<query>?p=N          Myntra
+
+Page N of a query is the Nth page of that source's corpus, wrapping around,
+so any query and any page number get a result page.
+
+Run it on its own and point the scrapers at it:
+
+    python -m benchmarks.replay --port 8765 --latency 0.2
+    AMAZON_BASE_URL=http://127.0.0.1:8765 MYNTRA_BASE_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks import corpus
+
+
+def route(path):
+    """ Maps a request path to (source, page number). """
+    url = urlsplit(path)
+    query = parse_qs(url.query)
+    if url.path == '/s':
+        return 'amazon', int(query.get('page', ['1'])[0])
+    if url.path == '/search':
+        return 'flipkart', int(query.get('page', ['1'])[0])
+    return 'myntra', int(query.get('p', ['1'])[0])
+
+
+class ReplayServer:
+    """
+    Serves corpus pages over HTTP/1.1 with keep-alive, from a background
+    thread. 'latency' adds a fixed delay to every response, to stand in for
+    the network round trip of the real sites.
+    """
+
+    def __init__(self, pages=None, host='127.0.0.1', port=0, latency=0.0):
+        # source -> list of page bytes; defaults to the full corpus.
+        self.pages = pages or {source: [content for _, content in corpus.load(source)[1]]
+                               for source in corpus.SOURCES}
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        """ The host:port the scrapers see, which is also the rate limiter's key. """
+        host, port = self._httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self):
+        return f"http://{self.host}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                try:
+                    source, page = route(self.path)
+                except ValueError:
+                    self.send_error(400)
+                    return
+                pages = server.pages.get(source)
+                if not pages:
+                    self.send_error(404)
+                    return
+                body = pages[(max(page, 1) - 1) % len(pages)]
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """ Serves from the calling thread until interrupted. """
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.replay', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    args = parser.parse_args(argv)
+
+    server = ReplayServer(host=args.host, port=args.port, latency=args.latency)
+    print(f"Replaying the benchmark corpus on {server.url}; point AMAZON_BASE_URL, "
+          f"MYNTRA_BASE_URL and FLIPKART_BASE_URL at it.")
+    server.serve_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
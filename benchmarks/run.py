@@ -0,0 +1,618 @@
+"""
+Offline benchmarks for every parser backend and scraper.
+
+    python -m benchmarks.run                         # all sections, printed as tables
+    python -m benchmarks.run --only parse,fields     # skip the end-to-end scrapes
+    python -m benchmarks.run --save before.json
+    python -m benchmarks.run --compare before.json   # exits 1 on a regression
+
+Sections:
+  parse   pages/sec, products/sec and peak memory of each parser backend; exits
+          1 if the backends of a source disagree on any page
+  fields  milliseconds per page spent in each extraction stage and field
+  scrape  pages/sec, products/sec and peak memory of each scraper, end to end
+          against the replay server (Flipkart only when Chrome can start)
+  match   products/sec of cross-source matching over every source's products
+  startup milliseconds to a serving Flask app and its first scrapes, and the
+          memory of each worker, for each way of starting it (see
+          benchmarks/startup.py)
+
+Pages come from benchmarks/corpus.py, so nothing touches the live sites.
+"""
+import os
+
+# Keep benchmark runs away from any configured cache, history, rate-limit,
+# watchlist, dump, page cache or search index files. This has to happen
+# before scraper_api is imported.
+for _setting in ('SCRAPER_CACHE_DB', 'SCRAPER_HISTORY_DB', 'SCRAPER_RATE_LIMIT_DB',
+                 'SCRAPER_WATCHLIST', 'SCRAPER_DUMP_DIR', 'SCRAPER_PAGE_CACHE_DB', 'SCRAPER_SEARCH_DB'):
+    os.environ[_setting] = ''
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import multiprocessing
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from bs4 import BeautifulSoup
+
+from benchmarks import corpus
+from benchmarks.replay import ReplayServer
+from scraper_api import amazon, matching, myntra_scraper, parse_pool, rate_limit
+from scraper_api.product import Product, to_count, to_paise, to_rating
+
+try:
+    from scraper_api import flipkart
+except ImportError:
+    flipkart = None
+
+try:
+    from scraper_api import async_scrapers
+except ImportError:
+    async_scrapers = None
+
+SECTIONS = ('parse', 'fields', 'scrape', 'match', 'startup')
+QUERY = 'benchmark query'
+# Relative change past which --compare reports a regression.
+DEFAULT_THRESHOLD = 0.10
+
+
+def _quiet():
+    # The scrapers print a line or two per page; keep them out of the report.
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _peak_mib(func, *args):
+    """ Runs func(*args) under tracemalloc and returns the peak allocation in MiB. """
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def _max_rss_mib():
+    # VmHWM belongs to this process alone; ru_maxrss on Linux can carry over
+    # the high-water mark of the process that spawned it.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def _rss_growth(parse, pages):
+    # Runs in a fresh process, so the high-water mark is from this parse alone.
+    before = _max_rss_mib()
+    with _quiet():
+        for content in pages:
+            parse(content)
+    return _max_rss_mib() - before
+
+
+def _peak_rss_mib(parse, pages):
+    """
+    How far parsing the pages raises the resident set of a fresh process.
+    Unlike tracemalloc, this counts memory allocated in C, such as lxml trees.
+    """
+    if resource is None:
+        return None
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(_rss_growth, parse, pages).result()
+
+
+#==============================================================================
+# PARSE: whole-page throughput of each backend
+#==============================================================================
+@contextlib.contextmanager
+def _stdlib_json():
+    # parse_myntra_page decodes with orjson whenever it is importable.
+    saved, myntra_scraper.orjson = myntra_scraper.orjson, None
+    try:
+        yield
+    finally:
+        myntra_scraper.orjson = saved
+
+
+def _parse_myntra_stdlib(content):
+    with _stdlib_json():
+        return myntra_scraper.parse_myntra_page(content)
+
+
+def parse_backends():
+    """ Returns {(source, backend): parse function} for every backend available here. """
+    backends = {}
+    for name in amazon.PARSERS:
+        backends['amazon', name] = functools.partial(amazon.parse_amazon_page, parser=name)
+    if myntra_scraper.orjson is not None:
+        backends['myntra', 'orjson'] = myntra_scraper.parse_myntra_page
+    backends['myntra', 'json'] = _parse_myntra_stdlib
+    if flipkart is not None:
+        backends['flipkart', 'bs4'] = flipkart.parse_flipkart_page
+    return backends
+
+
+def backend_mismatches(pages):
+    """
+    Parses every page with each backend of its source and returns the
+    (source, backend, page index) whose products differ from the first
+    backend's. The backends of a source must agree exactly, names included.
+    """
+    by_source = {}
+    for (source, backend), parse in parse_backends().items():
+        if source in pages:
+            by_source.setdefault(source, []).append((backend, parse))
+    mismatches = []
+    with _quiet():
+        for source, backends in by_source.items():
+            for index, content in enumerate(pages[source]):
+                expected = backends[0][1](content)
+                mismatches += [(source, backend, index) for backend, parse in backends[1:]
+                               if parse(content) != expected]
+    return mismatches
+
+
+def bench_parse(parse, pages, repeat):
+    """
+    Times a parser over every corpus page, 'repeat' times, and keeps the best
+    pass. 'peak_mib' is the most Python memory any single page needed;
+    'peak_rss_mib' also counts memory allocated in C.
+    """
+    best = None
+    products = 0
+    with _quiet():
+        parse(pages[0])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            products = sum(len(parse(content) or ()) for content in pages)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        peak = max(_peak_mib(parse, content) for content in pages)
+    results = {
+        'pages_per_sec': len(pages) / best,
+        'products_per_sec': products / best,
+        'ms_per_page': best * 1000 / len(pages),
+        'peak_mib': peak,
+    }
+    peak_rss = _peak_rss_mib(parse, pages)
+    if peak_rss is not None:
+        results['peak_rss_mib'] = peak_rss
+    return results
+
+
+#==============================================================================
+# FIELDS: where the time goes inside one page
+#==============================================================================
+# Each profile is (steps, fields). The steps run in order, each on the output
+# of the one before, and the last one returns the product items. Each field
+# is then timed on its own over every item, so its cost is what reading that
+# one field adds to a page.
+
+def _amazon_bs4_url(item):
+    title = item.select_one('h2.a-size-medium.a-color-base.a-text-normal')
+    if title is not None and title.parent is not None and title.parent.name != 'a':
+        return item.select_one('a.a-link-normal.s-no-outline')
+    return title.parent if title is not None else None
+
+
+def _bs4_text(element):
+    return element.get_text(strip=True) if element else None
+
+
+AMAZON_BS4 = (
+    [('document', lambda content: BeautifulSoup(content, 'html.parser')),
+     ('items', lambda soup: [item for item in soup.find_all('div', {'data-asin': True})
+                             if item.select_one('span.a-price')])],
+    [('price', lambda item: to_paise(_bs4_text(item.select_one('span.a-price span.a-offscreen')))),
+     ('rating', lambda item: to_rating(_bs4_text(item.select_one('span.a-icon-alt')))),
+     ('name', lambda item: _bs4_text(item.select_one('h2.a-size-medium.a-color-base.a-text-normal'))),
+     ('url', _amazon_bs4_url),
+     ('reviews', lambda item: to_count(_bs4_text(item.select_one('span.a-size-base.s-underline-text')))),
+     ('image', lambda item: item.select_one('img.s-image'))],
+)
+
+
+def _lxml_text(element):
+    return amazon._text(element) if element is not None else None
+
+
+def _amazon_lxml_url(found):
+    title = found.get('title')
+    parent = title.getparent() if title is not None else None
+    return parent if parent is not None and parent.tag == 'a' else found.get('link')
+
+
+AMAZON_LXML = (
+    [('document', lambda content: amazon.lxml.html.document_fromstring(content)),
+     ('items', lambda tree: amazon._find_items(tree)),
+     ('walk', lambda items: [found for found in map(amazon._extract_fields, items) if 'price_block' in found])],
+    [('price', lambda found: to_paise(_lxml_text(found.get('price')))),
+     ('rating', lambda found: to_rating(_lxml_text(found.get('rating')))),
+     ('name', lambda found: _lxml_text(found.get('title'))),
+     ('url', _amazon_lxml_url),
+     ('reviews', lambda found: to_count(_lxml_text(found.get('reviews')))),
+     ('image', lambda found: found.get('image'))],
+)
+
+MYNTRA = (
+    [('decode', myntra_scraper.extract_products_json)],
+    [('price', lambda product: to_paise(product.get('discountedPrice', product.get('price', 0)))),
+     ('rating', lambda product: to_rating(product.get('rating'))),
+     ('name', lambda product: f"{product.get('brand', '')} {product.get('productName', '')}".strip()),
+     ('url', lambda product: product.get('landingPageUrl')),
+     ('reviews', lambda product: to_count(product.get('ratingCount'))),
+     ('image', lambda product: (product.get('images') or [{}])[0].get('src'))],
+)
+
+
+def _flipkart_find(item, *selectors):
+    for tag, class_name in selectors:
+        element = item.find(tag, class_=class_name)
+        if element:
+            return element
+    return None
+
+
+FLIPKART = (
+    [('document', lambda content: BeautifulSoup(content, 'html.parser')),
+     ('items', lambda soup: soup.find_all('div', class_=['_1xHGtK _373qXS', '_1AtVbE', 'cPHDOP']))],
+    [('price', lambda item: to_paise(_bs4_text(_flipkart_find(item, ('div', 'Nx9bqj'), ('div', '_30jeq3'))))),
+     ('rating', lambda item: to_rating(_bs4_text(item.find('div', class_='_3LWZlK')))),
+     ('name', lambda item: _bs4_text(_flipkart_find(item, ('a', 'WKTcLC'), ('div', '_4rR01T'), ('a', 's1Q9rs')))),
+     ('id', lambda item: item if item.get('data-id') else item.find(attrs={'data-id': True})),
+     ('reviews', lambda item: to_count(_bs4_text(item.find('span', class_='_2_R_DZ')))),
+     ('image', lambda item: _flipkart_find(item, ('img', '_53J4C-'), ('img', '_396cs4')))],
+)
+
+
+def field_profiles():
+    """ Returns {(source, backend): profile} for every backend available here. """
+    profiles = {('amazon', 'bs4'): AMAZON_BS4}
+    if amazon.lxml is not None:
+        profiles['amazon', 'lxml'] = AMAZON_LXML
+    profiles['myntra', 'orjson' if myntra_scraper.orjson is not None else 'json'] = MYNTRA
+    if flipkart is not None:
+        profiles['flipkart', 'bs4'] = FLIPKART
+    return profiles
+
+
+def _profile_page(profile, content):
+    steps, fields = profile
+    timings = {}
+    value = content
+    for name, step in steps:
+        start = time.perf_counter()
+        value = step(value)
+        timings[name] = time.perf_counter() - start
+    items = list(value or ())
+    for name, extract in fields:
+        start = time.perf_counter()
+        for item in items:
+            extract(item)
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def bench_fields(profile, pages, repeat):
+    """ Returns the best-of-'repeat' milliseconds per page of each stage and field. """
+    best = {}
+    for _ in range(repeat):
+        totals = {}
+        for content in pages:
+            for name, seconds in _profile_page(profile, content).items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        for name, seconds in totals.items():
+            best[name] = min(best.get(name, seconds), seconds)
+    return {f"{name}_ms": seconds * 1000 / len(pages) for name, seconds in best.items()}
+
+
+#==============================================================================
+# SCRAPE: end to end against the replay server
+#==============================================================================
+def _run_async(make_coro):
+    async def run():
+        try:
+            return await make_coro()
+        finally:
+            await async_scrapers.close_client()
+    return asyncio.run(run())
+
+
+def _flipkart_available():
+    try:
+        driver = flipkart.driver_pool.acquire()
+    except Exception as e:
+        print(f"Skipping the Flipkart scraper: no browser could start ({e.__class__.__name__}).")
+        return False
+    flipkart.driver_pool.release(driver)
+    return True
+
+
+def scrapers():
+    """ Returns {(source, variant): (scrape(query, max_results), per_page)}, uncached. """
+    targets = {
+        ('amazon', 'sync'): (amazon.scrape_amazon_products.uncached, amazon.PER_PAGE),
+        ('myntra', 'sync'): (myntra_scraper.scrape_myntra_products.uncached, myntra_scraper.PER_PAGE),
+    }
+    if async_scrapers is not None:
+        for source, module in (('amazon', amazon), ('myntra', myntra_scraper)):
+            scrape = async_scrapers.ASYNC_SCRAPERS[source].uncached
+            targets[source, 'async'] = (
+                lambda q, max_results, scrape=scrape: _run_async(lambda: scrape(q, max_results=max_results)),
+                module.PER_PAGE)
+    if flipkart is not None and _flipkart_available():
+        targets['flipkart', 'selenium'] = (flipkart.scrape_flipkart_products.uncached, flipkart.PER_PAGE)
+    return targets
+
+
+def bench_scrape(scrape, per_page, server, pages, repeat):
+    """
+    Scrapes 'pages' result pages through the replay server, 'repeat' times,
+    and keeps the best run. Peak memory is this process only; pages parsed
+    on the parse pool are not counted.
+    """
+    max_results = pages * per_page
+    best = None
+    with _quiet():
+        # The first run starts the parse pool and opens connections.
+        scrape(QUERY, max_results=max_results)
+        for _ in range(repeat):
+            served = server.requests
+            start = time.perf_counter()
+            result = scrape(QUERY, max_results=max_results)
+            elapsed = time.perf_counter() - start
+            if isinstance(result, dict):
+                raise RuntimeError(result.get('error'))
+            run = (elapsed, server.requests - served, len(result))
+            best = run if best is None or elapsed < best[0] else best
+        peak = _peak_mib(scrape, QUERY, max_results)
+    elapsed, fetched, products = best
+    return {
+        'pages_per_sec': fetched / elapsed,
+        'products_per_sec': products / elapsed,
+        'seconds': elapsed,
+        'peak_mib': peak,
+    }
+
+
+#==============================================================================
+# MATCH: grouping the same item across sources
+#==============================================================================
+# Real result sets for one query are a few hundred products; the corpus is
+# repeated with distinct ids to get to MATCH_PRODUCTS, so the measure
+# reflects a large multi-page /scrape/all?group=1.
+MATCH_PRODUCTS = 5000
+
+
+def match_products(pages):
+    """ Every product of the corpus pages, repeated up to MATCH_PRODUCTS with distinct ids. """
+    with _quiet():
+        products = [product for source, source_pages in pages.items() for content in source_pages
+                    for product in parse_pool._parse(source, content, None) or ()]
+    copies = -(-MATCH_PRODUCTS // max(len(products), 1))
+    return [Product(p.source, f"{p.product_id}-{copy}", p.name, p.price, p.rating, p.reviews)
+            for copy in range(copies) for p in products][:MATCH_PRODUCTS]
+
+
+def bench_match(products, repeat):
+    """ Groups 'products' 'repeat' times and keeps the best run. """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matching.match_products(products)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'products_per_sec': len(products) / best,
+        'seconds': best,
+    }
+
+
+#==============================================================================
+# STARTUP: cold start of the app and the cost of each worker
+#==============================================================================
+def bench_startup(variant, sources, repeat):
+    """
+    Starts the app 'repeat' times in fresh interpreters, serving 'sources',
+    and keeps the best of each metric. Returns None if it cannot start, e.g.
+    for Flipkart without Selenium.
+    """
+    env = dict(os.environ, SCRAPER_SOURCES=','.join(sources), SCRAPER_PARSE_PROCESSES='0')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best = {}
+    for _ in range(repeat):
+        run = subprocess.run([sys.executable, '-m', 'benchmarks.startup', variant], capture_output=True, text=True,
+                             cwd=root, env=env)
+        if run.returncode != 0:
+            print(f"Skipping startup/{variant}: {run.stderr.strip().splitlines()[-1:]}")
+            return None
+        for name, value in json.loads(run.stdout.strip().splitlines()[-1]).items():
+            best[name] = min(value, best.get(name, value))
+    return best
+
+
+#==============================================================================
+# REPORTING
+#==============================================================================
+def _print_section(title, results):
+    if not results:
+        return
+    columns = []
+    for metrics in results.values():
+        columns += [name for name in metrics if name not in columns]
+    width = max(len(key) for key in results) + 2
+    print(f"\n{title}")
+    print(' ' * width + ''.join(f"{name:>18}" for name in columns))
+    for key, metrics in results.items():
+        cells = ''.join(f"{metrics[name]:>18.3f}" if name in metrics else ' ' * 18 for name in columns)
+        print(f"{key:<{width}}{cells}")
+
+
+def _print_stages(title, results):
+    # One line per backend: the stage and field columns differ between sources.
+    if not results:
+        return
+    width = max(len(key) for key in results) + 2
+    print(f"\n{title}")
+    for key, metrics in results.items():
+        stages = '  '.join(f"{name[:-3]} {value:.3f}" for name, value in metrics.items())
+        print(f"{key:<{width}}{stages}")
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Prints how each metric moved against a saved baseline report. Metrics
+    named *_per_sec should go up; every other metric should go down.
+
+    Returns:
+        list: The (result, metric, change) entries that got worse by more than 'threshold'.
+    """
+    regressions = []
+    changed_corpus = {source for source, info in report['corpus'].items()
+                      if baseline.get('corpus', {}).get(source, {}).get('digest') != info['digest']}
+    for source in sorted(changed_corpus):
+        print(f"Not comparing {source}: its corpus differs from the baseline's.")
+
+    print(f"\nCompared with {baseline.get('commit') or 'the baseline'} (worse by over {threshold:.0%} is flagged)")
+    for key, metrics in report['results'].items():
+        old_metrics = baseline.get('results', {}).get(key)
+        # Match results span several sources, e.g. 'match amazon+myntra/minhash'.
+        key_sources = set(key.split()[1].split('/')[0].split('+'))
+        if not old_metrics or key_sources & changed_corpus:
+            continue
+        for name, value in metrics.items():
+            old = old_metrics.get(name)
+            if not old:
+                continue
+            change = (value - old) / old
+            worse = -change if name.endswith('_per_sec') else change
+            flag = '  REGRESSION' if worse > threshold else ''
+            if worse > threshold:
+                regressions.append((key, name, change))
+            print(f"  {key:<24} {name:<18} {old:>12.3f} -> {value:>12.3f}  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--only', default=','.join(SECTIONS), help='comma-separated sections to run')
+    parser.add_argument('--sources', default=','.join(corpus.SOURCES), help='comma-separated sources')
+    parser.add_argument('--repeat', type=int, default=5, help='passes per measurement; the best is kept')
+    parser.add_argument('--scrape-pages', type=int, default=10, help='result pages per end-to-end scrape')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the replay server waits per page')
+    parser.add_argument('--save', help='write the report to this JSON file')
+    parser.add_argument('--compare', help='a report saved with --save to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    sections = [name for name in args.only.split(',') if name]
+    sources = [name for name in args.sources.split(',') if name]
+    unknown = set(sections) - set(SECTIONS) | set(sources) - set(corpus.SOURCES)
+    if unknown:
+        parser.error(f"unknown section or source: {', '.join(sorted(unknown))}")
+
+    corpora = {source: corpus.load(source) for source in sources}
+    pages = {source: [content for _, content in corpus_pages] for source, (_, corpus_pages) in corpora.items()}
+    report = {
+        'commit': _commit(),
+        'created_at': time.time(),
+        'python': sys.version.split()[0],
+        'parse_processes': parse_pool.PARSE_PROCESSES,
+        'corpus': {source: {'kind': kind, 'pages': len(corpus_pages), 'digest': corpus.digest(corpus_pages)}
+                   for source, (kind, corpus_pages) in corpora.items()},
+        'results': {},
+    }
+    for source, info in report['corpus'].items():
+        print(f"{source}: {info['pages']} {info['kind']} pages (corpus {info['digest']})")
+
+    mismatches = []
+    if 'parse' in sections:
+        mismatches = backend_mismatches(pages)
+        for source, backend, index in mismatches:
+            print(f"MISMATCH: {source}/{backend} parses page {index + 1} differently from the other backends")
+        results = {f"parse {source}/{backend}": bench_parse(parse, pages[source], args.repeat)
+                   for (source, backend), parse in parse_backends().items() if source in pages}
+        _print_section('Parsers (per backend)', results)
+        report['results'].update(results)
+
+    if 'fields' in sections:
+        results = {f"fields {source}/{backend}": bench_fields(profile, pages[source], args.repeat)
+                   for (source, backend), profile in field_profiles().items() if source in pages}
+        _print_stages('Extraction stages and fields (ms per page)', results)
+        report['results'].update(results)
+
+    if 'scrape' in sections:
+        with ReplayServer(pages=pages, latency=args.latency) as server:
+            for module in (amazon, myntra_scraper, flipkart):
+                if module is not None:
+                    module.BASE_URL = server.url
+            # The replay server is not the site; don't throttle it.
+            rate_limit.RATES[server.host] = (1e6, 10 ** 6)
+            results = {}
+            for (source, variant), (scrape, per_page) in scrapers().items():
+                if source in pages:
+                    results[f"scrape {source}/{variant}"] = bench_scrape(
+                        scrape, per_page, server, args.scrape_pages, args.repeat)
+        parse_pool.shutdown()
+        if flipkart is not None:
+            flipkart.driver_pool.shutdown()
+        _print_section(f"Scrapers ({args.scrape_pages} pages, {args.latency:g}s replay latency)", results)
+        report['results'].update(results)
+
+    if 'match' in sections:
+        products = match_products(pages)
+        results = {f"match {'+'.join(sources)}/minhash": bench_match(products, args.repeat)}
+        _print_section(f"Cross-source matching ({len(products)} products)", results)
+        report['results'].update(results)
+
+    if 'startup' in sections:
+        results = {}
+        for variant in ('lazy', 'eager', 'warm', 'fork'):
+            result = bench_startup(variant, sources, args.repeat)
+            if result is not None:
+                results[f"startup app/{variant}"] = result
+        _print_section(f"Startup ({', '.join(sources)})", results)
+        report['results'].update(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved the report to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+One cold start of the Flask app in this fresh interpreter, printed as a JSON
+line for the 'startup' section of benchmarks/run.py:
+
+    python -m benchmarks.startup lazy|eager|warm|fork
+
+  lazy   import the app; each scraper loads on its source's first request
+  eager  import every enabled scraper along with the app, as app.py used to
+  warm   import the app and warm up the enabled sources, as the gunicorn
+         master does before forking
+  fork   'warm', then fork a worker as gunicorn does and measure the worker
+
+SCRAPER_SOURCES picks the sources, as for the server.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+VARIANTS = ('lazy', 'eager', 'warm', 'fork')
+
+
+def _memory_mib():
+    # Resident set, and the part of it no other process maps: what one more
+    # worker actually costs when it shares the master's pages.
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Private_Clean', 'Private_Dirty'):
+                    fields[name] = int(value.split()[0]) / 2 ** 10
+    except OSError:
+        return {}
+    return {'rss_mib': fields['Rss'], 'private_mib': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def _serve_first_requests(app):
+    """
+    What a worker pays before it has served each enabled source once: a
+    first request, and loading the scrapers that are not loaded yet.
+    """
+    from scraper_api import sources
+    start = time.perf_counter()
+    app.test_client().get('/metrics')
+    first_request = time.perf_counter() - start
+    with contextlib.redirect_stdout(io.StringIO()):
+        sources.warm_up()
+    return {'first_request_ms': first_request * 1000,
+            'first_scrape_ms': (time.perf_counter() - start - first_request) * 1000,
+            **_memory_mib()}
+
+
+def measure(variant):
+    start = time.perf_counter()
+    from scraper_api import sources
+    if variant == 'eager':
+        for source in sources.ENABLED_SOURCES:
+            sources.get_scraper(source)
+    import app
+    if variant in ('warm', 'fork'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            sources.warm_up()
+    result = {'start_ms': (time.perf_counter() - start) * 1000}
+    if variant != 'fork':
+        result.update(_serve_first_requests(app.app))
+        return result
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        with os.fdopen(write, 'w') as f:
+            json.dump(_serve_first_requests(app.app), f)
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as f:
+        result.update(json.load(f))
+    os.waitpid(pid, 0)
+    return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in VARIANTS:
+        sys.exit(f"usage: python -m benchmarks.startup {'|'.join(VARIANTS)}")
+    print(json.dumps(measure(sys.argv[1])))
@@ -0,0 +1,77 @@
+"""
+Production server for the Flask app: a pre-forking gunicorn with one worker
+process per core, each serving requests on a pool of threads.
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py        (or just 'gunicorn' from this folder)
+
+The app is loaded and the enabled sources warmed up once, in the master,
+before the workers are forked (see sources.warm_up), so every worker starts
+ready to scrape and shares the imported code with the master instead of
+holding its own copy.
+"""
+import fcntl
+import os
+
+# --- Server Settings (overridable through the environment) ---
+bind = os.environ.get('SCRAPER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('SCRAPER_WORKERS', str(os.cpu_count() or 2)))
+# Scrapes mostly wait on the sites, so each worker serves several at once.
+worker_class = 'gthread'
+threads = int(os.environ.get('SCRAPER_THREADS', '8'))
+# A /scrape/all waits up to its deadline (at most 60s) and a Flipkart page
+# for its browser; a batch streams for as long as it runs.
+timeout = int(os.environ.get('SCRAPER_WORKER_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+preload_app = True
+wsgi_app = 'app:app'
+# Recycle workers now and then, so a slow leak cannot grow without bound.
+# With the app preloaded a new worker is just a fork of the master.
+max_requests = 5000
+max_requests_jitter = 500
+
+# The workers already spread parsing over the cores; a parse process pool
+# in each of them would start cores x cores processes. Parse inline instead
+# unless SCRAPER_PARSE_PROCESSES says otherwise. This has to be set before
+# the app is loaded.
+os.environ.setdefault('SCRAPER_PARSE_PROCESSES', '0')
+
+# Only one worker runs the watchlist crawl: the one holding this lock. When
+# it exits, the worker started in its place takes the lock over. Watchlist
+# edits through /watchlist only reach the worker that serves them, so with
+# several workers edit the SCRAPER_WATCHLIST file and reload (kill -HUP).
+SCHEDULER_LOCK = os.environ.get('SCRAPER_SCHEDULER_LOCK', '/tmp/scraper-scheduler.lock')
+_scheduler_lock = None
+
+
+def on_starting(server):
+    from scraper_api import rate_limit, sources
+    timings = sources.warm_up()
+    server.log.info("Warmed up %s", ', '.join(f"{source} in {seconds * 1000:.0f} ms"
+                                              for source, seconds in timings.items()))
+    if server.cfg.workers > 1 and not rate_limit.RATE_LIMIT_DB:
+        server.log.warning("SCRAPER_RATE_LIMIT_DB is not set: each of the %d workers keeps its own rate "
+                           "limits, so the sites see up to %d times the configured rates.",
+                           server.cfg.workers, server.cfg.workers)
+
+
+def post_fork(server, worker):
+    global _scheduler_lock
+    from scraper_api import cache, page_cache, price_history, scheduler, search_index
+    # The SQLite files were opened in the master when the app was loaded.
+    cache.reopen()
+    for store in (page_cache.store, price_history.store, search_index.store):
+        if store is not None:
+            store.reopen()
+
+    lock = open(SCHEDULER_LOCK, 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return
+    # Kept open for the life of the worker; the lock goes with it.
+    _scheduler_lock = lock
+    server.log.info("Worker %s runs the crawl scheduler", worker.pid)
+    scheduler.start()
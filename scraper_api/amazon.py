@@ -1,46 +1,56 @@
-import requests
+import os
+import threading
 from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+from scraper_api import metrics
+from scraper_api.sessions import fetch
+from scraper_api.cache import cached
+from scraper_api.singleflight import single_flight
+from scraper_api.price_history import record_history
+from scraper_api.search_index import index_products
+from scraper_api.product import Product, to_count, to_paise, to_rating
+from scraper_api.filters import FilteredPage
+from scraper_api.pagination import fetch_pages
+from scraper_api.parse_pool import parse_page
 
-def scrape_amazon_products(search_query):
-    """
-    Scrapes Amazon.in for products based on a search query.
-    Note: This uses 'requests' and is faster but more likely to be blocked.
-    """
-    search_query = search_query.replace(' ', '+')
-    url = f"https://www.amazon.in/s?k={search_query}"
-    print(f"Attempting to fetch data from Amazon: {url}")
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:
+    lxml = None
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Connection": "keep-alive"
-    }
+#==============================================================================
+# PARSER BACKENDS
+#==============================================================================
+# Each backend yields the Products of a result page in order. 'lxml' is
+# the fast C-based path; 'bs4' is the original BeautifulSoup path, kept as a
+# fallback for when lxml is not installed. Given a ProductFilter as 'keep',
+# they check it as soon as price and rating are read and yield None for a
+# rejected product, skipping the rest of its fields. Both time building the
+# tree ('document') and reading the items ('extract') in scraper_api.metrics.
 
-    products = []
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        print(f"Amazon Response Status Code: {response.status_code}")
-        if response.status_code != 200:
-            return {"error": f"Failed to retrieve page, status code: {response.status_code}"}
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
+def _iter_with_bs4(content, keep=None):
+    with metrics.span('amazon', 'document'):
+        soup = BeautifulSoup(content, 'html.parser')
         results = soup.find_all('div', {'data-asin': True})
-        
+
+    with metrics.span('amazon', 'extract'):
         for item in results:
             if not item.select_one('span.a-price'):
                 continue
 
-            # --- Price Cleaning Logic ---
-            price_text = 'N/A'
             price_element = item.select_one('span.a-price span.a-offscreen')
-            if price_element:
-                # Remove currency symbols and commas, then strip whitespace
-                price_text = price_element.get_text(strip=True).replace('\u20b9', '').replace('₹', '').replace(',', '')
+            price = to_paise(price_element.get_text(strip=True)) if price_element else None
+            if price is None:
+                continue
+            rating_element = item.select_one('span.a-icon-alt')
+            rating = to_rating(rating_element.get_text(strip=True)) if rating_element else None
+            if keep is not None and not keep.accepts(price, rating):
+                yield None
+                continue
 
             # Get product URL
-            product_url = 'N/A'
+            product_url = None
             title_element = item.select_one('h2.a-size-medium.a-color-base.a-text-normal')
             if title_element and title_element.parent:
                 if title_element.parent.name == 'a':
@@ -50,21 +60,254 @@ def scrape_amazon_products(search_query):
                     if url_element:
                         product_url = 'https://www.amazon.in' + url_element.get('href', '')
 
-            product_data = {
-                'name': title_element.get_text(strip=True) if title_element else 'N/A',
-                'price': price_text,
-                'rating': item.select_one('span.a-icon-alt').get_text(strip=True) if item.select_one('span.a-icon-alt') else 'N/A',
-                'reviews': item.select_one('span.a-size-base.s-underline-text').get_text(strip=True).replace(',', '') if item.select_one('span.a-size-base.s-underline-text') else 'N/A',
-                'image_url': item.select_one('img.s-image')['src'] if item.select_one('img.s-image') else 'N/A',
-                'url': product_url
-            }
-
-            if product_data['name'] != 'N/A' and product_data['price'] != 'N/A':
-                products.append(product_data)
-    
+            reviews_element = item.select_one('span.a-size-base.s-underline-text')
+            image_element = item.select_one('img.s-image')
+
+            name = title_element.get_text(strip=True) if title_element else None
+            if name:
+                yield Product(
+                    'amazon', item.get('data-asin') or None, name, price,
+                    rating=rating,
+                    reviews=to_count(reviews_element.get_text(strip=True)) if reviews_element else None,
+                    image_url=image_element.get('src') if image_element else None,
+                    url=product_url,
+                )
+
+
+# --- Compiled extraction plan for the lxml backend ---
+# Maps (tag, class) to the field it identifies. Every field the bs4 path finds
+# with its own select_one is picked up here in one walk over the item, taking
+# the first match in document order just like select_one does.
+_PLAN = {
+    'span': [
+        ('price_block', {'a-price'}),
+        ('price', {'a-offscreen'}),
+        ('rating', {'a-icon-alt'}),
+        ('reviews', {'a-size-base', 's-underline-text'}),
+    ],
+    'h2': [('title', {'a-size-medium', 'a-color-base', 'a-text-normal'})],
+    'a': [('link', {'a-link-normal', 's-no-outline'})],
+    'img': [('image', {'s-image'})],
+}
+_PLAN_FIELDS = {field for rules in _PLAN.values() for field, _ in rules}
+
+if lxml is not None:
+    _find_items = etree.XPath('//div[@data-asin]')
+    # Text the way get_text(strip=True) sees it: no comments, scripts or styles.
+    _text_nodes = etree.XPath('.//text()[not(parent::script) and not(parent::style)]')
+
+
+def _text(element):
+    return ''.join(t.strip() for t in _text_nodes(element))
+
+
+def _extract_fields(item):
+    found = {}
+    price_block = None
+    for element in item.iter(*_PLAN):
+        class_attr = element.get('class')
+        if not class_attr:
+            continue
+        classes = set(class_attr.split())
+        for field, required in _PLAN[element.tag]:
+            if field in found or not required <= classes:
+                continue
+            if field == 'price':
+                # Only an a-offscreen span inside an a-price block holds the price.
+                if price_block is None or not any(a is price_block for a in element.iterancestors('span')):
+                    continue
+            found[field] = element
+            if field == 'price_block':
+                price_block = element
+        if len(found) == len(_PLAN_FIELDS):
+            break
+    return found
+
+
+def _lxml_parser(content):
+    # Without a declared charset lxml reads bytes as Latin-1, which turns
+    # 'Café' into 'CafÃ©'. Amazon serves UTF-8, which is also what bs4 takes
+    # such a page to be; a page that does declare its charset is left to lxml.
+    if isinstance(content, bytes) and not EncodingDetector.find_declared_encoding(content, is_html=True):
+        # lxml parsers must not be shared between threads.
+        parser = getattr(_parsers, 'utf8', None)
+        if parser is None:
+            parser = _parsers.utf8 = lxml.html.HTMLParser(encoding='utf-8')
+        return parser
+    return None
+
+
+def _iter_with_lxml(content, keep=None):
+    if not content:
+        return
+    with metrics.span('amazon', 'document'):
+        tree = lxml.html.document_fromstring(content, parser=_lxml_parser(content))
+        items = _find_items(tree)
+
+    with metrics.span('amazon', 'extract'):
+        for item in items:
+            found = _extract_fields(item)
+            if 'price_block' not in found:
+                continue
+
+            price_element = found.get('price')
+            price = to_paise(_text(price_element)) if price_element is not None else None
+            if price is None:
+                continue
+            rating_element = found.get('rating')
+            rating = to_rating(_text(rating_element)) if rating_element is not None else None
+            if keep is not None and not keep.accepts(price, rating):
+                yield None
+                continue
+
+            product_url = None
+            title_element = found.get('title')
+            if title_element is not None:
+                parent = title_element.getparent()
+                if parent is not None and parent.tag == 'a':
+                    product_url = 'https://www.amazon.in' + parent.get('href', '')
+                elif 'link' in found:
+                    product_url = 'https://www.amazon.in' + found['link'].get('href', '')
+
+            reviews_element = found.get('reviews')
+            image_element = found.get('image')
+
+            name = _text(title_element) if title_element is not None else None
+            if name:
+                yield Product(
+                    'amazon', item.get('data-asin') or None, name, price,
+                    rating=rating,
+                    reviews=to_count(_text(reviews_element)) if reviews_element is not None else None,
+                    image_url=image_element.get('src') if image_element is not None else None,
+                    url=product_url,
+                )
+
+
+PARSERS = {'bs4': _iter_with_bs4}
+if lxml is not None:
+    PARSERS['lxml'] = _iter_with_lxml
+_parsers = threading.local()
+
+# Backend used when none is given, overridable with AMAZON_PARSER.
+DEFAULT_PARSER = os.environ.get('AMAZON_PARSER', 'lxml' if lxml is not None else 'bs4')
+
+
+def _backend(parser):
+    parser = parser or DEFAULT_PARSER
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown Amazon parser '{parser}'. Available: {', '.join(PARSERS)}")
+    return PARSERS[parser]
+
+
+def iter_amazon_page(content, parser=None, keep=None):
+    """
+    Yields the products of an Amazon search result page as they are extracted.
+
+    Args:
+        content (bytes): The raw HTML of the page.
+        parser (str): A key of PARSERS. Defaults to DEFAULT_PARSER.
+        keep (ProductFilter): Only yield products that pass it.
+    """
+    return (product for product in _backend(parser)(content, keep) if product is not None)
+
+
+def parse_amazon_page(content, parser=None, keep=None):
+    """
+    Extracts products from an Amazon search result page.
+
+    Args:
+        content (bytes): The raw HTML of the page.
+        parser (str): A key of PARSERS. Defaults to DEFAULT_PARSER.
+        keep (ProductFilter): Only return products that pass it.
+
+    Returns:
+        list: A list of Products, or a FilteredPage of them when 'keep' is given.
+    """
+    if keep is None:
+        return list(_backend(parser)(content))
+    items = list(_backend(parser)(content, keep))
+    return FilteredPage([item for item in items if item is not None], scanned=len(items))
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+    "Connection": "keep-alive"
+}
+# Products on a typical search result page, used to size page batches.
+PER_PAGE = 20
+HOST = 'www.amazon.in'
+# Where search pages are fetched from; point it at a replay server to run offline.
+BASE_URL = os.environ.get('AMAZON_BASE_URL', 'https://www.amazon.in')
+# What a search page with no products says instead, past the last page or
+# for a query nothing matches.
+NO_RESULTS_MARKERS = (b'No results for', b's-no-results')
+
+
+def is_unrecognised_page(content):
+    """
+    Whether a page that gave no products is neither a result page nor
+    Amazon's "no results" page: a block page or a layout the parsers do not
+    know, worth saving for a look.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return b'data-asin' not in content and not any(marker in content for marker in NO_RESULTS_MARKERS)
+
+
+def build_search_url(search_query, page=1):
+    """ Returns the Amazon.in search URL for a query and result page. """
+    url = f"{BASE_URL}/s?k={search_query.replace(' ', '+')}"
+    if page > 1:
+        url += f"&page={page}"
+    return url
+
+
+def scrape_amazon_page(search_query, page=1, filters=None):
+    """
+    Scrapes a single Amazon.in search result page, keeping only the products
+    that pass 'filters' (a ProductFilter) when given.
+
+    Returns:
+        list: The products on the page, or a dict with an "error" key.
+    """
+    url = build_search_url(search_query, page)
+    print(f"Attempting to fetch data from Amazon: {url}")
+
+    try:
+        response = fetch(url, headers=HEADERS, timeout=15, source='amazon')
+        print(f"Amazon Response Status Code: {response.status_code}")
+        if response.status_code != 200:
+            return {"error": f"Failed to retrieve page, status code: {response.status_code}"}
+
+        # Parsing is CPU bound, so it runs on the parse worker processes
+        products = parse_page('amazon', response.content, filters)
+
     except Exception as e:
         print(f"An unexpected error occurred during Amazon scraping: {e}")
         return {"error": str(e)}
 
-    print(f"Successfully parsed {len(products)} products from Amazon.")
+    print(f"Successfully parsed {len(products)} products from Amazon page {page}.")
     return products
+
+
+@cached('amazon')
+@single_flight('amazon')
+@record_history('amazon')
+@index_products('amazon')
+def scrape_amazon_products(search_query, page=1, max_results=None, filters=None):
+    """
+    Scrapes Amazon.in for products based on a search query.
+    Note: This uses pooled 'requests' sessions and is faster but more likely to be blocked.
+
+    Args:
+        search_query (str): The product to search for.
+        page (int): The result page to start from.
+        max_results (int): Collect up to this many products across pages,
+                           fetched concurrently. None fetches just 'page'.
+        filters (ProductFilter): Only collect products that pass it.
+    """
+    return fetch_pages(lambda n: scrape_amazon_page(search_query, n, filters),
+                       HOST, page, max_results, per_page=PER_PAGE)
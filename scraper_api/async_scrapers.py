@@ -0,0 +1,399 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from scraper_api import amazon, metrics, myntra_scraper, page_cache, rate_limit
+from scraper_api.cache import async_cached
+from scraper_api.fanout import DEFAULT_DEADLINE, DEFAULT_SOURCES
+from scraper_api.pagination import DEFAULT_HOST_CONCURRENCY, HOST_CONCURRENCY, MAX_PAGES, page_exhausted
+from scraper_api.parse_pool import parse_page_async
+from scraper_api.sessions import RETRY_STATUSES, RETRY_TOTAL, retry_delay
+from scraper_api.singleflight import async_single_flight
+from scraper_api.price_history import async_record_history
+from scraper_api.search_index import async_index_products
+
+# --- Async Client Settings (overridable through the environment) ---
+# Upstream connections open at once from this event loop, across all hosts.
+MAX_CONNECTIONS = int(os.environ.get('SCRAPER_ASYNC_CONNECTIONS', '200'))
+# Upstream connections open at once to any one host.
+MAX_CONNECTIONS_PER_HOST = int(os.environ.get('SCRAPER_ASYNC_CONNECTIONS_PER_HOST', '100'))
+
+_client = None
+
+
+# --- Connection timing ---
+# aiohttp reports DNS lookups and new connections of a request to these
+# hooks, which add them to the dict passed as its trace_request_ctx.
+async def _on_dns_start(session, context, params):
+    context.dns_started = time.perf_counter()
+
+
+async def _on_dns_end(session, context, params):
+    stages = context.trace_request_ctx
+    stages['dns'] = stages.get('dns', 0.0) + time.perf_counter() - context.dns_started
+
+
+async def _on_connect_start(session, context, params):
+    context.connect_started = time.perf_counter()
+
+
+async def _on_connect_end(session, context, params):
+    # Includes the DNS lookup, which fetch_async takes back out.
+    stages = context.trace_request_ctx
+    stages['connect'] = stages.get('connect', 0.0) + time.perf_counter() - context.connect_started
+
+
+def _trace_config():
+    trace = aiohttp.TraceConfig()
+    trace.on_dns_resolvehost_start.append(_on_dns_start)
+    trace.on_dns_resolvehost_end.append(_on_dns_end)
+    trace.on_connection_create_start.append(_on_connect_start)
+    trace.on_connection_create_end.append(_on_connect_end)
+    return trace
+
+
+def get_client():
+    """ Returns the shared aiohttp session, creating it on first use inside the running loop. """
+    global _client
+    if _client is None or _client.closed:
+        connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                                         ttl_dns_cache=300)
+        _client = aiohttp.ClientSession(connector=connector, trace_configs=[_trace_config()])
+    return _client
+
+
+async def close_client():
+    """ Closes the shared aiohttp session. Call this when the ASGI app shuts down. """
+    global _client
+    if _client is not None and not _client.closed:
+        await _client.close()
+    _client = None
+
+
+def _observe_fetch(source, stages, waited, downloaded):
+    dns = stages.get('dns', 0.0)
+    connect = stages.get('connect', 0.0)
+    if 'dns' in stages:
+        metrics.observe(source, 'dns', dns)
+    if 'connect' in stages:
+        metrics.observe(source, 'connect', max(connect - dns, 0.0))
+    metrics.observe(source, 'wait', max(waited - connect, 0.0))
+    metrics.observe(source, 'download', downloaded)
+
+
+async def fetch_async(url, headers=None, timeout=15, source=None):
+    """
+    GETs a URL on the shared session, retrying 429/503 like the sync sessions
+    do. Every attempt waits for the host's rate limiter first. Each stage of
+    the fetch is timed in scraper_api.metrics under 'source' (default: the host).
+    Uses the page cache like sessions.fetch; page cache reads and writes run
+    on a thread.
+
+    Returns:
+        tuple: (status code, body bytes) of the last response.
+    """
+    client = get_client()
+    host = urlsplit(url).netloc
+    source = source or host
+    cache = page_cache.store
+    cached = await asyncio.to_thread(cache.lookup, url) if cache is not None else None
+    if cached is not None:
+        if cached.is_fresh():
+            metrics.PAGE_CACHE.inc(source, 'fresh')
+            return 200, cached.body
+        headers = {**(headers or {}), **cached.validators()}
+
+    stages = {}
+    waited = downloaded = 0.0
+    for attempt in range(RETRY_TOTAL + 1):
+        # The limiter may be the shared SQLite file, so it runs off the event loop.
+        with metrics.span(source, 'throttle'):
+            await asyncio.sleep(await asyncio.to_thread(rate_limit.wait_time, host))
+        sent = time.perf_counter()
+        async with client.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout),
+                              trace_request_ctx=stages) as response:
+            headers_at = time.perf_counter()
+            body = await response.read()
+            downloaded += time.perf_counter() - headers_at
+            waited += headers_at - sent
+            await asyncio.to_thread(rate_limit.record, host, response.status)
+            metrics.count_response(source, response.status, len(body))
+            if response.status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                break
+            delay = retry_delay(response.headers.get('Retry-After', ''), attempt)
+            if delay is None:
+                break
+        # As in the sync client, backoff counts as waiting.
+        waited += delay
+        await asyncio.sleep(delay)
+    _observe_fetch(source, stages, waited, downloaded)
+
+    if cache is not None:
+        if cached is not None and response.status == 304:
+            metrics.PAGE_CACHE.inc(source, 'revalidated')
+            await asyncio.to_thread(cache.revalidated, cached, response.headers)
+            return 200, cached.body
+        metrics.PAGE_CACHE.inc(source, 'fetched')
+        if response.status == 200:
+            await asyncio.to_thread(cache.save, url, source, response.headers, body)
+    return response.status, body
+
+
+#==============================================================================
+# PAGINATION
+#==============================================================================
+def _is_error(result):
+    return isinstance(result, dict) and 'error' in result
+
+
+async def iter_pages_async(scrape_page, host, page=1, max_results=None, per_page=20):
+    """
+    Async counterpart of pagination.iter_pages. scrape_page is a coroutine
+    function taking a page number; the window and stopping rules are the same.
+    """
+    if max_results is None:
+        yield await scrape_page(page)
+        return
+
+    window = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+    in_flight = deque()
+    collected = 0
+    next_page = page
+    last_page = page + MAX_PAGES
+    try:
+        while True:
+            while (len(in_flight) < window and next_page < last_page
+                   and len(in_flight) * per_page < max_results - collected):
+                in_flight.append(asyncio.ensure_future(scrape_page(next_page)))
+                next_page += 1
+            if not in_flight:
+                return
+
+            result = await in_flight.popleft()
+            if _is_error(result) or page_exhausted(result):
+                yield result
+                return
+            result = result[:max_results - collected]
+            collected += len(result)
+            yield result
+            if collected >= max_results:
+                return
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+async def fetch_pages_async(scrape_page, host, page=1, max_results=None, per_page=20):
+    """ Async counterpart of pagination.fetch_pages. """
+    products = []
+    async for result in iter_pages_async(scrape_page, host, page, max_results, per_page):
+        if _is_error(result):
+            if not products:
+                return result
+            print(f"Stopping pagination on {host} after an error: {result['error']}")
+            break
+        products.extend(result)
+    return products
+
+
+#==============================================================================
+# SCRAPERS
+#==============================================================================
+async def scrape_amazon_page_async(search_query, page=1, filters=None):
+    """ Async counterpart of amazon.scrape_amazon_page. """
+    url = amazon.build_search_url(search_query, page)
+    print(f"Attempting to fetch data from Amazon: {url}")
+
+    try:
+        status, content = await fetch_async(url, headers=amazon.HEADERS, timeout=15, source='amazon')
+        print(f"Amazon Response Status Code: {status}")
+        if status != 200:
+            return {"error": f"Failed to retrieve page, status code: {status}"}
+
+        products = await parse_page_async('amazon', content, filters)
+
+    except Exception as e:
+        print(f"An unexpected error occurred during Amazon scraping: {e}")
+        return {"error": str(e)}
+
+    print(f"Successfully parsed {len(products)} products from Amazon page {page}.")
+    return products
+
+
+@async_cached('amazon')
+@async_single_flight('amazon')
+@async_record_history('amazon')
+@async_index_products('amazon')
+async def scrape_amazon_products_async(search_query, page=1, max_results=None, filters=None):
+    """ Async counterpart of amazon.scrape_amazon_products; shares its cache entries. """
+    return await fetch_pages_async(lambda n: scrape_amazon_page_async(search_query, n, filters),
+                                   amazon.HOST, page, max_results, per_page=amazon.PER_PAGE)
+
+
+async def scrape_myntra_page_async(search_query, page=1, filters=None):
+    """ Async counterpart of myntra_scraper.scrape_myntra_page. """
+    url = myntra_scraper.build_search_url(search_query, page)
+
+    try:
+        print(f"Requesting Myntra URL: {url}")
+        status, content = await fetch_async(url, headers=myntra_scraper.HEADERS, timeout=10, source='myntra')
+        if status >= 400:
+            return {"error": f"Failed to retrieve data from Myntra. Error: status code {status}"}
+
+        products = await parse_page_async('myntra', content, filters)
+
+        if products is None:
+            print("Could not find the data script tag on the Myntra page.")
+            return {"error": "Failed to find product data. The site structure may have changed."}
+        if not products:
+            print("No products found in the page's JSON data.")
+        return products
+
+    except aiohttp.ClientError as e:
+        print(f"An error occurred during the request to Myntra: {e}")
+        return {"error": f"Failed to retrieve data from Myntra. Error: {e}"}
+    except json.JSONDecodeError:
+        return {"error": "Failed to parse product data from the page."}
+    except Exception as e:
+        print(f"An unexpected error occurred while scraping Myntra: {e}")
+        return {"error": f"An unexpected error occurred. Error: {e}"}
+
+
+@async_cached('myntra')
+@async_single_flight('myntra')
+@async_record_history('myntra')
+@async_index_products('myntra')
+async def scrape_myntra_products_async(search_query, page=1, max_results=None, filters=None):
+    """ Async counterpart of myntra_scraper.scrape_myntra_products; shares its cache entries. """
+    return await fetch_pages_async(lambda n: scrape_myntra_page_async(search_query, n, filters),
+                                   myntra_scraper.HOST, page, max_results, per_page=myntra_scraper.PER_PAGE)
+
+
+async def scrape_flipkart_products_async(search_query, page=1, max_results=None, filters=None):
+    """ Runs the Selenium based Flipkart scraper on a worker thread. """
+    from scraper_api.flipkart import scrape_flipkart_products
+    return await asyncio.to_thread(scrape_flipkart_products, search_query, page=page,
+                                   max_results=max_results, filters=filters)
+
+
+ASYNC_SCRAPERS = {
+    'amazon': scrape_amazon_products_async,
+    'myntra': scrape_myntra_products_async,
+    'flipkart': scrape_flipkart_products_async,
+}
+# Page scrapers for streaming; Flipkart pages run on a worker thread.
+ASYNC_PAGE_SCRAPERS = {
+    'amazon': (scrape_amazon_page_async, amazon.HOST, amazon.PER_PAGE),
+    'myntra': (scrape_myntra_page_async, myntra_scraper.HOST, myntra_scraper.PER_PAGE),
+}
+
+
+async def _once(coro):
+    yield await coro
+
+
+async def iter_source_products_async(source, search_query, page=1, max_results=None, filters=None):
+    """ Async counterpart of streaming.iter_source_products. """
+    if source in ASYNC_PAGE_SCRAPERS:
+        scrape_page, host, per_page = ASYNC_PAGE_SCRAPERS[source]
+        pages = iter_pages_async(lambda n: scrape_page(search_query, n, filters), host, page, max_results, per_page)
+    else:
+        # No async page scraper; the threaded scraper returns all pages at once.
+        pages = _once(ASYNC_SCRAPERS[source](search_query, page=page, max_results=max_results, filters=filters))
+
+    async for result in pages:
+        if _is_error(result):
+            yield {'source': source, 'error': result['error']}
+            return
+        for product in result:
+            yield product
+
+
+#==============================================================================
+# FAN-OUT
+#==============================================================================
+async def _timed(coro):
+    start = time.monotonic()
+    result = await coro
+    return result, time.monotonic() - start
+
+
+async def scrape_all_async(search_query, sources=None, deadline=DEFAULT_DEADLINE, **options):
+    """
+    Async counterpart of fanout.scrape_all. Sources still running at the
+    deadline are cancelled and reported as timed out.
+    """
+    sources = sources or list(DEFAULT_SOURCES)
+    tasks = {asyncio.ensure_future(_timed(ASYNC_SCRAPERS[source](search_query, **options))): source
+             for source in sources}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    products = []
+    status = {}
+    for task, source in tasks.items():
+        if task in pending:
+            task.cancel()
+            status[source] = {'status': 'timeout'}
+            continue
+        try:
+            result, elapsed = task.result()
+        except Exception as e:
+            print(f"Fan-out scrape of {source} raised: {e}")
+            status[source] = {'status': 'error', 'error': str(e)}
+            continue
+        if _is_error(result):
+            status[source] = {'status': 'error', 'error': result['error'], 'elapsed': round(elapsed, 3)}
+            continue
+        products.extend(result)
+        status[source] = {'status': 'ok', 'count': len(result), 'elapsed': round(elapsed, 3)}
+
+    return {'query': search_query, 'products': products, 'sources': status}
+
+
+async def iter_all_async(search_query, sources=None, deadline=DEFAULT_DEADLINE, **options):
+    """ Async counterpart of fanout.iter_all, with the same final status record. """
+    sources = sources or list(DEFAULT_SOURCES)
+    out = asyncio.Queue(maxsize=200)
+    start = time.monotonic()
+    status = {source: {'status': 'timeout', 'count': 0} for source in sources}
+    done_marker = object()
+
+    async def produce(source):
+        try:
+            async for item in iter_source_products_async(source, search_query, **options):
+                await out.put((source, item))
+        except Exception as e:
+            print(f"Fan-out stream of {source} raised: {e}")
+            await out.put((source, {'source': source, 'error': str(e)}))
+        await out.put((source, done_marker))
+
+    producers = [asyncio.ensure_future(produce(source)) for source in sources]
+    running = set(sources)
+    try:
+        while running:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            try:
+                source, item = await asyncio.wait_for(out.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is done_marker:
+                running.discard(source)
+                if status[source]['status'] == 'timeout':
+                    status[source]['status'] = 'ok'
+                status[source]['elapsed'] = round(time.monotonic() - start, 3)
+            elif isinstance(item, dict):
+                status[source] = {'status': 'error', 'error': item['error'], 'count': status[source]['count']}
+            else:
+                status[source]['count'] += 1
+                yield item
+        yield {'sources': status}
+    finally:
+        for producer in producers:
+            producer.cancel()
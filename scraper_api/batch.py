@@ -0,0 +1,373 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from scraper_api.fanout import parse_sources
+from scraper_api.filters import results_needed, select
+from scraper_api.params import parse_filter_args, parse_paging_args
+from scraper_api.product import dumps
+from scraper_api.sources import get_scraper
+
+# --- Batch Settings (overridable through the environment) ---
+# Scrapes a batch runs at once. The rate limiter still paces each host.
+BATCH_WORKERS = int(os.environ.get('SCRAPER_BATCH_WORKERS', '4'))
+MAX_BATCH_WORKERS = 32
+# Queries accepted by one POST /scrape/batch request.
+MAX_BATCH_QUERIES = 10000
+BATCH_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CSV_FIELDS = ('query', 'source', 'product_id', 'name', 'price', 'rating', 'reviews', 'image_url', 'url', 'error')
+
+
+class BatchRequest:
+    """ The validated settings of one batch: what to scrape and how to write it. """
+
+    def __init__(self, queries, sources, page=1, max_results=None, filters=None, sort=None, limit=None,
+                 fresh=False, workers=BATCH_WORKERS, output_format='ndjson'):
+        self.queries = queries
+        self.sources = sources
+        self.options = {'page': page, 'max_results': results_needed(max_results, sort, limit), 'filters': filters}
+        self.sort = sort
+        self.limit = limit
+        self.fresh = fresh
+        self.workers = workers
+        self.format = output_format
+
+    def jobs(self, skip=None):
+        """ Yields every (query, source) pair to scrape, leaving out those in 'skip'. """
+        for search_query in self.queries:
+            for source in self.sources:
+                if skip is None or (search_query, source) not in skip:
+                    yield search_query, source
+
+
+# Body fields read with the query-string parsers of scraper_api.params, which
+# take what a query string holds: numbers (or numeric strings) and strings.
+NUMBER_FIELDS = ('page', 'max_results', 'min_price', 'max_price', 'min_rating', 'limit')
+STRING_FIELDS = ('sort', 'format')
+
+
+def _check_types(body):
+    for name in NUMBER_FIELDS:
+        value = body.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float, str))):
+            raise ValueError(f"'{name}' must be a number.")
+    for name in STRING_FIELDS:
+        if body.get(name) is not None and not isinstance(body[name], str):
+            raise ValueError(f"'{name}' must be a string.")
+    sources = body.get('sources')
+    if sources is not None and not isinstance(sources, str) and not (
+            isinstance(sources, list) and all(isinstance(source, str) for source in sources)):
+        raise ValueError("'sources' must be a list of source names.")
+
+
+def parse_batch(body):
+    """
+    Validates a POST /scrape/batch body and returns its BatchRequest. Raises
+    ValueError with a message fit for a 400 response if it is invalid.
+
+    Ex body: {"queries": ["laptop", "shoes"], "sources": ["amazon", "myntra"],
+              "max_results": 50, "max_price": 2000, "format": "csv"}
+    'page', 'max_results', 'min_price', 'max_price', 'min_rating', 'sort' and
+    'limit' mean what they do on /scrape/*, for every query.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object.")
+    queries = body.get('queries')
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("'queries' must be a non-empty list of search queries.")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"A batch takes at most {MAX_BATCH_QUERIES} queries.")
+    if not all(isinstance(search_query, str) and search_query.strip() for search_query in queries):
+        raise ValueError("Every entry of 'queries' must be a non-empty string.")
+    _check_types(body)
+    sources = body.get('sources')
+    if isinstance(sources, list):
+        sources = ','.join(sources)
+    sources = parse_sources(sources)
+    page, max_results = parse_paging_args(body)
+    filters, sort, limit = parse_filter_args(body)
+    output_format = body.get('format', 'ndjson')
+    if output_format not in BATCH_FORMATS:
+        raise ValueError(f"'format' must be one of: {', '.join(BATCH_FORMATS)}.")
+    try:
+        workers = int(body.get('workers', BATCH_WORKERS))
+    except (TypeError, ValueError):
+        raise ValueError("'workers' must be an integer.")
+    if not 1 <= workers <= MAX_BATCH_WORKERS:
+        raise ValueError(f"'workers' must be an integer between 1 and {MAX_BATCH_WORKERS}.")
+    return BatchRequest([search_query.strip() for search_query in queries], sources, page, max_results, filters,
+                        sort, limit, bool(body.get('fresh')), workers, output_format)
+
+
+#==============================================================================
+# RUNNING A BATCH
+#==============================================================================
+def _outcome(batch, search_query, source, result, elapsed):
+    """ The result record of one (query, source) scrape. """
+    outcome = {'query': search_query, 'source': source}
+    if isinstance(result, dict) and 'error' in result:
+        outcome.update(status='error', error=result['error'], elapsed=round(elapsed, 3))
+        return outcome
+    products = select(result, batch.sort, batch.limit)
+    outcome.update(status='ok', count=len(products), elapsed=round(elapsed, 3), products=products)
+    return outcome
+
+
+def _scrape(batch, search_query, source):
+    scraper = get_scraper(source)
+    if batch.fresh:
+        # Skip the result cache, as the crawl scheduler does.
+        scraper = scraper.uncached
+    start = time.monotonic()
+    try:
+        result = scraper(search_query, **batch.options)
+    except Exception as e:
+        print(f"Batch scrape of {source} for '{search_query}' raised: {e}")
+        result = {"error": str(e)}
+    return _outcome(batch, search_query, source, result, time.monotonic() - start)
+
+
+def run_batch(batch, skip=None):
+    """
+    Scrapes every (query, source) pair of a batch on a pool of batch.workers
+    threads and yields one result record per pair as each finishes:
+
+        {"query": ..., "source": ..., "status": "ok", "count": N, "elapsed": s, "products": [...]}
+        {"query": ..., "source": ..., "status": "error", "error": ..., "elapsed": s}
+
+    Jobs are submitted a window at a time, so memory holds at most twice
+    batch.workers results however long the batch is. Pairs in 'skip' (a set
+    of (query, source)) are not scraped.
+    """
+    jobs = batch.jobs(skip)
+    pending = set()
+    executor = ThreadPoolExecutor(max_workers=batch.workers, thread_name_prefix='batch')
+    try:
+        while True:
+            for search_query, source in jobs:
+                pending.add(executor.submit(_scrape, batch, search_query, source))
+                if len(pending) >= batch.workers * 2:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # A closed stream (e.g. a client that went away) drops the jobs not yet started.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_batch_async(batch, skip=None):
+    """ Async counterpart of run_batch, on the async scrapers. """
+    from scraper_api.async_scrapers import ASYNC_SCRAPERS
+
+    async def scrape(search_query, source):
+        scraper = ASYNC_SCRAPERS[source]
+        if batch.fresh:
+            scraper = getattr(scraper, 'uncached', scraper)
+        start = time.monotonic()
+        try:
+            result = await scraper(search_query, **batch.options)
+        except Exception as e:
+            print(f"Batch scrape of {source} for '{search_query}' raised: {e}")
+            result = {"error": str(e)}
+        return _outcome(batch, search_query, source, result, time.monotonic() - start)
+
+    jobs = batch.jobs(skip)
+    pending = set()
+    try:
+        while True:
+            for search_query, source in jobs:
+                pending.add(asyncio.ensure_future(scrape(search_query, source)))
+                if len(pending) >= batch.workers:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# --- Output formats ---
+
+def encode_ndjson(outcome):
+    """ One result record as a line of JSON. """
+    return dumps(outcome) + '\n'
+
+
+def csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_FIELDS)
+    return buffer.getvalue()
+
+
+def encode_csv(outcome):
+    """
+    One result record as CSV rows, one per product. A failed scrape is a
+    single row with only query, source and error filled in. Prices are in
+    paise, as in the JSON.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if outcome['status'] != 'ok':
+        writer.writerow([outcome['query'], outcome['source'], '', '', '', '', '', '', '', outcome['error']])
+    for product in outcome.get('products', ()):
+        writer.writerow([outcome['query'], product.source, product.product_id, product.name, product.price,
+                         product.rating, product.reviews, product.image_url, product.url, ''])
+    return buffer.getvalue()
+
+
+ENCODERS = {'ndjson': encode_ndjson, 'csv': encode_csv}
+
+
+def encode_stream(outcomes, output_format):
+    """ Encodes result records as a stream of NDJSON lines, or CSV rows under one header. """
+    encode = ENCODERS[output_format]
+    if output_format == 'csv':
+        yield csv_header()
+    for outcome in outcomes:
+        yield encode(outcome)
+
+
+async def encode_stream_async(outcomes, output_format):
+    """ Async counterpart of encode_stream. """
+    encode = ENCODERS[output_format]
+    if output_format == 'csv':
+        yield csv_header()
+    async for outcome in outcomes:
+        yield encode(outcome)
+
+
+#==============================================================================
+# COMMAND LINE
+#==============================================================================
+class Checkpoint:
+    """
+    The (query, source) pairs of a batch that are done, one JSON line per
+    pair in a file next to the output. A pair is marked after its results
+    are written and flushed, so a batch stopped at any point resumes without
+    losing results; at worst the pair in flight is written twice. Failed
+    pairs are neither marked nor written to the output, so a resumed batch
+    tries them again and leaves one set of rows per pair.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        complete = True
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    complete = line.endswith('\n')
+                    try:
+                        search_query, source = json.loads(line)
+                    except ValueError:
+                        # The last line may be cut short by a crash.
+                        continue
+                    self.done.add((search_query, source))
+        self._file = open(path, 'a', encoding='utf-8')
+        if not complete:
+            self._file.write('\n')
+
+    def mark(self, search_query, source):
+        self.done.add((search_query, source))
+        self._file.write(json.dumps([search_query, source]) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_queries(path):
+    """ Reads a query file: one query per line; blank lines and lines starting with '#' are skipped. """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m scraper_api.batch',
+        description='Scrape every query of a file into one NDJSON or CSV file. An interrupted run '
+                    'picks up where it stopped when started again with the same output.')
+    parser.add_argument('queries', help='file with one search query per line')
+    parser.add_argument('-o', '--output', required=True, help='results file (.ndjson or .csv)')
+    parser.add_argument('--format', choices=BATCH_FORMATS, help='output format (default: from the file extension)')
+    parser.add_argument('--sources', help='comma separated sources (default: amazon,myntra)')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help='scrapes running at once')
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--max-results', type=int)
+    parser.add_argument('--fresh', action='store_true', help='scrape even if the result cache has the query')
+    parser.add_argument('--restart', action='store_true', help='ignore the progress of an earlier run')
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('csv' if args.output.endswith('.csv') else 'ndjson')
+    try:
+        sources = parse_sources(args.sources)
+        page, max_results = parse_paging_args({'page': args.page, 'max_results': args.max_results})
+    except ValueError as e:
+        parser.error(str(e))
+    if not 1 <= args.workers <= MAX_BATCH_WORKERS:
+        parser.error(f"--workers must be between 1 and {MAX_BATCH_WORKERS}")
+    batch = BatchRequest(read_queries(args.queries), sources, page, max_results, fresh=args.fresh,
+                         workers=args.workers, output_format=output_format)
+
+    progress_path = args.output + '.progress'
+    if args.restart or not os.path.exists(progress_path):
+        for path in (args.output, progress_path):
+            if os.path.exists(path):
+                os.remove(path)
+    checkpoint = Checkpoint(progress_path)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} query/source pairs already done.")
+    encode = ENCODERS[output_format]
+
+    start = time.monotonic()
+    jobs = products = errors = 0
+    try:
+        with open(args.output, 'a', encoding='utf-8', newline='') as out:
+            if output_format == 'csv' and out.tell() == 0:
+                out.write(csv_header())
+            for outcome in run_batch(batch, skip=checkpoint.done):
+                jobs += 1
+                if outcome['status'] == 'ok':
+                    out.write(encode(outcome))
+                    out.flush()
+                    products += outcome['count']
+                    checkpoint.mark(outcome['query'], outcome['source'])
+                else:
+                    errors += 1
+                    print(f"{outcome['source']} '{outcome['query']}' failed: {outcome['error']}")
+                if jobs % 50 == 0:
+                    elapsed = time.monotonic() - start
+                    print(f"{jobs} done, {products} products, {errors} failed, {jobs / elapsed:.1f} per second")
+    except KeyboardInterrupt:
+        print("Stopped; run the same command again to resume.")
+        return 130
+    finally:
+        checkpoint.close()
+    elapsed = time.monotonic() - start
+    print(f"Finished {jobs} query/source pairs in {elapsed:.1f}s: {products} products, {errors} failed. "
+          f"Results in {args.output}")
+    if errors:
+        print("Run the same command again to retry the failed pairs.")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,367 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from scraper_api.filters import filter_products
+from scraper_api.product import Product
+
+# --- Cache Settings (overridable through the environment) ---
+CACHE_ENABLED = os.environ.get('SCRAPER_CACHE', '1') != '0'
+# Maximum number of cached result lists before the least recently used is evicted.
+MAX_ENTRIES = int(os.environ.get('SCRAPER_CACHE_SIZE', '512'))
+# Path to a SQLite file to keep the cache across restarts. Empty means in-memory only.
+CACHE_DB = os.environ.get('SCRAPER_CACHE_DB', '')
+# Seconds a result counts as fresh, per source.
+TTLS = {
+    'amazon': 900,
+    'myntra': 900,
+    'flipkart': 1800,
+}
+DEFAULT_TTL = 900
+# Seconds past its TTL that a result may still be served while it is refreshed.
+STALE_TTL = int(os.environ.get('SCRAPER_CACHE_STALE', '3600'))
+
+
+class MemoryBackend:
+    """ In-process LRU store of (stored_at, value) pairs. """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, stored_at, value):
+        with self._lock:
+            self._data[key] = (stored_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteBackend:
+    """
+    LRU store kept in a SQLite file so cached results survive restarts.
+    Product lists are stored as JSON arrays of Product.to_tuple() rows.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS scrape_cache ('
+            'key TEXT PRIMARY KEY, stored_at REAL, accessed_at REAL, value TEXT)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS scrape_cache_accessed ON scrape_cache (accessed_at)')
+        self._conn.commit()
+
+    def reopen(self):
+        """ Opens a fresh connection to the file in a forked worker; see PriceHistory.reopen(). """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT stored_at, value FROM scrape_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE scrape_cache SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+        try:
+            return row[0], [Product(*record) for record in json.loads(row[1])]
+        except TypeError:
+            # Written in an older layout; treat it as a miss and let it be replaced.
+            return None
+
+    def set(self, key, stored_at, value):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO scrape_cache (key, stored_at, accessed_at, value) VALUES (?, ?, ?, ?)',
+                (key, stored_at, time.time(), json.dumps(value, default=Product.to_tuple)))
+            self._conn.execute(
+                'DELETE FROM scrape_cache WHERE key IN ('
+                'SELECT key FROM scrape_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM scrape_cache')
+            self._conn.commit()
+
+
+_backend = SQLiteBackend(CACHE_DB, MAX_ENTRIES) if CACHE_DB else MemoryBackend(MAX_ENTRIES)
+# Keys with a background refresh in flight, so a stale entry is refreshed only once.
+_refreshing = set()
+_refresh_lock = threading.Lock()
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+# Background refresh tasks of async scrapers, kept referenced until they finish.
+_async_refreshes = set()
+# Results kept current by the crawl scheduler: key -> (stored_at, max_age, value).
+# They are read before the LRU store and are never evicted from it.
+_watched = {}
+
+
+def reopen():
+    """ Reopens the SQLite cache file, if any, in a forked worker. The in-memory cache is per process already. """
+    if isinstance(_backend, SQLiteBackend):
+        _backend.reopen()
+
+
+def normalize_query(search_query):
+    """ Lower-cases a query and collapses its whitespace, e.g. ' Laptop  Bag' -> 'laptop bag'. """
+    return ' '.join(search_query.lower().split())
+
+
+def bind_options(signature, args, kwargs):
+    """
+    Names every argument after the query, defaults included, so that
+    f(q), f(q, 1) and f(q, page=1) all produce the same key.
+    """
+    bound = signature.bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    options = dict(bound.arguments)
+    options.pop(next(iter(signature.parameters)))
+    return options
+
+
+def make_key(source, search_query, options=None):
+    """ Builds the cache key for a scrape of a source with the given options. """
+    key = f"{source}:{normalize_query(search_query)}"
+    if options:
+        key += ':' + json.dumps(options, sort_keys=True, default=str)
+    return key
+
+
+def _is_error(value):
+    return isinstance(value, dict) and 'error' in value
+
+
+def cacheable(value):
+    """
+    Whether a scrape result may be stored: not an error, and not empty. An
+    empty result is as often a listings timeout, a captcha or block page or
+    an unknown layout as a query without products, and storing it would
+    answer "no products" for the whole TTL and stale window.
+    """
+    return not _is_error(value) and bool(value)
+
+
+def _get_watched(key):
+    entry = _watched.get(key)
+    if entry is not None:
+        stored_at, max_age, value = entry
+        if time.time() - stored_at < max_age:
+            return value
+    return None
+
+
+def put_watched(key, value, max_age):
+    """
+    Stores a pre-scraped result for a watched key. Cached scrapers return it
+    for up to max_age seconds without touching the LRU store or the site.
+    It is also written to the regular store so a restart starts warm.
+    """
+    stored_at = time.time()
+    _watched[key] = (stored_at, max_age, value)
+    _backend.set(key, stored_at, value)
+
+
+def load_watched(key, max_age):
+    """ Seeds a watched key from the regular store; returns the stored time or None. """
+    entry = _backend.get(key)
+    if entry is None:
+        return None
+    stored_at, value = entry
+    _watched[key] = (stored_at, max_age, value)
+    return stored_at
+
+
+def _narrowed(source, search_query, options, ttl):
+    # A filtered scrape of one page can be answered by filtering a fresh or
+    # watched result of the same scrape without filters. Not one with
+    # max_results: that keeps paging until it has max_results matches.
+    if options.get('max_results') is not None:
+        return None
+    key = make_key(source, search_query, {**options, 'filters': None})
+    value = _get_watched(key)
+    if value is None:
+        entry = _backend.get(key)
+        if entry is not None and time.time() - entry[0] < ttl:
+            value = entry[1]
+    return filter_products(value, options['filters']) if value is not None else None
+
+
+def drop_watched(key):
+    """ Stops serving a key from the watched results. """
+    _watched.pop(key, None)
+
+
+def _refresh(key, func, args, kwargs):
+    try:
+        value = func(*args, **kwargs)
+        if cacheable(value):
+            _backend.set(key, time.time(), value)
+    except Exception as e:
+        print(f"Background cache refresh for {key} failed: {e}")
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh(key, func, args, kwargs):
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _refresher.submit(_refresh, key, func, args, kwargs)
+
+
+async def _refresh_async(key, func, args, kwargs):
+    try:
+        value = await func(*args, **kwargs)
+        if cacheable(value):
+            await asyncio.to_thread(_backend.set, key, time.time(), value)
+    except Exception as e:
+        print(f"Background cache refresh for {key} failed: {e}")
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh_async(key, func, args, kwargs):
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    task = asyncio.ensure_future(_refresh_async(key, func, args, kwargs))
+    _async_refreshes.add(task)
+    task.add_done_callback(_async_refreshes.discard)
+
+
+def cached(source):
+    """
+    Caches the results of a scrape_<source>_products function.
+
+    Results are keyed on the source, the normalized query and any extra
+    arguments. A fresh hit is returned as is. A hit that is past its TTL but
+    within STALE_TTL is returned immediately while one background refresh
+    replaces it. Error results are never cached. Keys kept current by the
+    crawl scheduler are answered from its results before any of this, and a
+    call with 'filters' is answered by filtering the unfiltered result when
+    that is fresh.
+
+    Args:
+        source (str): The source name, used for the key and to pick the TTL.
+    """
+    ttl = TTLS.get(source, DEFAULT_TTL)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(search_query, *args, **kwargs):
+            if not CACHE_ENABLED:
+                return func(search_query, *args, **kwargs)
+
+            search_query = normalize_query(search_query)
+            options = bind_options(signature, args, kwargs)
+            key = make_key(source, search_query, options)
+            value = _get_watched(key)
+            if value is None and options.get('filters') is not None:
+                value = _narrowed(source, search_query, options, ttl)
+            if value is not None:
+                return value
+            entry = _backend.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                age = time.time() - stored_at
+                if age < ttl:
+                    return value
+                if age < ttl + STALE_TTL:
+                    _schedule_refresh(key, func, (search_query,) + args, kwargs)
+                    return value
+
+            value = func(search_query, *args, **kwargs)
+            if cacheable(value):
+                _backend.set(key, time.time(), value)
+            return value
+
+        # Lets callers that must hit the site skip the cache.
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def async_cached(source):
+    """
+    Async counterpart of cached() for coroutine scrapers. It uses the same
+    keys and store, so sync and async scrapers of a source share entries.
+    Stale entries are refreshed in a task on the running event loop.
+    """
+    ttl = TTLS.get(source, DEFAULT_TTL)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(search_query, *args, **kwargs):
+            if not CACHE_ENABLED:
+                return await func(search_query, *args, **kwargs)
+
+            search_query = normalize_query(search_query)
+            options = bind_options(signature, args, kwargs)
+            key = make_key(source, search_query, options)
+            value = _get_watched(key)
+            # The store may be the SQLite file, so it is read and written
+            # off the event loop, as the rate limiter is.
+            if value is None and options.get('filters') is not None:
+                value = await asyncio.to_thread(_narrowed, source, search_query, options, ttl)
+            if value is not None:
+                return value
+            entry = await asyncio.to_thread(_backend.get, key)
+            if entry is not None:
+                stored_at, value = entry
+                age = time.time() - stored_at
+                if age < ttl:
+                    return value
+                if age < ttl + STALE_TTL:
+                    _schedule_refresh_async(key, func, (search_query,) + args, kwargs)
+                    return value
+
+            value = await func(search_query, *args, **kwargs)
+            if cacheable(value):
+                await asyncio.to_thread(_backend.set, key, time.time(), value)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def clear_cache():
+    """ Drops every cached result, including the watched ones. """
+    _watched.clear()
+    _backend.clear()
@@ -0,0 +1,36 @@
+import os
+import time
+
+# --- Dump Settings (overridable through the environment) ---
+# Directory that pages a scraper could not make sense of are saved to.
+# Empty turns dumping off.
+DUMP_DIR = os.environ.get('SCRAPER_DUMP_DIR', 'debug_pages')
+
+
+def save_page(source, reason, content):
+    """
+    Saves a page a scraper could not parse, for debugging and as a benchmark
+    fixture (see benchmarks/corpus.py). Each dump gets its own timestamped
+    file, so an earlier dump is never overwritten.
+
+    Args:
+        source (str): The source the page came from.
+        reason (str): Why it was saved, e.g. 'no_results'.
+        content (str | bytes): The page HTML.
+
+    Returns:
+        str: The path written, or None if dumping is off or failed.
+    """
+    if not DUMP_DIR:
+        return None
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(DUMP_DIR, f"{source}-{reason}-{stamp}-{time.time_ns() % 1_000_000:06d}.html")
+    try:
+        os.makedirs(DUMP_DIR, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content.encode('utf-8') if isinstance(content, str) else content)
+    except OSError as e:
+        print(f"Could not save {source} page for debugging: {e}")
+        return None
+    print(f"Page content saved to {path} for debugging.")
+    return path
@@ -0,0 +1,111 @@
+import atexit
+import queue
+import threading
+
+from selenium.common.exceptions import WebDriverException
+
+
+class DriverPoolTimeout(Exception):
+    """ Raised when no browser becomes free within the pool's acquire timeout. """
+
+
+class DriverPool:
+    """
+    A bounded pool of warm Selenium drivers.
+
+    Drivers are started lazily up to 'size' and handed out one caller at a
+    time. Each one is health checked before it is reused and is replaced
+    after 'max_pages' page loads or as soon as it is released as broken.
+
+    Args:
+        create (callable): Starts and returns a new driver.
+        size (int): Maximum number of drivers alive at once.
+        max_pages (int): Page loads after which a driver is recycled.
+        acquire_timeout (float): Seconds a caller waits for a free driver.
+    """
+
+    def __init__(self, create, size=2, max_pages=50, acquire_timeout=30):
+        self.create = create
+        self.size = size
+        self.max_pages = max_pages
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        # Last in, first out, so the most recently used (warmest) driver goes first.
+        self._idle = queue.LifoQueue()
+        self._pages = {}
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _start(self):
+        driver = self.create()
+        with self._lock:
+            self._pages[driver] = 0
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._pages.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error while quitting a pooled browser: {e}")
+
+    @staticmethod
+    def _healthy(driver):
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self):
+        """ Returns a healthy driver, waiting up to acquire_timeout for a free slot. """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise DriverPoolTimeout(f"No browser became free within {self.acquire_timeout}s.")
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._start()
+                if self._healthy(driver):
+                    return driver
+                print("Pooled browser failed its health check, replacing it.")
+                self._discard(driver)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, driver, broken=False):
+        """ Returns a driver to the pool, or recycles it if broken or worn out. """
+        try:
+            with self._lock:
+                pages = self._pages.get(driver, 0) + 1
+                self._pages[driver] = pages
+            if broken or pages >= self.max_pages:
+                self._discard(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def warm(self, count=None):
+        """ Starts up to 'count' drivers ahead of time so first requests skip browser startup. """
+        count = self.size if count is None else min(count, self.size)
+        drivers = []
+        try:
+            for _ in range(count):
+                drivers.append(self.acquire())
+        finally:
+            for driver in drivers:
+                self._idle.put(driver)
+                self._slots.release()
+
+    def shutdown(self):
+        """ Quits every idle driver. """
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
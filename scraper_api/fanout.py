@@ -0,0 +1,177 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from scraper_api.sources import ENABLED_SOURCES, SOURCES, get_scraper
+from scraper_api.streaming import iter_source_products
+
+# Flipkart is opt-in because a browser scrape is much slower than the others.
+DEFAULT_SOURCES = [source for source in ('amazon', 'myntra') if source in ENABLED_SOURCES]
+# Overall time budget for one /scrape/all request, in seconds.
+DEFAULT_DEADLINE = 20.0
+MAX_DEADLINE = 60.0
+# Upper bound on scrapes running at once across all fan-out requests.
+MAX_WORKERS = 8
+
+# Products buffered between scraping threads and a streaming response.
+STREAM_BUFFER = 200
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='fanout')
+_DONE = object()
+
+
+def parse_sources(value):
+    """
+    Turns a comma separated 'sources' parameter into a list of source names.
+    Raises ValueError if any name is unknown or not enabled on this server.
+    """
+    if not value:
+        if not DEFAULT_SOURCES:
+            raise ValueError("No default sources are enabled; name them in 'sources'.")
+        return list(DEFAULT_SOURCES)
+    sources = []
+    for name in value.split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in SOURCES:
+            raise ValueError(f"Unknown source '{name}'. Choose from: {', '.join(SOURCES)}")
+        if name not in ENABLED_SOURCES:
+            raise ValueError(f"Source '{name}' is not enabled on this server. "
+                             f"Choose from: {', '.join(ENABLED_SOURCES)}")
+        if name not in sources:
+            sources.append(name)
+    if not sources:
+        raise ValueError("At least one source is required.")
+    return sources
+
+
+def _run_scraper(source, search_query, options):
+    start = time.monotonic()
+    result = get_scraper(source)(search_query, **options)
+    return result, time.monotonic() - start
+
+
+def scrape_all(search_query, sources=None, deadline=DEFAULT_DEADLINE, **options):
+    """
+    Scrapes several marketplaces concurrently and merges their products.
+
+    Each source runs on a shared, bounded thread pool. Sources that have not
+    finished when the deadline passes are reported as timed out and their
+    products are left out, so the call never waits longer than the deadline.
+
+    Args:
+        search_query (str): The product to search for.
+        sources (list): Source names to scrape. Defaults to DEFAULT_SOURCES.
+        deadline (float): Seconds to wait for all sources in total.
+        **options: Passed on to every scraper, e.g. page and max_results.
+
+    Returns:
+        dict: 'products' holds every product tagged with its 'source', and
+              'sources' holds a status entry per source.
+    """
+    sources = sources or list(DEFAULT_SOURCES)
+    futures = {_executor.submit(_run_scraper, source, search_query, options): source for source in sources}
+    done, pending = wait(futures, timeout=deadline)
+
+    products = []
+    status = {}
+    for future, source in futures.items():
+        if future in pending:
+            # Drop it if it never started; a running scrape finishes in the background.
+            future.cancel()
+            status[source] = {'status': 'timeout'}
+            continue
+        try:
+            result, elapsed = future.result()
+        except Exception as e:
+            print(f"Fan-out scrape of {source} raised: {e}")
+            status[source] = {'status': 'error', 'error': str(e)}
+            continue
+        if isinstance(result, dict) and 'error' in result:
+            status[source] = {'status': 'error', 'error': result['error'], 'elapsed': round(elapsed, 3)}
+            continue
+        products.extend(result)
+        status[source] = {'status': 'ok', 'count': len(result), 'elapsed': round(elapsed, 3)}
+
+    return {'query': search_query, 'products': products, 'sources': status}
+
+
+def failure_status(sources):
+    """
+    The HTTP status for a fan-out where no source succeeded, given its
+    'sources' status entries: 504 when every source ran out of time, 500 when
+    any of them failed. None when at least one source succeeded.
+    """
+    statuses = [entry['status'] for entry in sources.values()]
+    if 'ok' in statuses:
+        return None
+    return 504 if all(status == 'timeout' for status in statuses) else 500
+
+
+def _put(out, stop, entry):
+    # Block while the buffer is full, but give up once the consumer has gone.
+    while not stop.is_set():
+        try:
+            out.put(entry, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(source, search_query, options, out, stop):
+    try:
+        for item in iter_source_products(source, search_query, **options):
+            if not _put(out, stop, (source, item)):
+                return
+    except Exception as e:
+        print(f"Fan-out stream of {source} raised: {e}")
+        _put(out, stop, (source, {'source': source, 'error': str(e)}))
+    _put(out, stop, (source, _DONE))
+
+
+def iter_all(search_query, sources=None, deadline=DEFAULT_DEADLINE, **options):
+    """
+    Streaming form of scrape_all: yields products from every source as soon
+    as their pages are parsed, interleaved across sources.
+
+    Products are passed through a bounded buffer, so memory stays flat however
+    many are scraped. Once the deadline passes no more products are yielded.
+    The last item is always {"sources": {...}} with the same per-source
+    status entries as scrape_all.
+    """
+    sources = sources or list(DEFAULT_SOURCES)
+    out = queue.Queue(maxsize=STREAM_BUFFER)
+    stop = threading.Event()
+    start = time.monotonic()
+    status = {source: {'status': 'timeout', 'count': 0} for source in sources}
+    running = set(sources)
+    for source in sources:
+        _executor.submit(_produce, source, search_query, options, out, stop)
+
+    try:
+        while running:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            try:
+                source, item = out.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                running.discard(source)
+                if status[source]['status'] == 'timeout':
+                    status[source]['status'] = 'ok'
+                status[source]['elapsed'] = round(time.monotonic() - start, 3)
+            elif isinstance(item, dict):
+                # Products are Product objects; a dict here is a source's error item.
+                status[source] = {'status': 'error', 'error': item['error'], 'count': status[source]['count']}
+            else:
+                status[source]['count'] += 1
+                yield item
+        yield {'sources': status}
+    finally:
+        # Lets the producers stop even if the client disconnected mid-stream.
+        stop.set()
@@ -0,0 +1,103 @@
+import heapq
+from dataclasses import dataclass
+
+from scraper_api.product import Product
+
+# Sort orders for ?sort=: cheapest first, best rated first, most reviewed
+# first. Products missing the field go last.
+SORT_KEYS = {
+    'price': lambda product: (product.price is None, product.price or 0),
+    'rating': lambda product: (product.rating is None, -(product.rating or 0)),
+    'reviews': lambda product: (product.reviews is None, -(product.reviews or 0)),
+}
+
+
+@dataclass(frozen=True)
+class ProductFilter:
+    """
+    Bounds a product must meet: prices in paise, rating out of 5. None means
+    unbounded. Parsers check it as soon as they have read a product's price
+    and rating, so rejected products are never fully extracted.
+    """
+    min_price: int = None
+    max_price: int = None
+    min_rating: float = None
+
+    def accepts(self, price, rating):
+        if self.min_price is not None and (price is None or price < self.min_price):
+            return False
+        if self.max_price is not None and (price is None or price > self.max_price):
+            return False
+        if self.min_rating is not None and (rating is None or rating < self.min_rating):
+            return False
+        return True
+
+    def matches(self, product):
+        return self.accepts(product.price, product.rating)
+
+
+class FilteredPage(list):
+    """
+    The products of one result page that passed a filter. 'scanned' counts
+    every product on the page, so pagination can tell a page with no matches
+    from the end of the results.
+    """
+
+    def __init__(self, products=(), scanned=0):
+        super().__init__(products)
+        self.scanned = scanned
+
+
+def filter_products(products, filters):
+    """ Returns the products that pass filters (a ProductFilter or None). """
+    if filters is None:
+        return products
+    return [product for product in products if filters.matches(product)]
+
+
+def select(products, sort=None, limit=None):
+    """
+    Orders products by a SORT_KEYS key and keeps the first 'limit'. With a
+    limit, the top products are picked with a heap in O(n log limit) rather
+    than sorting everything.
+    """
+    if sort is None:
+        return products[:limit] if limit is not None else products
+    if limit is None:
+        return sorted(products, key=SORT_KEYS[sort])
+    return heapq.nsmallest(limit, products, key=SORT_KEYS[sort])
+
+
+def limit_stream(items, limit):
+    """
+    Passes through at most 'limit' products from a stream, and every other
+    item (errors, the final status record) as is.
+    """
+    count = 0
+    for item in items:
+        if isinstance(item, Product):
+            if count >= limit:
+                continue
+            count += 1
+        yield item
+
+
+async def limit_stream_async(items, limit):
+    """ Async counterpart of limit_stream. """
+    count = 0
+    async for item in items:
+        if isinstance(item, Product):
+            if count >= limit:
+                continue
+            count += 1
+        yield item
+
+
+def results_needed(max_results, sort=None, limit=None):
+    """
+    The max_results to scrape for a request. Without a sort only the first
+    'limit' products are kept, so there is no point collecting more.
+    """
+    if max_results is None or limit is None or sort is not None:
+        return max_results
+    return min(max_results, limit)
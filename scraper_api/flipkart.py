@@ -5,106 +5,348 @@ from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import (ElementClickInterceptedException, ElementNotInteractableException,
+                                        StaleElementReferenceException, TimeoutException, WebDriverException)
+import json
+import os
+from scraper_api.cache import cached
+from scraper_api.singleflight import single_flight
+from scraper_api.price_history import record_history
+from scraper_api.search_index import index_products
+from scraper_api.product import Product, to_count, to_paise, to_rating
+from scraper_api.filters import FilteredPage
+from scraper_api.pagination import fetch_pages
+from scraper_api.parse_pool import parse_page
+from scraper_api.driver_pool import DriverPool, DriverPoolTimeout
+from scraper_api import metrics, rate_limit
+from scraper_api import debug_pages
+from scraper_api.debug_pages import save_page
 
-def scrape_flipkart_products(search_query):
-    """
-    Scrapes Flipkart for products using Selenium with explicit waits for more reliability.
-    """
-    search_query = search_query.replace(' ', '+')
-    url = f"https://www.flipkart.com/search?q={search_query}"
-    print(f"Attempting to fetch data from Flipkart: {url}")
+# --- Browser Settings (overridable through the environment) ---
+# Lean mode loads no images, fonts or media, lets driver.get return once the
+# DOM is ready, and reads the products inside the page with one script
+# instead of copying the whole rendered page out to BeautifulSoup.
+# '0' goes back to full page loads and parsing page_source.
+LEAN_BROWSER = os.environ.get('FLIPKART_LEAN', '1') != '0'
+# Seconds to wait for the listings to appear.
+LOAD_TIMEOUT = float(os.environ.get('FLIPKART_LOAD_TIMEOUT', '15'))
+# Requests the lean browser drops. Images are also switched off in Chrome
+# itself; their URLs are still read from the <img> tags.
+BLOCKED_URLS = ['*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.svg*', '*.ico*',
+                '*.woff*', '*.ttf*', '*.otf*', '*.mp4*', '*.webm*', '*.m3u8*']
+
+POPUP_CLOSE = "._2KpZ6l._2doB4z, ._30XB9F"
+LISTINGS = "div._4rR01T, a.s1Q9rs, a.WKTcLC"
 
+
+def new_driver():
+    """ Starts a headless Chrome configured for Flipkart, lean unless FLIPKART_LEAN is '0'. """
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36")
-    
+    if LEAN_BROWSER:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        # The listings are waited for explicitly, so don't also wait for every subresource.
+        chrome_options.page_load_strategy = 'eager'
+
     service = ChromeService()
     driver = webdriver.Chrome(service=service, options=chrome_options)
+    if LEAN_BROWSER:
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+        except WebDriverException as e:
+            print(f"Could not block fonts and media in the Flipkart browser: {e}")
+    return driver
+
+
+# Warm browsers shared by every Flipkart scrape in this process.
+driver_pool = DriverPool(
+    new_driver,
+    size=int(os.environ.get('FLIPKART_DRIVERS', '2')),
+    max_pages=int(os.environ.get('FLIPKART_DRIVER_MAX_PAGES', '50')),
+    acquire_timeout=float(os.environ.get('FLIPKART_DRIVER_WAIT', '30')),
+)
+
+
+def iter_flipkart_items(results, keep=None):
+    """
+    Yields a Product for each Flipkart result container that has
+    both a name and a price. Given a ProductFilter as 'keep', a product it
+    rejects yields None before the rest is read.
+    """
+    for item in results:
+        # --- Price Selector (with multiple fallbacks) ---
+        price_element = item.find('div', class_='Nx9bqj')
+        if not price_element:
+            price_element = item.find('div', class_='_30jeq3')
+        price = to_paise(price_element.get_text(strip=True)) if price_element else None
+        if price is None:
+            continue
+        rating_element = item.find('div', class_='_3LWZlK')
+        rating = to_rating(rating_element.get_text(strip=True)) if rating_element else None
+        if keep is not None and not keep.accepts(price, rating):
+            yield None
+            continue
+
+        # --- Name Selector (with multiple fallbacks) ---
+        name_element = item.find('a', class_='WKTcLC') 
+        if not name_element:
+            name_element = item.find('div', class_='_4rR01T')
+        if not name_element:
+            name_element = item.find('a', class_='s1Q9rs')
+
+        # --- Image Selector (with multiple fallbacks) ---
+        image_element = item.find('img', class_='_53J4C-')
+        if not image_element:
+            image_element = item.find('img', class_='_396cs4')
+
+        # The listing id sits on the container or on the card just inside it.
+        id_holder = item if item.get('data-id') else item.find(attrs={'data-id': True})
+        reviews_element = item.find('span', class_='_2_R_DZ')
+
+        name = name_element.get_text(strip=True) if name_element else None
+        if name:
+            yield Product(
+                'flipkart', id_holder['data-id'] if id_holder else None, name, price,
+                rating=rating,
+                reviews=to_count(reviews_element.get_text(strip=True)) if reviews_element else None,
+                image_url=image_element.get('src') if image_element else None,
+            )
+
+
+#==============================================================================
+# IN-PAGE EXTRACTION (lean mode)
+#==============================================================================
+# Reads the same containers and fields as parse_flipkart_page, inside the
+# browser, and returns them as one compact JSON string:
+#   {"found": <containers>, "items": [[id, name, price, rating, reviews, image], ...]}
+# Items without a price element are left out, as iter_flipkart_items skips them.
+EXTRACT_SCRIPT = """
+const text = (root, selectors) => {
+  for (const selector of selectors) {
+    const element = root.querySelector(selector);
+    if (element) return element.textContent.trim();
+  }
+  return null;
+};
+let containers = document.querySelectorAll('div._1xHGtK._373qXS, div._1AtVbE, div.cPHDOP');
+if (!containers.length) containers = document.querySelectorAll('div[data-id]');
+const items = [];
+for (const item of containers) {
+  const price = text(item, ['div.Nx9bqj', 'div._30jeq3']);
+  if (price === null) continue;
+  const holder = item.hasAttribute('data-id') ? item : item.querySelector('[data-id]');
+  const image = item.querySelector('img._53J4C-') || item.querySelector('img._396cs4');
+  items.push([
+    holder ? holder.getAttribute('data-id') : null,
+    text(item, ['a.WKTcLC', 'div._4rR01T', 'a.s1Q9rs']),
+    price,
+    text(item, ['div._3LWZlK']),
+    text(item, ['span._2_R_DZ']),
+    image ? image.getAttribute('src') : null,
+  ]);
+}
+return JSON.stringify({found: containers.length, items: items});
+"""
 
+
+def parse_flipkart_records(payload, keep=None):
+    """
+    Turns the JSON from EXTRACT_SCRIPT into Products, with the same rules and
+    return values as parse_flipkart_page.
+    """
+    data = json.loads(payload)
+    print(f"Found {data['found']} potential product items.")
+    if not data['found']:
+        return None
     products = []
+    scanned = 0
+    for product_id, name, price, rating, reviews, image_url in data['items']:
+        price = to_paise(price)
+        if price is None:
+            continue
+        rating = to_rating(rating)
+        if keep is not None and not keep.accepts(price, rating):
+            scanned += 1
+            continue
+        if name:
+            scanned += 1
+            products.append(Product('flipkart', product_id, name, price, rating=rating,
+                                    reviews=to_count(reviews), image_url=image_url))
+    return products if keep is None else FilteredPage(products, scanned=scanned)
+
+
+def wait_for_listings(driver, timeout=LOAD_TIMEOUT):
+    """
+    Waits until product listings are in the page, closing the login popup
+    if it shows up on the way. Both are checked in one wait, so a page
+    without a popup is read as soon as its listings appear.
+
+    Returns:
+        bool: True if listings appeared within 'timeout' seconds.
+    """
+    def ready(driver):
+        if driver.find_elements(By.CSS_SELECTOR, LISTINGS):
+            return True
+        for button in driver.find_elements(By.CSS_SELECTOR, POPUP_CLOSE):
+            if button.is_displayed() and button.is_enabled():
+                button.click()
+                print("Login popup closed.")
+        return False
+
     try:
-        driver.get(url)
-        print("Waiting for Flipkart page to load...")
+        WebDriverWait(driver, timeout, poll_frequency=0.1, ignored_exceptions=(
+            StaleElementReferenceException, ElementNotInteractableException, ElementClickInterceptedException,
+        )).until(ready)
+        return True
+    except TimeoutException:
+        return False
 
-        # --- Close Login Popup (if it appears) ---
-        try:
-            close_button = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "._2KpZ6l._2doB4z, ._30XB9F")))
-            close_button.click()
-            print("Login popup closed.")
-        except TimeoutException:
-            print("No login popup appeared.")
-
-        # --- Wait for Product Listings to be Present ---
-        # A more reliable wait condition: wait for at least one product title to be visible.
-        try:
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div._4rR01T, a.s1Q9rs, a.WKTcLC"))
-            )
-            print("Product listings found.")
-        except TimeoutException:
-            print("Timed out waiting for product listings to appear.")
-            return []
 
-        page_source = driver.page_source
+def parse_flipkart_page(page_source, keep=None):
+    """
+    Extracts products from a rendered Flipkart search result page.
+
+    Args:
+        page_source (str): The page HTML from the browser.
+        keep (ProductFilter): Only return products that pass it.
+
+    Returns:
+        list: A list of Products (a FilteredPage when 'keep' is given), or
+              None if no result containers were found at all.
+    """
+    with metrics.span('flipkart', 'document'):
         soup = BeautifulSoup(page_source, 'html.parser')
 
         # Using a more general selector that covers multiple layouts
         results = soup.find_all('div', class_=['_1xHGtK _373qXS', '_1AtVbE', 'cPHDOP'])
         if not results:
-             results = soup.find_all('div', {'data-id': True})
+            results = soup.find_all('div', {'data-id': True})
 
+    print(f"Found {len(results)} potential product items.")
+    if not results:
+        return None
+    with metrics.span('flipkart', 'extract'):
+        if keep is None:
+            return list(iter_flipkart_items(results))
+        items = list(iter_flipkart_items(results, keep))
+    return FilteredPage([item for item in items if item is not None], scanned=len(items))
 
-        print(f"Found {len(results)} potential product items.")
 
-        if not results:
-            print("No products found. Flipkart might have changed its layout.")
-            with open("flipkart_no_results.html", "w", encoding="utf-8") as f:
-                f.write(page_source)
-            print("Page content saved to flipkart_no_results.html for debugging.")
-            return []
-
-        for item in results:
-            # --- Name Selector (with multiple fallbacks) ---
-            name_element = item.find('a', class_='WKTcLC') 
-            if not name_element:
-                name_element = item.find('div', class_='_4rR01T')
-            if not name_element:
-                name_element = item.find('a', class_='s1Q9rs')
-            
-            # --- Price Cleaning Logic (with multiple fallbacks) ---
-            price_text = 'N/A'
-            price_element = item.find('div', class_='Nx9bqj')
-            if not price_element:
-                price_element = item.find('div', class_='_30jeq3')
-            
-            if price_element:
-                price_text = price_element.get_text(strip=True).replace('\u20b9', '').replace('₹', '').replace(',', '')
-
-            # --- Image Selector (with multiple fallbacks) ---
-            image_element = item.find('img', class_='_53J4C-')
-            if not image_element:
-                image_element = item.find('img', class_='_396cs4')
-
-            product_data = {
-                'name': name_element.get_text(strip=True) if name_element else 'N/A',
-                'price': price_text,
-                'rating': item.find('div', class_='_3LWZlK').get_text(strip=True) if item.find('div', class_='_3LWZlK') else 'N/A',
-                'reviews': item.find('span', class_='_2_R_DZ').get_text(strip=True) if item.find('span', class_='_2_R_DZ') else 'N/A',
-                'image_url': image_element['src'] if image_element else 'N/A'
-            }
-
-            if product_data['name'] != 'N/A' and product_data['price'] != 'N/A':
-                products.append(product_data)
+# Products on a typical search result page, used to size page batches.
+PER_PAGE = 24
+HOST = 'www.flipkart.com'
+# Where search pages are loaded from; point it at a replay server to run offline.
+BASE_URL = os.environ.get('FLIPKART_BASE_URL', 'https://www.flipkart.com')
+
+
+def build_search_url(search_query, page=1):
+    """ Returns the Flipkart search URL for a query and result page. """
+    url = f"{BASE_URL}/search?q={search_query.replace(' ', '+')}"
+    if page > 1:
+        url += f"&page={page}"
+    return url
+
+
+def scrape_flipkart_page(search_query, page=1, filters=None):
+    """
+    Scrapes a single Flipkart search result page with a pooled browser,
+    keeping only the products that pass 'filters' when given.
 
+    Returns:
+        list: The products on the page, or a dict with an "error" key.
+    """
+    url = build_search_url(search_query, page)
+    print(f"Attempting to fetch data from Flipkart: {url}")
+
+    try:
+        with metrics.span('flipkart', 'driver'):
+            driver = driver_pool.acquire()
+    except DriverPoolTimeout as e:
+        print(f"Flipkart scrape gave up waiting for a browser: {e}")
+        return {"error": "All Flipkart browsers are busy, please retry shortly."}
+    except WebDriverException as e:
+        print(f"Could not start a browser for Flipkart: {e}")
+        return {"error": str(e)}
+
+    broken = False
+    try:
+        with metrics.span('flipkart', 'throttle'):
+            rate_limit.acquire(HOST)
+        load_started = time.perf_counter()
+        driver.get(url)
+        print("Waiting for Flipkart page to load...")
+        try:
+            if not wait_for_listings(driver):
+                print("Timed out waiting for product listings to appear.")
+                return []
+            print("Product listings found.")
+        finally:
+            metrics.observe('flipkart', 'load', time.perf_counter() - load_started)
+
+        page_source = payload = None
+        if LEAN_BROWSER:
+            with metrics.span('flipkart', 'download'):
+                payload = driver.execute_script(EXTRACT_SCRIPT)
+            metrics.UPSTREAM_BYTES.inc('flipkart', amount=len(payload))
+            if debug_pages.DUMP_DIR and not json.loads(payload)['found']:
+                # Keep the page for debugging; only copied out when nothing was found.
+                page_source = driver.page_source
+        else:
+            with metrics.span('flipkart', 'download'):
+                page_source = driver.page_source
+            metrics.UPSTREAM_BYTES.inc('flipkart', amount=len(page_source))
+
+    except WebDriverException as e:
+        # The browser itself failed; recycle it rather than hand it to the next caller.
+        broken = True
+        print(f"Browser error during Flipkart scraping: {e}")
+        return {"error": str(e)}
     except Exception as e:
         print(f"An unexpected error occurred during Flipkart scraping: {e}")
         return {"error": str(e)}
     finally:
-        driver.quit()
+        driver_pool.release(driver, broken=broken)
 
-    print(f"Successfully parsed {len(products)} products from Flipkart.")
+    # The browser is back in the pool. The lean payload is small enough to
+    # read here; a full page goes to the parse worker processes.
+    try:
+        if payload is not None:
+            with metrics.span('flipkart', 'extract'):
+                products = parse_flipkart_records(payload, filters)
+        else:
+            products = parse_page('flipkart', page_source, filters)
+    except Exception as e:
+        print(f"An unexpected error occurred while parsing Flipkart results: {e}")
+        return {"error": str(e)}
+
+    if products is None:
+        print("No products found. Flipkart might have changed its layout.")
+        if page_source is not None:
+            save_page('flipkart', 'no_results', page_source)
+        return []
+
+    print(f"Successfully parsed {len(products)} products from Flipkart page {page}.")
     return products
+
+
+@cached('flipkart')
+@single_flight('flipkart')
+@record_history('flipkart')
+@index_products('flipkart')
+def scrape_flipkart_products(search_query, page=1, max_results=None, filters=None):
+    """
+    Scrapes Flipkart for products using Selenium with explicit waits for more reliability.
+
+    Args:
+        search_query (str): The product to search for.
+        page (int): The result page to start from.
+        max_results (int): Collect up to this many products across pages,
+                           each loaded in its own pooled browser. None fetches just 'page'.
+        filters (ProductFilter): Only collect products that pass it.
+    """
+    return fetch_pages(lambda n: scrape_flipkart_page(search_query, n, filters),
+                       HOST, page, max_results, per_page=PER_PAGE)
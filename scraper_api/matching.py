@@ -0,0 +1,175 @@
+import os
+import random
+import re
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+
+from scraper_api.filters import SORT_KEYS
+
+# --- Matching Settings (overridable through the environment) ---
+# Share of the shorter title's tokens the longer one must contain for two
+# products to count as the same item.
+MATCH_THRESHOLD = float(os.environ.get('SCRAPER_MATCH_THRESHOLD', '0.6'))
+# MinHash signature length, split into bands of BAND_ROWS values. A pair
+# becomes a candidate when all rows of any band agree, which happens for
+# token Jaccard similarity s with probability 1 - (1 - s ** BAND_ROWS) ** bands.
+# 32 bands of 2 rows catch nearly every pair above s = 0.3, which is where a
+# long Amazon title and a short Myntra one for the same item tend to land.
+NUM_PERM = 64
+BAND_ROWS = 2
+# Band buckets holding more products than this are skipped: they come from
+# tokens so common they say nothing, and comparing inside them is quadratic.
+MAX_BUCKET = 50
+
+_TOKEN = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+# Words that say nothing about which item a title is.
+STOPWORDS = frozenset(
+    'a an and by for from in of on or the to with without set pack combo new latest men women mens womens '
+    'boys girls kids unisex'.split())
+# Fixed masks, so signatures are the same in every process and run.
+_MASKS = random.Random(0x5EED).sample(range(1, 2 ** 32), NUM_PERM)
+
+
+def tokens(title):
+    """
+    Normalizes a title into its set of tokens: lower-cased words and numbers,
+    without stopwords. 'Apple iPhone 15 (128 GB) - Black' -> {'apple', 'iphone', '15', '128', 'gb', 'black'}.
+    """
+    return frozenset(token for token in _TOKEN.findall(title.lower()) if token not in STOPWORDS)
+
+
+def _numbers(token_set):
+    return {token for token in token_set if token[0].isdigit()}
+
+
+@lru_cache(maxsize=65536)
+def _token_hashes(token):
+    # Titles share most of their words, so each word's hashes are worked out once.
+    value = zlib.crc32(token.encode())
+    return tuple(value ^ mask for mask in _MASKS)
+
+
+def signature(token_set):
+    """ The MinHash signature of a token set: NUM_PERM minimums of the tokens' hashes under fixed masks. """
+    return tuple(map(min, zip(*map(_token_hashes, token_set))))
+
+
+def overlap(a, b, numbers_a=None, numbers_b=None):
+    """
+    How far two token sets describe the same item, from 0 to 1: the share of
+    the shorter title's tokens found in the longer one. It is 0 when a number
+    of the shorter title (a model number, size or capacity) is missing from
+    the longer one. The sets' numbers can be passed in if already known.
+    """
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b, numbers_a, numbers_b = b, a, numbers_b, numbers_a
+    score = len(a & b) / len(a)
+    if score and not (numbers_a if numbers_a is not None else _numbers(a)) <= (
+            numbers_b if numbers_b is not None else _numbers(b)):
+        return 0.0
+    return score
+
+
+class ProductGroup:
+    """ Products from one or more sources that are likely the same item. """
+
+    def __init__(self, offers):
+        # Cheapest first; offers without a price go last.
+        self.offers = sorted(offers, key=SORT_KEYS['price'])
+
+    @property
+    def cheapest(self):
+        return self.offers[0]
+
+    @property
+    def sources(self):
+        return sorted({offer.source for offer in self.offers})
+
+    def to_dict(self):
+        prices = [offer.price for offer in self.offers if offer.price is not None]
+        return {
+            'name': self.cheapest.name,
+            'sources': self.sources,
+            'cheapest': self.cheapest,
+            'price_spread': max(prices) - min(prices) if prices else None,
+            'offers': self.offers,
+        }
+
+
+def match_products(products, threshold=MATCH_THRESHOLD):
+    """
+    Groups the products that are likely the same item on different sources.
+
+    Titles are reduced to token sets and MinHash signatures, and only
+    products sharing an LSH band bucket are compared, so the work grows with
+    the number of products rather than the number of pairs. Candidate pairs
+    from different sources whose overlap() reaches 'threshold' are then
+    joined best pair first, and a group takes at most one offer per source,
+    so a chain of loose matches cannot pull unrelated items together.
+    Repeats of a product (same source and product_id, e.g. from overlapping
+    pages) are dropped first; products without a product_id are all kept.
+
+    Args:
+        products (list): Products from any mix of sources.
+        threshold (float): See MATCH_THRESHOLD.
+
+    Returns:
+        list: ProductGroups covering every distinct product, groups offered
+              by the most sources first, then cheapest first.
+    """
+    unique = {}
+    items = []
+    for product in products:
+        # Products without an id cannot be told apart, so each one is kept.
+        if product.product_id is None:
+            items.append(product)
+        elif (product.source, product.product_id) not in unique:
+            unique[product.source, product.product_id] = product
+            items.append(product)
+    token_sets = [tokens(product.name or '') for product in items]
+    numbers = [_numbers(token_set) for token_set in token_sets]
+
+    buckets = defaultdict(list)
+    for i, token_set in enumerate(token_sets):
+        if not token_set:
+            continue
+        values = signature(token_set)
+        for band in range(0, NUM_PERM, BAND_ROWS):
+            buckets[band, values[band:band + BAND_ROWS]].append(i)
+
+    scores = {}
+    for members in buckets.values():
+        if not 2 <= len(members) <= MAX_BUCKET:
+            continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                if items[i].source == items[j].source or (i, j) in scores:
+                    continue
+                scores[i, j] = overlap(token_sets[i], token_sets[j], numbers[i], numbers[j])
+
+    # Each product starts in its own group; groups merge best pair first.
+    group_of = list(range(len(items)))
+    members = {i: [i] for i in range(len(items))}
+    for (i, j), score in sorted(scores.items(), key=lambda pair: -pair[1]):
+        if score < threshold:
+            break
+        a, b = group_of[i], group_of[j]
+        if a == b or {items[k].source for k in members[a]} & {items[k].source for k in members[b]}:
+            continue
+        for k in members[b]:
+            group_of[k] = a
+        members[a].extend(members.pop(b))
+
+    groups = [ProductGroup([items[i] for i in group]) for group in members.values()]
+    groups.sort(key=lambda group: (-len(group.sources), SORT_KEYS['price'](group.cheapest)))
+    return groups
+
+
+def select_groups(groups, sort=None, limit=None):
+    """ Orders groups by a SORT_KEYS key of their cheapest offer and keeps the first 'limit'. """
+    if sort is not None:
+        groups = sorted(groups, key=lambda group: SORT_KEYS[sort](group.cheapest))
+    return groups[:limit] if limit is not None else groups
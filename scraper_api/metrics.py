@@ -0,0 +1,178 @@
+import contextlib
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# --- Metrics Settings (overridable through the environment) ---
+# '0' turns recording off; /metrics then serves empty metrics.
+METRICS_ENABLED = os.environ.get('SCRAPER_METRICS', '1') != '0'
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """ A Prometheus counter with a fixed set of label names. """
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """ A Prometheus histogram with a fixed set of label names and buckets. """
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value):
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+#==============================================================================
+# SCRAPER METRICS
+#==============================================================================
+# Stages, in the order a page goes through them:
+#   throttle   waiting for the host's rate limiter
+#   dns        resolving the host (async client; the sync client counts it in connect)
+#   connect    opening a new connection
+#   tls        the TLS handshake of a new connection (sync client)
+#   wait       sending the request until the response headers arrive, including retries
+#   download   reading the response body (for Flipkart, the rendered page source or the
+#              products read in the page by the lean browser)
+#   driver     waiting for a pooled browser (Flipkart)
+#   load       loading and waiting for the page in the browser (Flipkart)
+#   parse      handing a page to the parse pool until its products come back
+#   document   building the HTML tree or decoding the JSON state, in the parser
+#   extract    reading the fields of every product, in the parser
+#   match      grouping the same item across sources (/scrape/all?group=1)
+#   serialize  encoding the response JSON
+STAGE_SECONDS = Histogram('scraper_stage_seconds', 'Time spent in each stage of scraping a page.',
+                          ('source', 'stage'))
+REQUEST_SECONDS = Histogram('scraper_request_seconds', 'Latency of /scrape requests until the response is ready.',
+                            ('source', 'status'))
+UPSTREAM_RESPONSES = Counter('scraper_upstream_responses_total', 'Responses received from the sites, by status.',
+                             ('source', 'status'))
+UPSTREAM_BYTES = Counter('scraper_upstream_bytes_total', 'Response body bytes received from the sites.',
+                         ('source',))
+PAGE_CACHE = Counter('scraper_page_cache_total',
+                     'Page fetches by how the page cache answered: fresh, revalidated (304) or fetched.',
+                     ('source', 'result'))
+SEARCH_INDEX = Counter('scraper_search_index_total',
+                       'Index-first /scrape requests, by whether the search index answered (hit) or not (miss).',
+                       ('source', 'result'))
+
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, UPSTREAM_RESPONSES, UPSTREAM_BYTES, PAGE_CACHE, SEARCH_INDEX]
+
+_local = threading.local()
+
+
+def observe(source, stage, seconds):
+    """ Records the duration of one stage, or holds it back inside collect(). """
+    collected = getattr(_local, 'collected', None)
+    if collected is not None:
+        collected.append((source, stage, seconds))
+        return
+    STAGE_SECONDS.observe(source, stage, value=seconds)
+
+
+@contextlib.contextmanager
+def span(source, stage):
+    """ Times the enclosed block as one stage of a scrape. """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(source, stage, time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Holds back the spans observed in this thread and gives them to the caller
+    as a list of (source, stage, seconds). Parse workers use it to send their
+    timings back with the products; replay() records them in the server.
+    """
+    saved = getattr(_local, 'collected', None)
+    _local.collected = spans = []
+    try:
+        yield spans
+    finally:
+        _local.collected = saved
+
+
+def replay(spans):
+    """ Records spans collected elsewhere, such as in a parse worker. """
+    for source, stage, seconds in spans or ():
+        observe(source, stage, seconds)
+
+
+def count_response(source, status, size):
+    """ Counts one upstream response and its body bytes. """
+    UPSTREAM_RESPONSES.inc(source, str(status))
+    UPSTREAM_BYTES.inc(source, amount=size)
+
+
+def render():
+    """ Returns every metric in the Prometheus text exposition format. """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -1,98 +1,180 @@
 import requests
-from bs4 import BeautifulSoup
 import json
+import os
 import re
+from scraper_api import metrics
+from scraper_api.sessions import fetch
+from scraper_api.cache import cached
+from scraper_api.singleflight import single_flight
+from scraper_api.price_history import record_history
+from scraper_api.search_index import index_products
+from scraper_api.product import Product, to_count, to_paise, to_rating
+from scraper_api.filters import FilteredPage
+from scraper_api.pagination import fetch_pages
+from scraper_api.parse_pool import parse_page
+from scraper_api.debug_pages import save_page
 
-def scrape_myntra_products(search_query):
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Start of the page state assignment in the raw HTML.
+_STATE_MARKER = re.compile(rb'window\.__myx\s*=\s*')
+_SCRIPT_END = b'</script>'
+
+
+def _load_json(buffer):
+    # orjson decodes straight from the memoryview; the stdlib needs bytes.
+    if orjson is not None:
+        return orjson.loads(buffer)
+    return json.loads(bytes(buffer))
+
+
+def extract_products_json(content):
     """
-    Scrapes product information from Myntra by parsing embedded JSON data.
-    
+    Pulls the search result products out of a Myntra page's window.__myx state.
+
+    Rather than building a DOM to find the script tag, this scans the raw
+    response bytes for the assignment and decodes the JSON in place up to the
+    closing script tag.
+
     Args:
-        search_query (str): The product to search for.
-        
+        content (bytes): The raw HTML of the page.
+
     Returns:
-        list: A list of dictionaries, where each dictionary represents a product.
-              Returns a dictionary with an "error" key if scraping fails.
+        list: The raw product objects, or None if the page has no state blob.
     """
+    match = _STATE_MARKER.search(content)
+    if not match:
+        return None
+    start = match.end()
+    end = content.find(_SCRIPT_END, start)
+    if end == -1:
+        end = len(content)
+    # Trim trailing whitespace and the statement's semicolon without copying.
+    while end > start and content[end - 1] in b' \t\r\n;':
+        end -= 1
+
+    with metrics.span('myntra', 'document'):
+        data = _load_json(memoryview(content)[start:end])
+    return data.get('searchData', {}).get('results', {}).get('products', [])
+
+
+def iter_myntra_products(products, keep=None):
+    """
+    Yields a Product for each raw product object from the page state.
+    Products with malformed fields are skipped. Given a ProductFilter as
+    'keep', a product it rejects yields None before the rest is read.
+    """
+    for product in products:
+        try:
+            # Get the price in rupees (use the discounted price if available, otherwise the standard price)
+            price = to_paise(product.get('discountedPrice', product.get('price', 0)))
+
+            # Ratings come as floats such as 4.2531; keep one decimal like the other sources
+            rating = to_rating(product.get('rating'))
+            if rating is not None:
+                rating = round(rating, 1)
+            if keep is not None and not keep.accepts(price, rating):
+                yield None
+                continue
+
+            # Combine brand and product name to create a full name
+            brand = product.get('brand', '')
+            name = product.get('productName', '')
+            full_name = f"{brand} {name}".strip()
+
+            # Get the primary image URL
+            image_info = product.get('images', [])
+            image_url = image_info[0]['src'] if image_info and 'src' in image_info[0] else None
+            
+            # Get the product URL
+            product_link = product.get('landingPageUrl', '')
+            product_url = f"https://www.myntra.com/{product_link}" if product_link else None
+
+            product_id = product.get('productId')
+            yield Product(
+                'myntra', str(product_id) if product_id is not None else None, full_name, price,
+                rating=rating,
+                reviews=to_count(product.get('ratingCount')),
+                image_url=image_url,
+                url=product_url,
+            )
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            # This handles cases where a specific product in the JSON has missing fields
+            print(f"Skipping a product due to a data parsing error: {e}")
+            continue
+
+
+def parse_myntra_page(content, keep=None):
+    """
+    Extracts products from a Myntra search result page.
+
+    Args:
+        content (bytes): The raw HTML of the page.
+        keep (ProductFilter): Only return products that pass it.
+
+    Returns:
+        list: A list of Products (a FilteredPage when 'keep' is given), or
+              None if the page has no window.__myx state.
+    """
+    products = extract_products_json(content)
+    if products is None:
+        return None
+    with metrics.span('myntra', 'extract'):
+        if keep is None:
+            return list(iter_myntra_products(products))
+        items = list(iter_myntra_products(products, keep))
+    return FilteredPage([item for item in items if item is not None], scanned=len(items))
+
+
+# Headers to mimic a browser visit
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+# Products on a Myntra search result page, used to size page batches.
+PER_PAGE = 50
+HOST = 'www.myntra.com'
+# Where search pages are fetched from; point it at a replay server to run offline.
+BASE_URL = os.environ.get('MYNTRA_BASE_URL', 'https://www.myntra.com')
+
+
+def build_search_url(search_query, page=1):
+    """ Returns the Myntra search URL for a query and result page. """
     # Myntra's search URL structure
-    url = f"https://www.myntra.com/{search_query.replace(' ', '-')}"
-    
-    # Headers to mimic a browser visit
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    url = f"{BASE_URL}/{search_query.replace(' ', '-')}"
+    if page > 1:
+        url += f"?p={page}"
+    return url
+
+
+def scrape_myntra_page(search_query, page=1, filters=None):
+    """
+    Scrapes a single Myntra search result page, keeping only the products
+    that pass 'filters' (a ProductFilter) when given.
+
+    Returns:
+        list: The products on the page, or a dict with an "error" key.
+    """
+    url = build_search_url(search_query, page)
 
     try:
         print(f"Requesting Myntra URL: {url}")
-        response = requests.get(url, headers=headers, timeout=10)
+        response = fetch(url, headers=HEADERS, timeout=10, source='myntra')
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find the script tag containing the product data (window.__myx)
-        script_tag = soup.find('script', string=re.compile('window.__myx ='))
+        # Decode the products from the window.__myx state on the parse worker processes
+        products = parse_page('myntra', response.content, filters)
 
-        if not script_tag:
+        if products is None:
             print("Could not find the data script tag on the Myntra page.")
+            save_page('myntra', 'no_state', response.content)
             return {"error": "Failed to find product data. The site structure may have changed."}
-        
-        # Extract the JSON string from the script tag's content
-        script_content = script_tag.string
-        # Isolate the JSON object by splitting the string
-        json_str = script_content.split('window.__myx = ')[1].strip().rstrip(';')
-
-        # Parse the JSON string into a Python dictionary
-        data = json.loads(json_str)
-        
-        # Navigate through the dictionary to get the list of products
-        products = data.get('searchData', {}).get('results', {}).get('products', [])
 
         if not products:
             print("No products found in the page's JSON data.")
-            return []
-
-        scraped_products = []
-        for product in products:
-            try:
-                # Combine brand and product name to create a full name
-                brand = product.get('brand', '')
-                name = product.get('productName', '')
-                full_name = f"{brand} {name}".strip()
-
-                # Get the price (use the discounted price if available, otherwise the standard price)
-                price = product.get('discountedPrice', product.get('price', 0))
-                
-                # Get the primary image URL
-                image_info = product.get('images', [])
-                image_url = image_info[0]['src'] if image_info and 'src' in image_info[0] else 'No Image Found'
-                
-                # Get rating and reviews, formatting them as requested and defaulting to 'N/A'
-                rating_value = product.get('rating')
-                rating = f"{rating_value:.1f} out of 5 stars" if rating_value else "N/A"
-                
-                review_count = product.get('ratingCount')
-                reviews = str(review_count) if review_count else "N/A"
-
-                # Get the product URL
-                product_url = ''
-                product_link = product.get('landingPageUrl', '')
-                if product_link:
-                    product_url = f"https://www.myntra.com/{product_link}"
-
-                scraped_products.append({
-                    'name': full_name,
-                    'price': str(price),
-                    'image_url': image_url,
-                    'rating': rating,
-                    'reviews': reviews,
-                    'url': product_url
-                })
-            except (KeyError, IndexError, TypeError) as e:
-                # This handles cases where a specific product in the JSON has missing fields
-                print(f"Skipping a product due to a data parsing error: {e}")
-                continue
-                
-        return scraped_products
+        return products
 
     except requests.exceptions.RequestException as e:
         print(f"An error occurred during the request to Myntra: {e}")
@@ -103,3 +185,25 @@ def scrape_myntra_products(search_query):
         print(f"An unexpected error occurred while scraping Myntra: {e}")
         return {"error": f"An unexpected error occurred. Error: {e}"}
 
+
+@cached('myntra')
+@single_flight('myntra')
+@record_history('myntra')
+@index_products('myntra')
+def scrape_myntra_products(search_query, page=1, max_results=None, filters=None):
+    """
+    Scrapes product information from Myntra by parsing embedded JSON data.
+    
+    Args:
+        search_query (str): The product to search for.
+        page (int): The result page to start from.
+        max_results (int): Collect up to this many products across pages,
+                           fetched concurrently. None fetches just 'page'.
+        filters (ProductFilter): Only collect products that pass it.
+        
+    Returns:
+        list: A list of Products.
+              Returns a dictionary with an "error" key if scraping fails.
+    """
+    return fetch_pages(lambda n: scrape_myntra_page(search_query, n, filters),
+                       HOST, page, max_results, per_page=PER_PAGE)
@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# --- Page Cache Settings (overridable through the environment) ---
+# Path to the SQLite file raw result pages are kept in. Empty turns the page
+# cache off; ':memory:' keeps it for the life of the process.
+PAGE_CACHE_DB = os.environ.get('SCRAPER_PAGE_CACHE_DB', '')
+# Versions of each URL kept for re-parsing; older ones are deleted.
+KEEP_VERSIONS = int(os.environ.get('SCRAPER_PAGE_CACHE_VERSIONS', '3'))
+COMPRESS_LEVEL = 6
+
+
+@dataclass(slots=True)
+class CachedPage:
+    """ One stored version of a page, with the validators it was served with. """
+    url: str
+    source: str
+    fetched_at: float
+    # Last time the site confirmed this version, by sending it or a 304.
+    checked_at: float
+    etag: str = None
+    last_modified: str = None
+    # Seconds after checked_at the page may be used without asking the site.
+    max_age: float = 0
+    content_type: str = None
+    body: bytes = b''
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.checked_at + self.max_age
+
+    def validators(self):
+        """ The headers that make a request conditional on this version. """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        """ A requests.Response carrying this version, as if the site had just sent it. """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict({'Content-Type': self.content_type or 'text/html'})
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = self.body
+        return response
+
+
+def _cache_control(headers):
+    directives = {}
+    for part in headers.get('Cache-Control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def storable(headers):
+    """ Whether a 200 response with these headers may be stored. """
+    return 'no-store' not in _cache_control(headers)
+
+
+def max_age(headers):
+    """ Seconds a response may be reused without revalidating, per its Cache-Control. """
+    directives = _cache_control(headers)
+    if 'no-cache' in directives:
+        return 0
+    try:
+        return max(float(directives.get('max-age', 0)), 0)
+    except ValueError:
+        return 0
+
+
+_COLUMNS = 'url, source, fetched_at, checked_at, etag, last_modified, max_age, content_type, body'
+
+
+class PageCache:
+    """
+    Raw result pages kept in SQLite, zlib-compressed, keyed by URL.
+
+    Each URL keeps its KEEP_VERSIONS most recent distinct bodies. A fetch of
+    an identical body only marks the latest version as checked again, so
+    pages that never change take the space of one copy. The stored pages
+    double as an archive that can be parsed again (see reparse()).
+    """
+
+    def __init__(self, path, keep_versions=KEEP_VERSIONS):
+        self.path = path
+        self.keep_versions = keep_versions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            ' url TEXT, source TEXT, fetched_at REAL, checked_at REAL, etag TEXT, last_modified TEXT,'
+            ' max_age REAL, content_type TEXT, digest TEXT, size INTEGER, body BLOB);'
+            'CREATE INDEX IF NOT EXISTS pages_url ON pages (url, fetched_at);'
+            'CREATE INDEX IF NOT EXISTS pages_source ON pages (source, fetched_at);')
+        self._conn.commit()
+
+    def reopen(self):
+        """ Opens a fresh connection to the file in a forked worker; see PriceHistory.reopen(). """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    @staticmethod
+    def _page(row):
+        *fields, body = row
+        return CachedPage(*fields, body=zlib.decompress(body))
+
+    def lookup(self, url):
+        """ Returns the latest stored version of a URL, or None. """
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {_COLUMNS} FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT 1', (url,)).fetchone()
+        return self._page(row) if row is not None else None
+
+    def save(self, url, source, headers, body, now=None):
+        """
+        Stores a 200 response. Returns False if its Cache-Control forbids storing it.
+
+        Args:
+            url (str): The URL that was fetched.
+            source (str): The source the page belongs to.
+            headers (Mapping): The response headers.
+            body (bytes): The decoded response body.
+        """
+        if not storable(headers):
+            return False
+        now = now or time.time()
+        digest = hashlib.sha1(body).hexdigest()
+        compressed = zlib.compress(body, COMPRESS_LEVEL)
+        values = (headers.get('ETag'), headers.get('Last-Modified'), max_age(headers))
+        with self._lock, self._conn:
+            latest = self._conn.execute(
+                'SELECT rowid, digest FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT 1', (url,)).fetchone()
+            if latest is not None and latest[1] == digest:
+                self._conn.execute(
+                    'UPDATE pages SET checked_at = ?, etag = ?, last_modified = ?, max_age = ? WHERE rowid = ?',
+                    (now, *values, latest[0]))
+                return True
+            self._conn.execute(
+                'INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, source, now, now, *values, headers.get('Content-Type'), digest, len(body), compressed))
+            self._conn.execute(
+                'DELETE FROM pages WHERE rowid IN ('
+                'SELECT rowid FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)',
+                (url, self.keep_versions))
+        return True
+
+    def revalidated(self, page, headers, now=None):
+        """ Records a 304 for a stored version, taking any updated validators from the response. """
+        now = now or time.time()
+        page.checked_at = now
+        page.etag = headers.get('ETag') or page.etag
+        page.last_modified = headers.get('Last-Modified') or page.last_modified
+        page.max_age = max_age(headers) if 'Cache-Control' in headers else page.max_age
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE pages SET checked_at = ?, etag = ?, last_modified = ?, max_age = ? '
+                'WHERE url = ? AND fetched_at = ?',
+                (now, page.etag, page.last_modified, page.max_age, page.url, page.fetched_at))
+
+    def iter_pages(self, source=None, since=None, until=None):
+        """ Yields stored versions, oldest first, optionally of one source and time range. """
+        query = 'SELECT rowid FROM pages WHERE fetched_at >= ? AND fetched_at < ?'
+        params = [since or 0, until or float('inf')]
+        if source:
+            query += ' AND source = ?'
+            params.append(source)
+        with self._lock:
+            rowids = [row[0] for row in self._conn.execute(query + ' ORDER BY fetched_at', params)]
+        # Read the bodies a batch at a time rather than holding them all.
+        for i in range(0, len(rowids), 100):
+            batch = rowids[i:i + 100]
+            with self._lock:
+                rows = {row[0]: row[1:] for row in self._conn.execute(
+                    f'SELECT rowid, {_COLUMNS} FROM pages WHERE rowid IN ({",".join("?" * len(batch))})', batch)}
+            for rowid in batch:
+                if rowid in rows:
+                    yield self._page(rows[rowid])
+
+    def stats(self):
+        """ Returns {source: (versions, URLs, raw bytes, stored bytes)}. """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source, COUNT(*), COUNT(DISTINCT url), SUM(size), SUM(LENGTH(body)) '
+                'FROM pages GROUP BY source').fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def prune(self, before):
+        """ Deletes versions fetched before a Unix time. Returns how many were deleted. """
+        with self._lock, self._conn:
+            return self._conn.execute('DELETE FROM pages WHERE fetched_at < ?', (before,)).rowcount
+
+
+store = PageCache(PAGE_CACHE_DB) if PAGE_CACHE_DB else None
+
+
+def reparse(source, since=None, until=None, cache=None):
+    """
+    Parses stored pages of a source again with the current parsers, e.g.
+    after a change to the extraction logic, without fetching anything.
+
+    Yields:
+        tuple: (CachedPage, products) for each stored version, oldest first.
+               products is None for a page the parser does not recognise.
+    """
+    from scraper_api.parse_pool import PARSE_PROCESSES, parse_page
+    cache = cache or store
+    workers = max(PARSE_PROCESSES, 1)
+    # One thread per parse worker keeps every worker busy, and a window of
+    # twice that many pages bounds how many bodies are held at once.
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for page in cache.iter_pages(source, since, until):
+            window.append((page, executor.submit(parse_page, source, page.body)))
+            if len(window) >= workers * 2:
+                page, future = window.popleft()
+                yield page, future.result()
+        while window:
+            page, future = window.popleft()
+            yield page, future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m scraper_api.page_cache',
+                                     description='Inspect and re-parse the stored result pages.')
+    parser.add_argument('--db', default=PAGE_CACHE_DB, help='page cache file (default: SCRAPER_PAGE_CACHE_DB)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='pages and bytes stored per source')
+    reparse_cmd = commands.add_parser('reparse', help='parse stored pages again')
+    reparse_cmd.add_argument('source')
+    reparse_cmd.add_argument('--since', type=float, help='Unix time of the oldest page to parse')
+    reparse_cmd.add_argument('--history', action='store_true',
+                             help='record the products in the price history at their fetch times')
+    prune_cmd = commands.add_parser('prune', help='delete old pages')
+    prune_cmd.add_argument('--days', type=float, required=True, help='keep pages fetched in the last DAYS days')
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error('no page cache; pass --db or set SCRAPER_PAGE_CACHE_DB')
+    cache = PageCache(args.db)
+
+    if args.command == 'stats':
+        for source, (versions, urls, raw, stored) in sorted(cache.stats().items()):
+            print(f"{source:<10} {versions} pages of {urls} URLs, {raw / 2 ** 20:.1f} MiB "
+                  f"stored in {stored / 2 ** 20:.1f} MiB")
+    elif args.command == 'reparse':
+        from scraper_api import price_history
+        if args.history and price_history.store is None:
+            parser.error('--history needs SCRAPER_HISTORY_DB')
+        pages = products_found = 0
+        for page, products in reparse(args.source, args.since, cache=cache):
+            pages += 1
+            products_found += len(products or ())
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(page.fetched_at))} "
+                  f"{page.url}: {'unrecognised page' if products is None else f'{len(products)} products'}")
+            if args.history and products:
+                price_history.store.record(args.source, products, observed_at=page.fetched_at)
+        print(f"Parsed {products_found} products from {pages} stored pages.")
+    else:
+        print(f"Deleted {cache.prune(time.time() - args.days * 86400)} pages.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
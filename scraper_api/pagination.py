@@ -0,0 +1,103 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Hard cap on result pages fetched for one call.
+MAX_PAGES = 20
+# Largest max_results the API accepts.
+MAX_RESULTS_LIMIT = 500
+# Result pages one paginated call keeps in flight at once, per host.
+HOST_CONCURRENCY = {
+    'www.amazon.in': 3,
+    'www.myntra.com': 3,
+    'www.flipkart.com': 2,
+}
+DEFAULT_HOST_CONCURRENCY = 2
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='pages')
+
+
+def _is_error(result):
+    return isinstance(result, dict) and 'error' in result
+
+
+def page_exhausted(result):
+    """
+    True if a page had no products at all. A FilteredPage with no matches
+    still had products, so the results go on past it.
+    """
+    return not getattr(result, 'scanned', len(result))
+
+
+def iter_pages(scrape_page, host, page=1, max_results=None, per_page=20):
+    """
+    Yields the result of each page in page order as soon as it is available.
+
+    Without max_results only 'page' is fetched. Otherwise pages from 'page'
+    onwards are fetched through a sliding window of HOST_CONCURRENCY[host]
+    requests, and a new page is only started while the pages in flight are
+    not expected to cover what is still needed. Fetching stops as soon as
+    max_results products have been yielded, a page comes back with no
+    products at all (before filtering) or with an error, or MAX_PAGES is
+    reached. The last page is trimmed so no more
+    than max_results products come out in total.
+
+    Args:
+        scrape_page (callable): Takes a page number and returns a list of
+                                products or a dict with an "error" key.
+        host (str): Host the pages come from, for the concurrency limit.
+        page (int): First page to fetch, starting at 1.
+        max_results (int): Number of products wanted, or None for one page.
+        per_page (int): Typical products per page, used to decide how many
+                        pages to start.
+    """
+    if max_results is None:
+        yield scrape_page(page)
+        return
+
+    window = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+    in_flight = deque()
+    collected = 0
+    next_page = page
+    last_page = page + MAX_PAGES
+    try:
+        while True:
+            while (len(in_flight) < window and next_page < last_page
+                   and len(in_flight) * per_page < max_results - collected):
+                in_flight.append(_executor.submit(scrape_page, next_page))
+                next_page += 1
+            if not in_flight:
+                return
+
+            result = in_flight.popleft().result()
+            if _is_error(result) or page_exhausted(result):
+                yield result
+                return
+            result = result[:max_results - collected]
+            collected += len(result)
+            yield result
+            if collected >= max_results:
+                return
+    finally:
+        # Skip pages that have not started yet; running ones finish unused.
+        for future in in_flight:
+            future.cancel()
+
+
+def fetch_pages(scrape_page, host, page=1, max_results=None, per_page=20):
+    """
+    Collects products from consecutive result pages, fetching them concurrently.
+    See iter_pages for how pages are scheduled and when fetching stops.
+
+    Returns:
+        list: Up to max_results products, or the first page's error dict if
+              nothing could be collected.
+    """
+    products = []
+    for result in iter_pages(scrape_page, host, page, max_results, per_page):
+        if _is_error(result):
+            if not products:
+                return result
+            print(f"Stopping pagination on {host} after an error: {result['error']}")
+            break
+        products.extend(result)
+    return products
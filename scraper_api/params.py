@@ -0,0 +1,168 @@
+import math
+from datetime import datetime
+
+from scraper_api.fanout import DEFAULT_DEADLINE, MAX_DEADLINE, parse_sources
+from scraper_api.filters import SORT_KEYS, ProductFilter
+from scraper_api.pagination import MAX_RESULTS_LIMIT
+from scraper_api.product import to_paise
+from scraper_api.search_index import INDEX_MAX_AGE, MAX_ROWS, ORDERS
+from scraper_api.streaming import STREAM_FORMATS
+
+# Query parameter parsing shared by the Flask and ASGI apps. Each function
+# takes the request's args mapping and raises ValueError with a message fit
+# for a 400 response when a value is invalid.
+
+
+def parse_paging_args(args):
+    """ Reads the optional 'page' and 'max_results' query parameters. """
+    try:
+        page = int(args.get('page', 1))
+        max_results = args.get('max_results')
+        max_results = int(max_results) if max_results is not None else None
+    except ValueError:
+        raise ValueError("'page' and 'max_results' must be integers.")
+    if page < 1:
+        raise ValueError("'page' must be a positive integer.")
+    if max_results is not None and not 1 <= max_results <= MAX_RESULTS_LIMIT:
+        raise ValueError(f"'max_results' must be an integer between 1 and {MAX_RESULTS_LIMIT}.")
+    return page, max_results
+
+
+def parse_stream_format(args):
+    """ Reads the optional 'stream' query parameter (ndjson or sse). """
+    stream = args.get('stream')
+    if stream and stream not in STREAM_FORMATS:
+        raise ValueError(f"'stream' must be one of: {', '.join(STREAM_FORMATS)}.")
+    return stream
+
+
+def parse_deadline(args):
+    """ Reads the optional 'deadline' query parameter, clamped to MAX_DEADLINE seconds. """
+    try:
+        deadline = float(args.get('deadline', DEFAULT_DEADLINE))
+    except ValueError:
+        raise ValueError("'deadline' must be a number of seconds.")
+    return min(max(deadline, 0.0), MAX_DEADLINE)
+
+
+def parse_group(args):
+    """ Reads the optional 'group' query parameter: whether to group the same item across sources. """
+    group = args.get('group', '').lower() in ('1', 'true', 'yes')
+    if group and args.get('stream'):
+        raise ValueError("'group' needs the whole result, so it cannot be combined with 'stream'.")
+    return group
+
+
+def parse_index(args):
+    """
+    Reads the optional 'index' and 'max_age' query parameters of /scrape/*.
+    With index=1 the search index answers if it has enough products seen in
+    the last 'max_age' seconds (default INDEX_MAX_AGE). Returns that age, or
+    None when the index should not be tried.
+    """
+    if args.get('index', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    if args.get('stream'):
+        raise ValueError("'index' cannot be combined with 'stream'.")
+    try:
+        max_age = float(args.get('max_age', INDEX_MAX_AGE))
+    except ValueError:
+        raise ValueError("'max_age' must be a number of seconds.")
+    if max_age <= 0:
+        raise ValueError("'max_age' must be positive.")
+    return max_age
+
+
+def parse_search_args(args):
+    """
+    Reads the optional 'sources', 'order', 'limit' and 'match' parameters
+    of /search. The price and rating bounds are read by parse_bounds.
+
+    Returns:
+        tuple: (source list or None for all, order, limit, any_word)
+    """
+    sources = parse_sources(args['sources']) if args.get('sources') else None
+    order = args.get('order', 'relevance')
+    if order not in ORDERS:
+        raise ValueError(f"'order' must be one of: {', '.join(ORDERS)}.")
+    try:
+        limit = int(args.get('limit', 50))
+    except ValueError:
+        raise ValueError("'limit' must be an integer.")
+    if not 1 <= limit <= MAX_ROWS:
+        raise ValueError(f"'limit' must be an integer between 1 and {MAX_ROWS}.")
+    match = args.get('match', 'all')
+    if match not in ('all', 'any'):
+        raise ValueError("'match' must be 'all' or 'any'.")
+    return sources, order, limit, match == 'any'
+
+
+def parse_since(args, default=None):
+    """ Reads the optional 'since' query parameter, as Unix seconds or an ISO 8601 time. """
+    since = args.get('since')
+    if since is None:
+        return default
+    try:
+        return float(since)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(since).timestamp()
+    except ValueError:
+        raise ValueError("'since' must be Unix seconds or an ISO 8601 time such as 2024-05-01T00:00:00.")
+
+
+def _number(args, name):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a number.")
+    if not math.isfinite(number):
+        raise ValueError(f"'{name}' must be a number.")
+    if number < 0:
+        raise ValueError(f"'{name}' must not be negative.")
+    return number
+
+
+def parse_bounds(args):
+    """ Reads the optional 'min_price', 'max_price' (rupees) and 'min_rating' query parameters into a ProductFilter. """
+    min_price = _number(args, 'min_price')
+    max_price = _number(args, 'max_price')
+    min_rating = _number(args, 'min_rating')
+    if min_price is None and max_price is None and min_rating is None:
+        return None
+    return ProductFilter(
+        min_price=to_paise(min_price) if min_price is not None else None,
+        max_price=to_paise(max_price) if max_price is not None else None,
+        min_rating=min_rating,
+    )
+
+
+def parse_filter_args(args):
+    """
+    Reads the optional 'min_price', 'max_price' (rupees), 'min_rating',
+    'sort' and 'limit' query parameters.
+
+    Returns:
+        tuple: (ProductFilter or None, sort key or None, limit or None)
+    """
+    filters = parse_bounds(args)
+
+    sort = args.get('sort')
+    if sort and sort not in SORT_KEYS:
+        raise ValueError(f"'sort' must be one of: {', '.join(SORT_KEYS)}.")
+    if sort and args.get('stream'):
+        raise ValueError("'sort' needs the whole result, so it cannot be combined with 'stream'.")
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("'limit' must be an integer.")
+        if not 1 <= limit <= MAX_RESULTS_LIMIT:
+            raise ValueError(f"'limit' must be an integer between 1 and {MAX_RESULTS_LIMIT}.")
+    return filters, sort or None, limit
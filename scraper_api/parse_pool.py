@@ -0,0 +1,145 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from scraper_api import metrics
+from scraper_api.filters import FilteredPage
+from scraper_api.product import Product
+from scraper_api.sources import is_enabled
+
+# Worker processes that parse downloaded pages. 0 parses in the calling thread.
+PARSE_PROCESSES = int(os.environ.get('SCRAPER_PARSE_PROCESSES', str(os.cpu_count() or 2)))
+
+# Page parsers by source: (module, function). Each function takes the raw
+# page and returns a list of Products, or None when the page has no
+# recognisable product data. Workers send products back as plain tuples,
+# which pickle smaller and faster than the objects, along with the timing
+# spans the parser recorded.
+PAGE_PARSERS = {
+    'amazon': ('scraper_api.amazon', 'parse_amazon_page'),
+    'myntra': ('scraper_api.myntra_scraper', 'parse_myntra_page'),
+    'flipkart': ('scraper_api.flipkart', 'parse_flipkart_page'),
+}
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _parse(source, content, keep=None):
+    module_name, func_name = PAGE_PARSERS[source]
+    parse = getattr(importlib.import_module(module_name), func_name)
+    return parse(content) if keep is None else parse(content, keep=keep)
+
+
+def _parse_compact(source, content, keep=None):
+    # Runs inside a worker process.
+    with metrics.collect() as spans:
+        products = _parse(source, content, keep)
+    if products is None:
+        return None, None, spans
+    return [product.to_tuple() for product in products], getattr(products, 'scanned', None), spans
+
+
+def _expand(result):
+    records, scanned, spans = result
+    metrics.replay(spans)
+    if records is None:
+        return None
+    products = [Product(*record) for record in records]
+    return products if scanned is None else FilteredPage(products, scanned)
+
+
+def get_pool():
+    """ Returns the shared parse process pool, or None when PARSE_PROCESSES is 0. """
+    global _pool
+    if PARSE_PROCESSES <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # forkserver avoids forking a process full of request threads and
+            # held locks; workers start from a clean server with the parsers preloaded.
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                # Not Flipkart's: its parser module brings Selenium along.
+                context.set_forkserver_preload([PAGE_PARSERS[source][0] for source in ('amazon', 'myntra')
+                                                if is_enabled(source)])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=PARSE_PROCESSES, mp_context=context)
+        return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_up(source):
+    """
+    Imports a source's parser and runs it once on an empty page, in this
+    process, so the first real page does not pay for it. Parse workers warm
+    up on their own through the forkserver preload.
+    """
+    try:
+        _parse(source, b'<html><body></body></html>')
+    except Exception as e:
+        print(f"Warming up the {source} parser failed: {e}")
+
+
+def parse_page(source, content, keep=None):
+    """
+    Parses a result page on the process pool and returns its products.
+
+    Args:
+        source (str): A key of PAGE_PARSERS.
+        content (bytes or str): The raw page.
+        keep (ProductFilter): Only return products that pass it; the workers
+                              skip the rest while parsing.
+
+    Returns:
+        list: The Products (a FilteredPage when 'keep' is given), or None if
+              the page has no product data.
+    """
+    with metrics.span(source, 'parse'):
+        pool = get_pool()
+        if pool is None:
+            return _parse(source, content, keep)
+        try:
+            result = pool.submit(_parse_compact, source, content, keep).result()
+        except BrokenProcessPool:
+            print("Parse worker pool broke; restarting it and parsing this page inline.")
+            _reset_pool(pool)
+            return _parse(source, content, keep)
+        return _expand(result)
+
+
+async def parse_page_async(source, content, keep=None):
+    """ Async counterpart of parse_page; without a process pool it parses on a thread. """
+    loop = asyncio.get_running_loop()
+    with metrics.span(source, 'parse'):
+        pool = get_pool()
+        if pool is None:
+            return await loop.run_in_executor(None, _parse, source, content, keep)
+        try:
+            result = await loop.run_in_executor(pool, _parse_compact, source, content, keep)
+        except BrokenProcessPool:
+            print("Parse worker pool broke; restarting it and parsing this page on a thread.")
+            _reset_pool(pool)
+            return await loop.run_in_executor(None, _parse, source, content, keep)
+        return _expand(result)
+
+
+def shutdown():
+    """ Stops the parse worker processes. """
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
@@ -0,0 +1,168 @@
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+
+# --- History Settings (overridable through the environment) ---
+# Path to the SQLite price-history file. Empty turns recording off.
+HISTORY_DB = os.environ.get('SCRAPER_HISTORY_DB', '')
+# Most rows a history or drops query returns.
+MAX_ROWS = 1000
+
+
+class PriceHistory:
+    """
+    Append-only price history kept in SQLite.
+
+    'observations' gets one row per product each time its price, rating or
+    review count differs from the last recorded one; unchanged products write
+    nothing. Prices are integer paise, as on Product. Each row carries the
+    previous price, so price drops are a range scan on observed_at. 'latest'
+    holds the current values of every product and is what new scrapes are
+    compared against.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS observations ('
+            ' source TEXT, product_id TEXT, observed_at REAL,'
+            ' price INTEGER, prev_price INTEGER, rating REAL, reviews INTEGER, name TEXT, url TEXT);'
+            'CREATE INDEX IF NOT EXISTS observations_product ON observations (source, product_id, observed_at);'
+            'CREATE INDEX IF NOT EXISTS observations_time ON observations (observed_at);'
+            'CREATE TABLE IF NOT EXISTS latest ('
+            ' source TEXT, product_id TEXT, price INTEGER, rating REAL, reviews INTEGER, observed_at REAL,'
+            ' PRIMARY KEY (source, product_id)) WITHOUT ROWID;')
+        self._conn.commit()
+
+    def reopen(self):
+        """
+        Opens a fresh connection to the file. A process forked after the
+        store was created (a gunicorn worker) calls this first, since a
+        SQLite connection must not be used on both sides of a fork.
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def record(self, source, products, observed_at=None):
+        """
+        Records a scrape of a source, writing only products that changed.
+
+        Args:
+            source (str): The source the products came from.
+            products (list): Products; ones without a product_id are skipped.
+            observed_at (float): Unix time of the scrape. Defaults to now.
+
+        Returns:
+            int: How many observations were written.
+        """
+        observed_at = observed_at or time.time()
+        current = {}
+        for product in products:
+            if product.product_id:
+                current[product.product_id] = product
+        if not current:
+            return 0
+
+        with self._lock:
+            previous = {}
+            ids = list(current)
+            # Stay under SQLite's bound-parameter limit.
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = self._conn.execute(
+                    'SELECT product_id, price, rating, reviews FROM latest '
+                    f'WHERE source = ? AND product_id IN ({",".join("?" * len(chunk))})',
+                    [source] + chunk)
+                previous.update((row[0], row[1:]) for row in rows)
+
+            changed = []
+            for product_id, product in current.items():
+                values = (product.price, product.rating, product.reviews)
+                old = previous.get(product_id)
+                if old is None or tuple(old) != values:
+                    changed.append((product_id, product, values, old[0] if old else None))
+
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(source, product_id, observed_at, price, prev_price, rating, reviews,
+                      product.name, product.url)
+                     for product_id, product, (price, rating, reviews), prev_price in changed])
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?, ?)',
+                    [(source, product_id, price, rating, reviews, observed_at)
+                     for product_id, _, (price, rating, reviews), _ in changed])
+        return len(changed)
+
+    def history(self, source, product_id, since=None, limit=MAX_ROWS):
+        """ Returns the recorded changes of one product, oldest first. """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT observed_at, price, rating, reviews, name, url FROM observations '
+                'WHERE source = ? AND product_id = ? AND observed_at >= ? ORDER BY observed_at LIMIT ?',
+                (source, product_id, since or 0, limit)).fetchall()
+        return [dict(zip(('observed_at', 'price', 'rating', 'reviews', 'name', 'url'), row)) for row in rows]
+
+    def drops_since(self, since, source=None, limit=MAX_ROWS):
+        """ Returns price drops observed at or after 'since', largest drop first. """
+        query = ('SELECT source, product_id, observed_at, prev_price, price, name, url FROM observations '
+                 'WHERE observed_at >= ? AND price < prev_price')
+        params = [since]
+        if source:
+            query += ' AND source = ?'
+            params.append(source)
+        query += ' ORDER BY prev_price - price DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(('source', 'product_id', 'observed_at', 'old_price', 'price', 'name', 'url'), row))
+                for row in rows]
+
+
+store = PriceHistory(HISTORY_DB) if HISTORY_DB else None
+
+
+def _record(source, value):
+    if store is None or not isinstance(value, list):
+        return
+    try:
+        store.record(source, value)
+    except sqlite3.Error as e:
+        print(f"Could not record {source} price history: {e}")
+
+
+def record_history(source):
+    """
+    Records the products a scrape_<source>_products function returns in the
+    price history. Place it under the cache decorators so that only real
+    scrapes are recorded, not cache hits.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            value = func(*args, **kwargs)
+            _record(source, value)
+            return value
+        return wrapper
+
+    return decorator
+
+
+def async_record_history(source):
+    """ Async counterpart of record_history(); the SQLite write runs on a thread. """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            value = await func(*args, **kwargs)
+            if store is not None:
+                await asyncio.to_thread(_record, source, value)
+            return value
+        return wrapper
+
+    return decorator
@@ -0,0 +1,104 @@
+import json
+import re
+import sys
+from dataclasses import dataclass
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+# --- Field normalizers ---
+# Each takes whatever a page gives (text such as '₹1,299.00', '4.3 out of 5
+# stars' or '(1,234)', a number, or a missing value) and returns the typed
+# value, or None when there is nothing usable.
+
+def to_paise(value):
+    """ Turns a rupee price such as '₹1,299.50' or 1299 into integer paise. """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return round(value * 100)
+    match = _NUMBER.search(value.replace(',', ''))
+    return round(float(match.group()) * 100) if match else None
+
+
+def to_rating(value):
+    """ Reads the leading number of a rating such as '4.3 out of 5 stars'. """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) or None
+    match = _NUMBER.search(value)
+    return float(match.group()) if match else None
+
+
+def to_count(value):
+    """ Reads a review count such as '1234' or '(1,234)'. """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) or None
+    match = _NUMBER.search(value.replace(',', ''))
+    return int(float(match.group())) if match else None
+
+
+@dataclass(slots=True)
+class Product:
+    """
+    One product from a result page, with typed fields:
+
+    - price: integer paise (₹1,299.50 is 129950)
+    - rating: float out of 5
+    - reviews: int count
+    - source: an interned source name, so every product of a source shares it
+
+    Missing values are None. Products serialize to JSON as an object with
+    these fields (see to_dict and json_default).
+    """
+    source: str
+    product_id: str
+    name: str
+    price: int
+    rating: float = None
+    reviews: int = None
+    image_url: str = None
+    url: str = None
+
+    def __post_init__(self):
+        self.source = sys.intern(self.source)
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'product_id': self.product_id,
+            'name': self.name,
+            'price': self.price,
+            'rating': self.rating,
+            'reviews': self.reviews,
+            'image_url': self.image_url,
+            'url': self.url,
+        }
+
+    def to_tuple(self):
+        """ The fields in declaration order; Product(*t) rebuilds the product. """
+        return (self.source, self.product_id, self.name, self.price, self.rating,
+                self.reviews, self.image_url, self.url)
+
+
+def json_default(obj):
+    """ 'default' hook for json.dumps that writes Products as objects. """
+    if isinstance(obj, Product):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """ Serializes a value that may contain Products to a JSON string. """
+    if orjson is not None:
+        # orjson writes slotted dataclasses natively, without building dicts.
+        return orjson.dumps(value).decode()
+    return json.dumps(value, default=json_default)
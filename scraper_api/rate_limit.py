@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+import time
+
+# --- Rate Limit Settings (overridable through the environment) ---
+# Sustained requests per second and burst size allowed per host.
+RATES = {
+    'www.amazon.in': (float(os.environ.get('AMAZON_RATE', '2')), 4),
+    'www.myntra.com': (float(os.environ.get('MYNTRA_RATE', '4')), 8),
+    'www.flipkart.com': (float(os.environ.get('FLIPKART_RATE', '1')), 2),
+}
+DEFAULT_RATE = (2.0, 4)
+# On a 429/503 the host's rate is multiplied by THROTTLE_FACTOR, down to
+# MIN_RATE_FACTOR of its configured rate. Each healthy response then adds
+# RECOVERY_STEP of the configured rate back until it is fully restored.
+THROTTLE_FACTOR = 0.5
+MIN_RATE_FACTOR = 0.05
+RECOVERY_STEP = 0.05
+THROTTLE_STATUSES = (429, 503)
+# Longest a caller will wait for its turn before giving up.
+MAX_WAIT = float(os.environ.get('SCRAPER_RATE_MAX_WAIT', '30'))
+# Path to a SQLite file shared by every worker on the machine. Empty keeps
+# each process's buckets in memory.
+RATE_LIMIT_DB = os.environ.get('SCRAPER_RATE_LIMIT_DB', '')
+
+
+class RateLimitExceeded(Exception):
+    """ Raised when a host is throttled so hard that the wait would exceed MAX_WAIT. """
+
+
+def _limits(host):
+    return RATES.get(host, DEFAULT_RATE)
+
+
+def _take(state, host, now):
+    """
+    Refills a bucket state (tokens, updated_at, rate) up to now and takes one
+    token. Tokens may go negative: that is a reservation in the future, and
+    the returned wait is how long until it comes due.
+    """
+    tokens, updated_at, rate = state
+    _, burst = _limits(host)
+    tokens = min(burst, tokens + (now - updated_at) * rate) - 1
+    wait = -tokens / rate if tokens < 0 else 0.0
+    return (tokens, now, rate), wait
+
+
+def _adjust(state, host, status):
+    tokens, updated_at, rate = state
+    base_rate, _ = _limits(host)
+    if status in THROTTLE_STATUSES:
+        rate = max(rate * THROTTLE_FACTOR, base_rate * MIN_RATE_FACTOR)
+        # Drop any saved-up burst so the slowdown takes effect at once.
+        tokens = min(tokens, 0.0)
+    elif 200 <= status < 400:
+        rate = min(rate + base_rate * RECOVERY_STEP, base_rate)
+    return tokens, updated_at, rate
+
+
+class MemoryLimiter:
+    """ Token buckets kept in this process. """
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host, now):
+        state = self._state.get(host)
+        if state is None:
+            base_rate, burst = _limits(host)
+            state = (float(burst), now, base_rate)
+        return state
+
+    def reserve(self, host):
+        with self._lock:
+            now = time.monotonic()
+            self._state[host], wait = _take(self._get(host, now), host, now)
+            return wait
+
+    def refund(self, host):
+        with self._lock:
+            tokens, updated_at, rate = self._state[host]
+            self._state[host] = (tokens + 1, updated_at, rate)
+
+    def record(self, host, status):
+        with self._lock:
+            self._state[host] = _adjust(self._get(host, time.monotonic()), host, status)
+
+    def current_rate(self, host):
+        with self._lock:
+            return self._get(host, time.monotonic())[2]
+
+
+class SQLiteLimiter:
+    """
+    Token buckets kept in a SQLite file, so every worker process on the
+    machine draws from the same buckets. Each update runs in an IMMEDIATE
+    transaction, which takes the database's write lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_buckets ('
+                'host TEXT PRIMARY KEY, tokens REAL, updated_at REAL, rate REAL)')
+
+    def _connect(self):
+        # One connection per thread and process; sqlite3 connections must not cross either.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=MAX_WAIT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _update(self, host, change):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Wall-clock time, since monotonic clocks are not shared across processes.
+            now = time.time()
+            row = conn.execute(
+                'SELECT tokens, updated_at, rate FROM rate_buckets WHERE host = ?', (host,)).fetchone()
+            if row is None:
+                base_rate, burst = _limits(host)
+                row = (float(burst), now, base_rate)
+            state, result = change(row, now)
+            conn.execute('INSERT OR REPLACE INTO rate_buckets (host, tokens, updated_at, rate) VALUES (?, ?, ?, ?)',
+                         (host,) + tuple(state))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def reserve(self, host):
+        return self._update(host, lambda state, now: _take(state, host, now))
+
+    def refund(self, host):
+        self._update(host, lambda state, now: ((state[0] + 1, state[1], state[2]), None))
+
+    def record(self, host, status):
+        self._update(host, lambda state, now: (_adjust(state, host, status), None))
+
+    def current_rate(self, host):
+        return self._update(host, lambda state, now: (state, state[2]))
+
+
+limiter = SQLiteLimiter(RATE_LIMIT_DB) if RATE_LIMIT_DB else MemoryLimiter()
+
+
+def wait_time(host):
+    """
+    Takes the next request slot for a host and returns how many seconds the
+    caller must wait before sending it. Raises RateLimitExceeded rather than
+    wait longer than MAX_WAIT.
+    """
+    wait = limiter.reserve(host)
+    if wait > MAX_WAIT:
+        limiter.refund(host)
+        raise RateLimitExceeded(f"{host} is being throttled; next request slot is {wait:.0f}s away.")
+    return wait
+
+
+def acquire(host):
+    """ Blocks until the caller may send a request to host. """
+    wait = wait_time(host)
+    if wait > 0:
+        time.sleep(wait)
+
+
+def record(host, status):
+    """ Feeds a response status back so the host's rate adapts. """
+    limiter.record(host, status)
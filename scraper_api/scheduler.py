@@ -0,0 +1,257 @@
+import heapq
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scraper_api import cache
+from scraper_api.sources import ENABLED_SOURCES, SOURCES, get_scraper
+
+# --- Crawl Settings (overridable through the environment) ---
+# JSON file listing the watched queries, e.g.
+#   [{"source": "amazon", "q": "laptop", "interval": 600, "priority": 5},
+#    {"source": "myntra", "q": "shirts", "max_results": 100}]
+WATCHLIST = os.environ.get('SCRAPER_WATCHLIST', '')
+# Scrapes the scheduler runs at once, across all watched queries.
+CRAWL_WORKERS = int(os.environ.get('SCRAPER_CRAWL_WORKERS', '4'))
+# Seconds between refreshes of a watched query unless it sets its own.
+DEFAULT_INTERVAL = 900
+MIN_INTERVAL = 60
+# Seconds before a failed refresh is tried again (capped at the query's interval).
+RETRY_DELAY = 60
+# Options a watch entry may pass on to the scraper.
+WATCH_OPTIONS = ('page', 'max_results')
+
+
+class Watch:
+    """ One watched (source, query, options) and its refresh state. """
+
+    def __init__(self, source, search_query, interval=DEFAULT_INTERVAL, priority=0, **options):
+        self.source = source
+        self.query = cache.normalize_query(search_query)
+        self.interval = interval
+        self.priority = priority
+        self.options = options
+        self.key = cache.make_key(source, self.query,
+                                  cache.bind_options(inspect.signature(get_scraper(source)), (), options))
+        self.last_run = None
+        self.last_ok = None
+        self.last_error = None
+        self.running = False
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'q': self.query,
+            'interval': self.interval,
+            'priority': self.priority,
+            **self.options,
+        }
+
+    def status(self):
+        return {
+            **self.to_dict(),
+            'last_run': self.last_run,
+            'last_ok': self.last_ok,
+            'last_error': self.last_error,
+            'running': self.running,
+        }
+
+
+def parse_watch(entry):
+    """
+    Validates one watchlist entry (a dict as in the WATCHLIST file) and
+    returns its Watch. Raises ValueError if the entry is invalid.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError("Each watchlist entry must be an object.")
+    source = str(entry.get('source', '')).lower()
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source '{source}'. Choose from: {', '.join(SOURCES)}")
+    if source not in ENABLED_SOURCES:
+        raise ValueError(f"Source '{source}' is not enabled on this server. "
+                         f"Choose from: {', '.join(ENABLED_SOURCES)}")
+    search_query = entry.get('q')
+    if not isinstance(search_query, str) or not search_query.strip():
+        raise ValueError("Each watchlist entry needs a search query 'q'.")
+    try:
+        interval = float(entry.get('interval', DEFAULT_INTERVAL))
+        priority = int(entry.get('priority', 0))
+        options = {name: int(entry[name]) for name in WATCH_OPTIONS if entry.get(name) is not None}
+    except (TypeError, ValueError):
+        raise ValueError("'interval', 'priority', 'page' and 'max_results' must be numbers.")
+    if interval < MIN_INTERVAL:
+        raise ValueError(f"'interval' must be at least {MIN_INTERVAL} seconds.")
+    return Watch(source, search_query, interval, priority, **options)
+
+
+class Scheduler:
+    """
+    Keeps watched queries pre-scraped in the background.
+
+    Each watch is due again 'interval' seconds after its last refresh. Due
+    watches run highest 'priority' first on a pool of CRAWL_WORKERS threads,
+    so the crawl never holds more than that many scrapes at once no matter
+    how long the watchlist is. Results go to cache.put_watched, where the
+    cached scrapers answer from them without scraping.
+    """
+
+    def __init__(self, workers=CRAWL_WORKERS):
+        self.workers = workers
+        self._watches = {}
+        # (due time, sequence, watch) for every idle watch.
+        self._timeline = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._stopping = False
+
+    def add(self, watch):
+        """ Adds or replaces a watch; it is due at once unless it has fresh stored results. """
+        # Results may be served until the next refresh is overdue by a full interval.
+        max_age = watch.interval * 2 + cache.STALE_TTL
+        stored_at = cache.load_watched(watch.key, max_age)
+        due = time.time() if stored_at is None else stored_at + watch.interval
+        with self._cond:
+            # A replaced watch that is mid-refresh finishes, but is not rescheduled.
+            self._watches[watch.key] = watch
+            heapq.heappush(self._timeline, (due, next(self._seq), watch))
+            self._cond.notify()
+        return watch
+
+    def remove(self, key):
+        """ Stops watching a key. Returns False if it was not watched. """
+        with self._cond:
+            watch = self._watches.pop(key, None)
+        if watch is None:
+            return False
+        cache.drop_watched(key)
+        return True
+
+    def watches(self):
+        with self._cond:
+            return list(self._watches.values())
+
+    def start(self):
+        """ Starts the scheduling thread; calling it again does nothing. """
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl')
+            self._thread = threading.Thread(target=self._run, name='crawl-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        with self._cond:
+            while not self._stopping:
+                now = time.time()
+                ready = []
+                # Discard entries of removed or replaced watches, collect the due ones.
+                while self._timeline and self._timeline[0][0] <= now:
+                    _, _, watch = heapq.heappop(self._timeline)
+                    if self._watches.get(watch.key) is watch:
+                        ready.append(watch)
+                ready.sort(key=lambda watch: -watch.priority)
+                while ready and self._in_flight < self.workers:
+                    watch = ready.pop(0)
+                    watch.running = True
+                    self._in_flight += 1
+                    self._executor.submit(self._refresh, watch)
+                # Due watches that did not fit in the budget wait for the next free worker.
+                for watch in ready:
+                    heapq.heappush(self._timeline, (now, next(self._seq), watch))
+
+                if ready or not self._timeline:
+                    self._cond.wait()
+                else:
+                    self._cond.wait(self._timeline[0][0] - now)
+
+    def _refresh(self, watch):
+        start = time.time()
+        try:
+            # Skip the cache so the site is actually scraped; single-flight still applies.
+            result = get_scraper(watch.source).uncached(watch.query, **watch.options)
+        except Exception as e:
+            result = {"error": str(e)}
+        if not result:
+            # Keep serving the last good result rather than an empty page,
+            # which may as well be a block page as a query without products.
+            result = {"error": "no products found"}
+        if isinstance(result, dict) and 'error' in result:
+            print(f"Crawl of {watch.key} failed: {result['error']}")
+            watch.last_error = result['error']
+            next_run = start + min(RETRY_DELAY, watch.interval)
+        else:
+            cache.put_watched(watch.key, result, watch.interval * 2 + cache.STALE_TTL)
+            watch.last_ok = start
+            watch.last_error = None
+            next_run = start + watch.interval
+        watch.last_run = start
+
+        with self._cond:
+            watch.running = False
+            self._in_flight -= 1
+            if self._watches.get(watch.key) is watch:
+                heapq.heappush(self._timeline, (next_run, next(self._seq), watch))
+            self._cond.notify()
+
+
+def load_watchlist(path):
+    """ Reads a watchlist JSON file and returns its Watch objects. """
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must contain a JSON list of watch entries.")
+    return [parse_watch(entry) for entry in entries]
+
+
+def save_watchlist(path, watches):
+    """ Writes watches back to a watchlist JSON file. """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump([watch.to_dict() for watch in watches], f, indent=2)
+    os.replace(tmp_path, path)
+
+
+scheduler = Scheduler()
+
+
+def start():
+    """ Loads WATCHLIST (if set) into the shared scheduler and starts it. """
+    if WATCHLIST and os.path.exists(WATCHLIST):
+        for watch in load_watchlist(WATCHLIST):
+            scheduler.add(watch)
+        print(f"Crawl scheduler watching {len(scheduler.watches())} queries from {WATCHLIST}")
+    scheduler.start()
+
+
+def watch(entry):
+    """ Adds a watchlist entry to the shared scheduler, saving WATCHLIST if set. """
+    added = scheduler.add(parse_watch(entry))
+    scheduler.start()
+    if WATCHLIST:
+        save_watchlist(WATCHLIST, scheduler.watches())
+    return added
+
+
+def unwatch(entry):
+    """ Removes a watchlist entry from the shared scheduler. Returns False if it was not watched. """
+    removed = scheduler.remove(parse_watch(entry).key)
+    if removed and WATCHLIST:
+        save_watchlist(WATCHLIST, scheduler.watches())
+    return removed
@@ -0,0 +1,230 @@
+import asyncio
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from scraper_api import metrics
+from scraper_api.product import Product
+
+# --- Search Index Settings (overridable through the environment) ---
+# Path to the SQLite file every scraped product is indexed in. Empty turns
+# the index off.
+SEARCH_DB = os.environ.get('SCRAPER_SEARCH_DB', '')
+# Seconds an indexed product counts as fresh for ?index=1 on /scrape/*.
+INDEX_MAX_AGE = float(os.environ.get('SCRAPER_INDEX_MAX_AGE', '3600'))
+# Most rows a search returns.
+MAX_ROWS = 500
+
+_WORD = re.compile(r'\w+')
+_COLUMNS = 'source, product_id, name, price, rating, reviews, image_url, url'
+# Search result orders: best match first, or as in filters.SORT_KEYS.
+ORDERS = {
+    'relevance': 'bm25(products_fts)',
+    'price': 'p.price IS NULL, p.price',
+    'rating': 'p.rating IS NULL, p.rating DESC',
+    'reviews': 'p.reviews IS NULL, p.reviews DESC',
+}
+
+
+def match_expression(search_query, any_word=False):
+    """
+    Turns a search query into an FTS5 match expression over the product
+    names: every word must match (or any word, with 'any_word'), each as a
+    prefix, so 'running shoe' also finds 'Running Shoes'. Returns None if the
+    query has no words.
+    """
+    words = _WORD.findall(search_query.lower())
+    if not words:
+        return None
+    return (' OR ' if any_word else ' ').join(f'"{word}"*' for word in words)
+
+
+class SearchIndex:
+    """
+    Every product the scrapers return, kept in SQLite with an FTS5 index on
+    its name.
+
+    'products' holds the latest values of each (source, product_id) and when
+    it was last seen; 'products_fts' indexes the names, stemmed, and is kept
+    in step with 'products' by triggers. Prices are integer paise, as on
+    Product.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS products ('
+            ' source TEXT, product_id TEXT, name TEXT, price INTEGER, rating REAL, reviews INTEGER,'
+            ' image_url TEXT, url TEXT, indexed_at REAL, UNIQUE (source, product_id));'
+            'CREATE INDEX IF NOT EXISTS products_indexed ON products (indexed_at);'
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            " name, content='products', content_rowid='rowid', tokenize='porter unicode61');"
+            'CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN'
+            ' INSERT INTO products_fts (rowid, name) VALUES (new.rowid, new.name); END;'
+            'CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN'
+            " INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.rowid, old.name); END;"
+            'CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE OF name ON products'
+            ' WHEN old.name IS NOT new.name BEGIN'
+            " INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.rowid, old.name);"
+            ' INSERT INTO products_fts (rowid, name) VALUES (new.rowid, new.name); END;')
+        self._conn.commit()
+
+    def reopen(self):
+        """ Opens a fresh connection to the file in a forked worker; see PriceHistory.reopen(). """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def add(self, source, products, indexed_at=None):
+        """
+        Indexes the products of a scrape, replacing what is stored for them.
+
+        Args:
+            source (str): The source the products came from.
+            products (list): Products; ones without a product_id are skipped.
+            indexed_at (float): Unix time of the scrape. Defaults to now.
+
+        Returns:
+            int: How many products were indexed.
+        """
+        indexed_at = indexed_at or time.time()
+        rows = [(source, product.product_id, product.name, product.price, product.rating, product.reviews,
+                 product.image_url, product.url, indexed_at)
+                for product in products if product.product_id]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            # An unchanged name leaves the FTS entry alone (see products_au).
+            self._conn.executemany(
+                'INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (source, product_id) DO UPDATE SET name = excluded.name, price = excluded.price,'
+                ' rating = excluded.rating, reviews = excluded.reviews, image_url = excluded.image_url,'
+                ' url = excluded.url, indexed_at = excluded.indexed_at', rows)
+        return len(rows)
+
+    def search(self, search_query, sources=None, filters=None, since=None, order='relevance', limit=50,
+               any_word=False):
+        """
+        Finds indexed products whose names match a query.
+
+        Args:
+            search_query (str): Words to look for; see match_expression().
+            sources (list): Only these sources. None means all.
+            filters (ProductFilter): Price (paise) and rating bounds.
+            since (float): Only products indexed at or after this Unix time.
+            order (str): A key of ORDERS.
+            limit (int): Most products to return, up to MAX_ROWS.
+            any_word (bool): Match products with any of the words, not all.
+
+        Returns:
+            list: (Product, indexed_at) pairs in the requested order.
+        """
+        expression = match_expression(search_query, any_word)
+        if expression is None:
+            return []
+        query = (f'SELECT {", ".join("p." + column for column in _COLUMNS.split(", "))}, p.indexed_at '
+                 'FROM products_fts JOIN products p ON p.rowid = products_fts.rowid WHERE products_fts MATCH ?')
+        params = [expression]
+        if sources:
+            query += f' AND p.source IN ({",".join("?" * len(sources))})'
+            params += list(sources)
+        if since:
+            query += ' AND p.indexed_at >= ?'
+            params.append(since)
+        if filters is not None:
+            for column, operator, value in (('price', '>=', filters.min_price), ('price', '<=', filters.max_price),
+                                            ('rating', '>=', filters.min_rating)):
+                if value is not None:
+                    query += f' AND p.{column} {operator} ?'
+                    params.append(value)
+        query += f' ORDER BY {ORDERS[order]} LIMIT ?'
+        params.append(min(limit, MAX_ROWS))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [(Product(*row[:-1]), row[-1]) for row in rows]
+
+    def lookup(self, source, search_query, wanted, filters=None, max_age=INDEX_MAX_AGE):
+        """
+        Answers a scrape from the index when it can: returns the best 'wanted'
+        products of 'source' matching the query that were indexed within
+        'max_age' seconds, or None if there are fewer than that.
+        """
+        hits = self.search(search_query, [source], filters, since=time.time() - max_age, limit=wanted)
+        if len(hits) < wanted:
+            return None
+        return [product for product, _ in hits]
+
+    def stats(self):
+        """ Returns {source: (products, oldest indexed_at, newest indexed_at)}. """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source, COUNT(*), MIN(indexed_at), MAX(indexed_at) FROM products GROUP BY source').fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+
+store = SearchIndex(SEARCH_DB) if SEARCH_DB else None
+
+
+def lookup_scrape(source, search_query, page=1, max_results=None, filters=None, max_age=INDEX_MAX_AGE):
+    """
+    The index-first path of /scrape/<source>?index=1: returns the products
+    to answer with from the index, or None to scrape upstream. Only a first
+    page is answered, and only when the index holds as many fresh matching
+    products as the scrape would collect (max_results, or one page).
+    """
+    if store is None or page != 1:
+        return None
+    from scraper_api.sources import get_module
+    wanted = max_results or get_module(source).PER_PAGE
+    try:
+        products = store.lookup(source, search_query, wanted, filters, max_age)
+    except sqlite3.Error as e:
+        print(f"Could not search the {source} index: {e}")
+        products = None
+    metrics.SEARCH_INDEX.inc(source, 'miss' if products is None else 'hit')
+    return products
+
+
+def _index(source, value):
+    if store is None or not isinstance(value, list):
+        return
+    try:
+        store.add(source, value)
+    except sqlite3.Error as e:
+        print(f"Could not index {source} products: {e}")
+
+
+def index_products(source):
+    """
+    Adds the products a scrape_<source>_products function returns to the
+    search index. Place it under the cache decorators so that only real
+    scrapes are indexed, not cache hits.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            value = func(*args, **kwargs)
+            _index(source, value)
+            return value
+        return wrapper
+
+    return decorator
+
+
+def async_index_products(source):
+    """ Async counterpart of index_products(); the SQLite write runs on a thread. """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            value = await func(*args, **kwargs)
+            if store is not None:
+                await asyncio.to_thread(_index, source, value)
+            return value
+        return wrapper
+
+    return decorator
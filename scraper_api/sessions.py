@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from scraper_api import metrics, page_cache, rate_limit
+
+# --- Pool Settings (overridable through the environment) ---
+# Keep-alive connections kept open per host.
+POOL_SIZE = int(os.environ.get('SCRAPER_POOL_SIZE', '10'))
+# Retries for throttled or unavailable responses, with exponential backoff
+# (RETRY_BACKOFF * 2 ** (retry - 1) seconds, or the server's Retry-After).
+# fetch() makes them itself, so each one waits for the rate limiter. A
+# Retry-After longer than rate_limit.MAX_WAIT ends the retries instead.
+RETRY_TOTAL = int(os.environ.get('SCRAPER_RETRY_TOTAL', '2'))
+RETRY_BACKOFF = float(os.environ.get('SCRAPER_RETRY_BACKOFF', '0.5'))
+RETRY_STATUSES = (429, 503)
+
+_sessions = {}
+_lock = threading.Lock()
+
+# --- Connection timing ---
+# New connections add their connect and TLS handshake times here, for the
+# fetch running on the same thread to report.
+_timings = threading.local()
+
+
+def _add_timing(stage, seconds):
+    stages = getattr(_timings, 'stages', None)
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        # DNS lookup and TCP connect.
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._connect_seconds = time.perf_counter() - start
+            _add_timing('connect', self._connect_seconds)
+
+    def connect(self):
+        self._connect_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            # Whatever connect() spent beyond opening the socket is the TLS handshake.
+            if isinstance(self, HTTPSConnection):
+                _add_timing('tls', max(time.perf_counter() - start - self._connect_seconds, 0.0))
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """ An HTTPAdapter whose connections report their connect and TLS times. """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
+
+
+def _build_session():
+    # Only failed connections are retried here; throttled responses go back
+    # to fetch(), which retries them through the rate limiter.
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status=0,
+        respect_retry_after_header=False,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adapter = _TimedAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=False, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def retry_delay(retry_after, attempt):
+    """
+    How long to wait before retrying a throttled or unavailable response.
+
+    Args:
+        retry_after (str): The response's Retry-After header, or ''.
+        attempt (int): The attempt that got the response, from 0.
+
+    Returns:
+        float: Seconds to wait, at most rate_limit.MAX_WAIT, or None when the
+        server asks for longer and the response should be returned as it is.
+    """
+    if retry_after.isdigit():
+        delay = float(retry_after)
+        return delay if delay <= rate_limit.MAX_WAIT else None
+    return min(RETRY_BACKOFF * (2 ** attempt), rate_limit.MAX_WAIT)
+
+
+def get_session(url):
+    """
+    Returns the shared session for the host of a URL, creating it on first use.
+    Sessions live for the whole process, so connections are reused across
+    Flask requests.
+    """
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session()
+                _sessions[host] = session
+    return session
+
+
+def fetch(url, headers=None, timeout=15, source=None):
+    """
+    GETs a URL through the pooled session for its host, after waiting for the
+    host's rate limiter. Each stage of the fetch is timed in scraper_api.metrics.
+
+    With the page cache on, a stored copy that is still fresh is returned
+    without a request, and otherwise the request is made conditional on it;
+    a 304 answer returns the stored copy as a 200.
+
+    Args:
+        url (str): The page to fetch.
+        headers (dict): Request headers.
+        timeout (float): Connect/read timeout in seconds.
+        source (str): The source to report timings and counts under.
+                      Defaults to the URL's host.
+
+    Returns:
+        requests.Response: The response with its body read, after any
+                           retries on 429/503, each through the rate limiter.
+    """
+    host = urlsplit(url).netloc
+    source = source or host
+    cached = page_cache.store.lookup(url) if page_cache.store is not None else None
+    if cached is not None:
+        if cached.is_fresh():
+            metrics.PAGE_CACHE.inc(source, 'fresh')
+            return cached.to_response()
+        headers = {**(headers or {}), **cached.validators()}
+
+    session = get_session(url)
+    _timings.stages = stages = {}
+    waited = downloaded = 0.0
+    try:
+        for attempt in range(RETRY_TOTAL + 1):
+            # Every attempt, retries included, waits for its turn.
+            with metrics.span(source, 'throttle'):
+                rate_limit.acquire(host)
+            sent = time.perf_counter()
+            # Stream so the headers and the body can be timed apart.
+            response = session.get(url, headers=headers, timeout=timeout, stream=True)
+            headers_at = time.perf_counter()
+            response.content  # reads the body
+            downloaded += time.perf_counter() - headers_at
+            waited += headers_at - sent
+            rate_limit.record(host, response.status_code)
+            metrics.count_response(source, response.status_code, len(response.content))
+            if response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                break
+            delay = retry_delay(response.headers.get('Retry-After', ''), attempt)
+            if delay is None:
+                break
+            # Backoff counts as waiting, as in the async client.
+            waited += delay
+            time.sleep(delay)
+    finally:
+        _timings.stages = None
+
+    for stage, seconds in stages.items():
+        metrics.observe(source, stage, seconds)
+    metrics.observe(source, 'wait', max(waited - sum(stages.values()), 0.0))
+    metrics.observe(source, 'download', downloaded)
+
+    if page_cache.store is not None:
+        if cached is not None and response.status_code == 304:
+            metrics.PAGE_CACHE.inc(source, 'revalidated')
+            page_cache.store.revalidated(cached, response.headers)
+            return cached.to_response()
+        metrics.PAGE_CACHE.inc(source, 'fetched')
+        if response.status_code == 200:
+            page_cache.store.save(url, source, response.headers, response.content)
+    return response
+
+
+def close_all():
+    """ Closes every pooled session and its connections. """
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,108 @@
+import asyncio
+import functools
+import inspect
+import threading
+
+from scraper_api.cache import bind_options, make_key, normalize_query
+
+
+class _Call:
+    """ One in-flight scrape that other callers can wait on. """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+_calls = {}
+_lock = threading.Lock()
+
+
+def single_flight(source):
+    """
+    Coalesces concurrent identical calls to a scrape_<source>_products function.
+
+    The first caller for a (source, query, arguments) key runs the scrape;
+    callers that arrive while it is running wait for it and receive the same
+    result, or the same exception. Once it finishes the next call starts a new
+    scrape.
+
+    Args:
+        source (str): The source name, used to build the key.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(search_query, *args, **kwargs):
+            key = make_key(source, normalize_query(search_query), bind_options(signature, args, kwargs))
+            with _lock:
+                call = _calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    _calls[key] = call
+                else:
+                    call.waiters += 1
+
+            if not leader:
+                call.done.wait()
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+            try:
+                call.result = func(search_query, *args, **kwargs)
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with _lock:
+                    del _calls[key]
+                if call.waiters:
+                    print(f"Shared one {source} scrape for '{search_query}' with {call.waiters} waiting requests.")
+                call.done.set()
+            return call.result
+
+        return wrapper
+
+    return decorator
+
+
+_async_calls = {}
+
+
+def _forget(key, task):
+    if _async_calls.get(key) is task:
+        del _async_calls[key]
+    # Mark a failure retrieved so a scrape every caller left is not logged as unhandled.
+    if not task.cancelled():
+        task.exception()
+
+
+def async_single_flight(source):
+    """
+    Async counterpart of single_flight() for coroutine scrapers. The scrape
+    runs as its own task that concurrent callers on the same event loop all
+    await, shielded: a caller that is cancelled (a /scrape/all deadline, a
+    client that went away) stops waiting, but the scrape carries on for the
+    others, as with the threads of single_flight().
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(search_query, *args, **kwargs):
+            key = make_key(source, normalize_query(search_query), bind_options(signature, args, kwargs))
+            task = _async_calls.get(key)
+            if task is None:
+                task = asyncio.ensure_future(func(search_query, *args, **kwargs))
+                _async_calls[key] = task
+                task.add_done_callback(functools.partial(_forget, key))
+            return await asyncio.shield(task)
+
+        return wrapper
+
+    return decorator
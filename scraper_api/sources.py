@@ -0,0 +1,85 @@
+import importlib
+import os
+import time
+
+# Maps each source name to the module and function that scrapes it.
+# Modules are imported on first use, so asking for Amazon or Myntra alone
+# never pulls in Selenium.
+SOURCES = {
+    'amazon': ('scraper_api.amazon', 'scrape_amazon_products'),
+    'myntra': ('scraper_api.myntra_scraper', 'scrape_myntra_products'),
+    'flipkart': ('scraper_api.flipkart', 'scrape_flipkart_products'),
+}
+
+
+def _enabled(value):
+    names = [name.strip().lower() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"SCRAPER_SOURCES has unknown sources: {', '.join(unknown)}")
+    return [name for name in SOURCES if name in names]
+
+
+# --- Enabled Sources (overridable through the environment) ---
+# The sources this server scrapes, e.g. 'amazon,myntra' for one without a
+# browser. The others get no /scrape route and are refused by /scrape/all,
+# batches and the watchlist, and their modules are never imported.
+ENABLED_SOURCES = _enabled(os.environ.get('SCRAPER_SOURCES', ','.join(SOURCES)))
+
+_loaded = {}
+
+
+def is_enabled(source):
+    return source in ENABLED_SOURCES
+
+
+def get_module(source):
+    """ Returns the module that scrapes a source, importing it if needed. """
+    if source not in SOURCES:
+        raise KeyError(f"Unknown source: {source}")
+    return importlib.import_module(SOURCES[source][0])
+
+
+def get_scraper(source):
+    """
+    Returns the scraper function for a source, importing its module if needed.
+
+    Args:
+        source (str): One of the keys in SOURCES.
+
+    Returns:
+        callable: The scrape_<source>_products function.
+    """
+    scraper = _loaded.get(source)
+    if scraper is None:
+        scraper = getattr(get_module(source), SOURCES[source][1])
+        _loaded[source] = scraper
+    return scraper
+
+
+def warm_up(sources=None):
+    """
+    Gets the enabled sources ready to scrape before the first request:
+    imports each scraper with its parser, runs the parser once and builds the
+    pooled HTTP session for its site. A pre-forking server calls this in the
+    master, so that every worker starts with it done and shares the imported
+    code with the master's memory. No connection or browser is opened: those
+    belong to the process that uses them.
+
+    Args:
+        sources (list): Sources to warm up. Defaults to ENABLED_SOURCES.
+
+    Returns:
+        dict: Seconds spent per source.
+    """
+    from scraper_api import parse_pool, sessions
+    timings = {}
+    for source in sources or ENABLED_SOURCES:
+        start = time.perf_counter()
+        get_scraper(source)
+        parse_pool.warm_up(source)
+        if source != 'flipkart':
+            # Flipkart pages come through its browsers, not a session.
+            sessions.get_session(get_module(source).BASE_URL)
+        timings[source] = time.perf_counter() - start
+    return timings
@@ -0,0 +1,64 @@
+from scraper_api.pagination import iter_pages
+from scraper_api.product import dumps
+from scraper_api.sources import get_module
+
+
+def iter_source_products(source, search_query, page=1, max_results=None, filters=None):
+    """
+    Yields the Products of a source one by one as each result page is
+    fetched and parsed. Pages are scheduled as in
+    pagination.iter_pages. This bypasses the result cache. Products that do
+    not pass 'filters' are dropped while the pages are parsed.
+
+    If a page fails, one {"source": ..., "error": ...} item is yielded and
+    the stream ends.
+    """
+    module = get_module(source)
+    scrape_page = getattr(module, f'scrape_{source}_page')
+    pages = iter_pages(lambda n: scrape_page(search_query, n, filters), module.HOST, page, max_results,
+                       module.PER_PAGE)
+    for result in pages:
+        if isinstance(result, dict) and 'error' in result:
+            yield {'source': source, 'error': result['error']}
+            return
+        yield from result
+
+
+SSE_END = "event: end\ndata: {}\n\n"
+
+
+def ndjson_line(item):
+    return dumps(item) + '\n'
+
+
+def sse_event(item):
+    return f"data: {dumps(item)}\n\n"
+
+
+def encode_ndjson(items):
+    """ Encodes items as newline delimited JSON, one line per item. """
+    for item in items:
+        yield ndjson_line(item)
+
+
+def encode_sse(items):
+    """ Encodes items as Server-Sent Events, followed by a final 'end' event. """
+    for item in items:
+        yield sse_event(item)
+    yield SSE_END
+
+
+async def encode_async(items, stream):
+    """ Encodes an async iterator of items in the given stream format. """
+    encode_item = sse_event if stream == 'sse' else ndjson_line
+    async for item in items:
+        yield encode_item(item)
+    if stream == 'sse':
+        yield SSE_END
+
+
+# Supported ?stream= values: (encoder, mimetype).
+STREAM_FORMATS = {
+    'ndjson': (encode_ndjson, 'application/x-ndjson'),
+    'sse': (encode_sse, 'text/event-stream'),
+}